@@ -0,0 +1,177 @@
+import asyncio
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import select, func, or_, text
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.database import engine, AsyncSessionLocal
+from app.models import Attendance, Employee, Holiday, AbsenceRun
+from app.hmac_integrity import hmac_integrity
+from app.attendance_ingest import insert_attendance_rows, ensure_partitions_for_days
+from app.schema import is_postgresql
+from app.events import event_broker
+
+ABSENT = "absent"
+ABSENCE_LOCK_KEY = "absence_job"
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+def parse_working_days(value: str) -> frozenset:
+    """
+    Turn "mon,tue,wed,thu,fri" into weekday numbers (Monday is 0)
+    
+    Raises:
+        ValueError: On an unknown day name
+    """
+    names = [name.strip().lower()[:3] for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in WEEKDAYS]
+    if unknown:
+        raise ValueError(f"Unknown day in WORKING_DAYS: {', '.join(unknown)}")
+    return frozenset(WEEKDAYS.index(name) for name in names)
+
+class WorkingCalendar:
+    """Working weekdays minus holidays"""
+    
+    def __init__(self, weekdays, holidays=()):
+        self.weekdays = frozenset(weekdays)
+        self.holidays = frozenset(holidays)
+    
+    def is_working_day(self, day: date) -> bool:
+        return day.weekday() in self.weekdays and day not in self.holidays
+    
+    def working_days(self, first_day: date, last_day: date) -> list:
+        """Working days from first_day to last_day, inclusive"""
+        days = []
+        day = first_day
+        while day <= last_day:
+            if self.is_working_day(day):
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+async def load_calendar(db) -> WorkingCalendar:
+    holidays = (await db.execute(select(Holiday.day))).scalars().all()
+    return WorkingCalendar(parse_working_days(settings.WORKING_DAYS), holidays)
+
+def missing_employees_query(day: date):
+    """
+    Approved employees (approved by the end of `day`) with no attendance
+    row for `day`, as one set difference in the database
+    """
+    next_midnight = datetime.combine(day + timedelta(days=1), time())
+    eligible = select(Employee.id).where(
+        Employee.is_approved == True,
+        or_(Employee.approved_at.is_(None), Employee.approved_at < next_midnight)
+    )
+    return eligible.except_(select(Attendance.employee_id).where(Attendance.attendance_day == day))
+
+def build_absence_rows(employee_ids, day: date) -> list:
+    """Signed absent rows for one day; absences carry no location or check-in time"""
+    date_str = day.isoformat()
+    signatures = hmac_integrity.compute_attendance_hmacs(
+        (employee_id, date_str, ABSENT, "", "") for employee_id in employee_ids
+    )
+    midnight = datetime.combine(day, time())
+    return [
+        {
+            "employee_id": employee_id,
+            "date": midnight,
+            "attendance_day": day,
+            "status": ABSENT,
+            "marked_at": None,
+            "latitude": None,
+            "longitude": None,
+            "location_name": None,
+            "hmac": signature
+        }
+        for employee_id, signature in zip(employee_ids, signatures)
+    ]
+
+async def materialize_absences(day: date):
+    """
+    Write absent rows for one finished working day, in one transaction
+    
+    The day is recorded in absence_runs in the same transaction, so it is
+    done exactly once even with several workers running the job.
+    
+    Returns:
+        int: Absent rows written, or None if the day was already done
+    """
+    await asyncio.to_thread(ensure_partitions_for_days, day, day)
+    try:
+        async with AsyncSessionLocal() as db:
+            if is_postgresql(engine):
+                await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": ABSENCE_LOCK_KEY})
+            if await db.get(AbsenceRun, day) is not None:
+                return None
+            
+            employee_ids = (await db.execute(missing_employees_query(day))).scalars().all()
+            inserted = await insert_attendance_rows(db, build_absence_rows(employee_ids, day))
+            db.add(AbsenceRun(day=day, absent_count=len(inserted), completed_at=datetime.utcnow()))
+            await db.commit()
+    except IntegrityError:
+        return None  # another worker recorded the day first
+    
+    if inserted:
+        # One stats delta rather than an event per absent employee
+        event_broker.publish("stats", {"delta": {"total_attendance": len(inserted), "present_today": 0}})
+    return len(inserted)
+
+async def materialize_range(first_day: date, last_day: date) -> dict:
+    """
+    Materialize every working day in the range that has not been done yet
+    
+    Raises:
+        ValueError: If the range reaches today; a day is only complete once it is over
+    
+    Returns:
+        dict: day -> absent rows written, for the days done by this call
+    """
+    if last_day >= date.today():
+        raise ValueError("Absences can only be written for days that are over")
+    async with AsyncSessionLocal() as db:
+        calendar = await load_calendar(db)
+    
+    written = {}
+    for day in calendar.working_days(first_day, last_day):
+        count = await materialize_absences(day)
+        if count is not None:
+            written[day] = count
+            print(f"[ABSENCES] {day.isoformat()}: {count} absent")
+    return written
+
+async def catch_up_absences(today: date = None) -> dict:
+    """
+    Materialize the working days since the last completed run, up to
+    yesterday and at most ABSENCE_CATCHUP_DAYS back
+    
+    A fresh database starts with yesterday rather than rewriting history.
+    """
+    today = today or date.today()
+    yesterday = today - timedelta(days=1)
+    async with AsyncSessionLocal() as db:
+        last_done = await db.scalar(select(func.max(AbsenceRun.day)))
+    
+    first_day = last_done + timedelta(days=1) if last_done else yesterday
+    first_day = max(first_day, today - timedelta(days=settings.ABSENCE_CATCHUP_DAYS))
+    if first_day > yesterday:
+        return {}
+    return await materialize_range(first_day, yesterday)
+
+def seconds_until(clock: str, now: datetime = None) -> float:
+    """Seconds until the next local HH:MM"""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in clock.split(":"))
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+async def run_absence_job():
+    """Background task: catch up at startup, then once a day at ABSENCE_JOB_TIME"""
+    while True:
+        try:
+            written = await catch_up_absences()
+            if written:
+                print(f"[✓] Absence job wrote {sum(written.values())} absent rows for {len(written)} day(s)")
+        except Exception as e:
+            print(f"[ERROR] Absence job failed: {str(e)}")
+        await asyncio.sleep(seconds_until(settings.ABSENCE_JOB_TIME))
@@ -1,23 +1,40 @@
 from cryptography.fernet import Fernet
 import os
 import base64
+import threading
 from dotenv import load_dotenv
+from app.worker_pool import ChunkedThreadPool
 
 load_dotenv()
 
+# Below this many ciphertexts a thread pool costs more than it saves
+PARALLEL_DECRYPT_THRESHOLD = int(os.getenv("AES_PARALLEL_THRESHOLD", 256))
+DECRYPT_WORKERS = int(os.getenv("AES_WORKERS", os.cpu_count() or 1))
+
 class AESEncryption:
     def __init__(self):
-        aes_key = os.getenv("AES_KEY")
-        
-        if aes_key:
-            self.cipher = Fernet(aes_key.encode())
-        else:
-            generated_key = Fernet.generate_key()
-            self.cipher = Fernet(generated_key)
-            print("⚠️  AES_KEY not set in .env")
-            print(f"📌 Generated key: {generated_key.decode()}")
-            print("Add this to your .env file:")
-            print(f"AES_KEY={generated_key.decode()}")
+        self._cipher = None
+        self._cipher_lock = threading.Lock()
+        self.pool = ChunkedThreadPool(DECRYPT_WORKERS, thread_name_prefix="aes")
+    
+    @property
+    def cipher(self) -> Fernet:
+        """Fernet cipher, built from AES_KEY on first use rather than at import"""
+        if self._cipher is None:
+            with self._cipher_lock:
+                if self._cipher is None:
+                    aes_key = os.getenv("AES_KEY")
+                    
+                    if aes_key:
+                        self._cipher = Fernet(aes_key.encode())
+                    else:
+                        generated_key = Fernet.generate_key()
+                        self._cipher = Fernet(generated_key)
+                        print("⚠️  AES_KEY not set in .env")
+                        print(f"📌 Generated key: {generated_key.decode()}")
+                        print("Add this to your .env file:")
+                        print(f"AES_KEY={generated_key.decode()}")
+        return self._cipher
     
     def encrypt_cnic(self, cnic: str) -> str:
         """
@@ -55,6 +72,37 @@ class AESEncryption:
             return decrypted.decode('utf-8')
         except Exception as e:
             raise ValueError(f"Failed to decrypt CNIC: {str(e)}")
+    
+    def decrypt_many(self, encrypted_cnics, max_workers: int = None) -> list:
+        """
+        Decrypt a batch of CNICs, fanning out over a worker pool for large batches
+        
+        Args:
+            encrypted_cnics: Sequence of encrypted CNICs (None entries are allowed)
+            max_workers: Chunks to split a large batch into (default: AES_WORKERS);
+                the pool itself always has AES_WORKERS threads
+        
+        Returns:
+            Plain text CNICs in the same order; None where the input was empty
+            or failed to decrypt
+        """
+        encrypted_cnics = list(encrypted_cnics)
+        max_workers = max_workers or DECRYPT_WORKERS
+        
+        if max_workers <= 1 or len(encrypted_cnics) < PARALLEL_DECRYPT_THRESHOLD:
+            return [self._decrypt_or_none(value) for value in encrypted_cnics]
+        
+        return self.pool.map_chunks(
+            lambda chunk: [self._decrypt_or_none(v) for v in chunk], encrypted_cnics, chunks=max_workers
+        )
+    
+    def _decrypt_or_none(self, encrypted_cnic: str):
+        if not encrypted_cnic:
+            return None
+        try:
+            return self.decrypt_cnic(encrypted_cnic)
+        except ValueError:
+            return None
 
 
 aes_encryption = AESEncryption()
@@ -0,0 +1,252 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app.database import engine
+from app.models import Attendance, Employee
+from app.hmac_integrity import hmac_integrity
+from app.change_tracking import allocate_change_seqs
+from app.attendance_summary import summary_deltas, apply_summary_deltas
+from app.schema import is_postgresql, month_start, attendance_is_partitioned, ensure_attendance_partitions
+from app.geofence import geofences
+
+UNVERIFIED_LOCATION_NAME = "Outside geofences"  # DEV_MODE check-ins that match no fence
+CLOCK_SKEW = timedelta(minutes=5)  # tolerated kiosk clock drift into the future
+
+# Dialect-specific INSERT constructs that support ON CONFLICT DO NOTHING
+DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert
+}
+
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+REJECTED = "rejected"
+
+def location_name(fence) -> str:
+    """location_name of a check-in in `fence`; None means outside every fence, accepted only in DEV_MODE"""
+    return fence.name if fence is not None else UNVERIFIED_LOCATION_NAME
+
+def local_naive(timestamp: datetime) -> datetime:
+    """Stored timestamps are naive local time, like datetime.now()"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+def prepare_attendance_rows(records, approved_ids, check_location: bool = True, now: datetime = None):
+    """
+    Validate a batch of check-ins and build signed attendance rows
+    
+    The whole batch is located against the geofences at once, and each
+    row's location_name is the name of the fence it falls in.
+    
+    Args:
+        records: Objects with employee_id, latitude, longitude, marked_at
+        approved_ids: Set of employee ids allowed to check in
+        check_location: Reject check-ins outside every geofence (off in DEV_MODE)
+        now: Reference time for rejecting future timestamps
+    
+    Returns:
+        tuple: (rows to insert, per-record results). Each row carries its
+        record index under "_index"; results for rows still to be inserted
+        are None.
+    """
+    now = now or datetime.now()
+    results = [None] * len(records)
+    fences = geofences.locate_many([r.latitude for r in records], [r.longitude for r in records])
+    
+    rows = []
+    seen = set()
+    for index, (record, fence) in enumerate(zip(records, fences)):
+        marked_at = local_naive(record.marked_at) if record.marked_at else now
+        day = marked_at.date()
+        result = {"index": index, "employee_id": record.employee_id, "attendance_day": day.isoformat()}
+        
+        if record.employee_id not in approved_ids:
+            result.update(result=REJECTED, error="Unknown or unapproved employee")
+        elif check_location and fence is None:
+            result.update(result=REJECTED, error="Location not authorized")
+        elif marked_at > now + CLOCK_SKEW:
+            result.update(result=REJECTED, error="Timestamp is in the future")
+        elif (record.employee_id, day) in seen:
+            result.update(result=DUPLICATE)
+        else:
+            seen.add((record.employee_id, day))
+            rows.append({
+                "_index": index,
+                "employee_id": record.employee_id,
+                "date": marked_at,
+                "attendance_day": day,
+                "status": "present",
+                "marked_at": marked_at,
+                "latitude": str(record.latitude),
+                "longitude": str(record.longitude),
+                "location_name": location_name(fence)
+            })
+            continue
+        results[index] = result
+    
+    signatures = hmac_integrity.compute_attendance_hmacs([
+        (row["employee_id"], row["attendance_day"].isoformat(), row["status"], row["latitude"], row["longitude"])
+        for row in rows
+    ])
+    for row, signature in zip(rows, signatures):
+        row["hmac"] = signature
+    return rows, results
+
+def ensure_partitions_for_days(first_day, last_day):
+    """
+    Backfilled check-ins can predate the partitions kept by the maintenance
+    task; create the missing ones in their own short transaction
+    """
+    if not is_postgresql(engine) or first_day >= month_start(datetime.now().date()):
+        return
+    with engine.begin() as conn:
+        if attendance_is_partitioned(conn):
+            ensure_attendance_partitions(conn, first_day, last_day)
+
+async def replace_absences(db, rows) -> dict:
+    """
+    Overwrite materialized absences with check-ins for the same day
+    
+    An offline kiosk can upload a check-in after the absence job already
+    marked that day absent; the check-in wins. Any other existing row is
+    left alone. Late uploads are rare, so the absences found are updated
+    one statement each, guarded on still being absent.
+    
+    Args:
+        rows: Prepared, signed "present" rows whose insert hit an existing row
+    
+    Returns:
+        dict: (employee_id, attendance_day) -> id for the absences replaced
+    """
+    if not rows:
+        return {}
+    
+    table = Attendance.__table__
+    absences = {
+        (row.employee_id, row.attendance_day): row.id
+        for row in await db.execute(
+            select(table.c.id, table.c.employee_id, table.c.attendance_day).where(
+                table.c.employee_id.in_({row["employee_id"] for row in rows}),
+                table.c.attendance_day.in_({row["attendance_day"] for row in rows}),
+                table.c.status == "absent"
+            )
+        )
+    }
+    
+    replaced = {}
+    for row in rows:
+        key = (row["employee_id"], row["attendance_day"])
+        if key not in absences:
+            continue
+        result = await db.execute(
+            update(table)
+            .where(table.c.id == absences[key], table.c.attendance_day == row["attendance_day"], table.c.status == "absent")
+            .values({name: value for name, value in row.items() if not name.startswith("_")})
+        )
+        if result.rowcount == 1:
+            replaced[key] = absences[key]
+            row["_replaced_absence"] = True
+    return replaced
+
+async def insert_attendance_rows(db, rows) -> dict:
+    """
+    Insert prepared rows in one statement, skipping (employee, day) pairs
+    that already exist
+    
+    The caller owns the transaction. Core inserts bypass the ORM flush
+    hooks, so rows are stamped with change sequence numbers here and the
+    written ones are added to the monthly summary. A "present" row whose
+    day was already materialized as absent replaces the absence (see
+    replace_absences).
+    
+    Returns:
+        dict: (employee_id, attendance_day) -> id for the rows actually inserted or replaced
+    """
+    if not rows:
+        return {}
+    
+    last_seq = await db.run_sync(lambda session: allocate_change_seqs(session.connection(), len(rows)))
+    values = []
+    for seq, row in enumerate(rows, start=last_seq - len(rows) + 1):
+        row["change_seq"] = seq
+        values.append({key: value for key, value in row.items() if not key.startswith("_")})
+    
+    dialect_insert = DIALECT_INSERTS[db.bind.dialect.name]
+    # A Core insert on the table: the ORM bulk path costs more per row and
+    # drops None values, letting server defaults fill them in
+    table = Attendance.__table__
+    statement = dialect_insert(table).on_conflict_do_nothing().returning(
+        table.c.id, table.c.employee_id, table.c.attendance_day
+    )
+    inserted = {
+        (row.employee_id, row.attendance_day): row.id for row in await db.execute(statement, values)
+    }
+    replaced = await replace_absences(db, [
+        row for row in rows
+        if row["status"] == "present" and (row["employee_id"], row["attendance_day"]) not in inserted
+    ])
+    inserted.update(replaced)
+    
+    deltas = summary_deltas(
+        (row["employee_id"], row["attendance_day"], row["status"], row["date"])
+        for row in rows if (row["employee_id"], row["attendance_day"]) in inserted
+    )
+    # A replaced absence moves from absent to present rather than adding a day
+    for key, removed in summary_deltas((employee_id, day, "absent", None) for employee_id, day in replaced).items():
+        deltas[key]["absent_days"] -= removed["absent_days"]
+        deltas[key]["total_days"] -= removed["total_days"]
+    await db.run_sync(lambda session: apply_summary_deltas(session.connection(), deltas))
+    return inserted
+
+def inserted_records(rows, inserted) -> list:
+    """Attendance objects (not attached to a session) for the rows insert_attendance_rows actually wrote"""
+    records = []
+    for row in rows:
+        attendance_id = inserted.get((row["employee_id"], row["attendance_day"]))
+        if attendance_id is not None:
+            fields = {name: value for name, value in row.items() if not name.startswith("_") and name != "id"}
+            records.append(Attendance(id=attendance_id, **fields))
+    return records
+
+async def ingest_attendance(db, records, check_location: bool = True):
+    """
+    Validate, sign and insert a batch of check-ins in one transaction
+    
+    Args:
+        db: AsyncSession
+        records: Objects with employee_id, latitude, longitude, marked_at
+        check_location: Reject check-ins outside every geofence
+    
+    Returns:
+        tuple: (per-record results in request order, Attendance objects that were inserted)
+    """
+    employee_ids = {record.employee_id for record in records}
+    approved_ids = set((await db.execute(
+        select(Employee.id).where(Employee.id.in_(employee_ids), Employee.is_approved == True)
+    )).scalars()) if employee_ids else set()
+    
+    rows, results = prepare_attendance_rows(records, approved_ids, check_location)
+    if rows:
+        days = [row["attendance_day"] for row in rows]
+        await asyncio.to_thread(ensure_partitions_for_days, min(days), max(days))
+    
+    inserted = await insert_attendance_rows(db, rows)
+    await db.commit()
+    
+    for row in rows:
+        key = (row["employee_id"], row["attendance_day"])
+        result = {
+            "index": row["_index"],
+            "employee_id": row["employee_id"],
+            "attendance_day": row["attendance_day"].isoformat()
+        }
+        if key in inserted:
+            result.update(result=ACCEPTED, id=inserted[key])
+            if row.get("_replaced_absence"):
+                result["replaced_absence"] = True
+        else:
+            result.update(result=DUPLICATE)
+        results[row["_index"]] = result
+    return results, inserted_records(rows, inserted)
@@ -0,0 +1,207 @@
+from functools import lru_cache
+from sqlalchemy import Date, and_, bindparam, case, cast, delete, event, func, insert, literal_column, or_, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app.models import Attendance, AttendanceMonthlySummary
+from app.schema import month_start, add_months
+
+SUMMARY_TABLE = AttendanceMonthlySummary.__table__
+SUMMARY_COUNTERS = ("present_days", "absent_days", "total_days")
+
+# Attendance fields that decide which summary row a record counts towards, and how
+SUMMARY_FIELDS = ("employee_id", "attendance_day", "status", "date")
+
+# Rows per upsert statement; 6 parameters each stays far below SQLite's limit
+SUMMARY_UPSERT_ROWS = 500
+SUMMARY_UPSERT_FIELDS = ("employee_id", "month", *SUMMARY_COUNTERS, "last_attendance")
+
+@lru_cache(maxsize=8)
+def summary_upsert(row_count: int):
+    """
+    INSERT ... ON CONFLICT DO UPDATE adding increments for `row_count` rows
+    
+    The statement is spelled the same on PostgreSQL and SQLite. It is kept
+    as text, and cached per row count, because SQLAlchemy does not cache
+    compiled ON CONFLICT DO UPDATE constructs, and compiling one per
+    check-in costs more than running it.
+    """
+    table = SUMMARY_TABLE.name
+    values = ", ".join(
+        "(" + ", ".join(f":{field}_{index}" for field in SUMMARY_UPSERT_FIELDS) + ")"
+        for index in range(row_count)
+    )
+    statement = text(f"""
+        INSERT INTO {table} ({", ".join(SUMMARY_UPSERT_FIELDS)})
+        VALUES {values}
+        ON CONFLICT (employee_id, month) DO UPDATE SET
+            present_days = {table}.present_days + excluded.present_days,
+            absent_days = {table}.absent_days + excluded.absent_days,
+            total_days = {table}.total_days + excluded.total_days,
+            last_attendance = CASE
+                WHEN {table}.last_attendance IS NULL
+                    OR excluded.last_attendance > {table}.last_attendance
+                THEN excluded.last_attendance
+                ELSE {table}.last_attendance
+            END
+    """)
+    return statement.bindparams(
+        *(bindparam(f"month_{index}", type_=SUMMARY_TABLE.c.month.type) for index in range(row_count)),
+        *(bindparam(f"last_attendance_{index}", type_=SUMMARY_TABLE.c.last_attendance.type) for index in range(row_count))
+    )
+
+# First day of the month of a DATE column, per dialect. The 'month' unit is
+# a literal so the expression compiles identically in SELECT and GROUP BY.
+MONTH_EXPRESSIONS = {
+    "postgresql": lambda day: cast(func.date_trunc(literal_column("'month'"), day), Date),
+    "sqlite": lambda day: func.date(day, literal_column("'start of month'"))
+}
+
+def summary_deltas(records) -> dict:
+    """
+    Fold newly inserted attendance into per-(employee, month) increments
+    
+    Args:
+        records: (employee_id, attendance_day, status, date) tuples
+    
+    Returns:
+        dict: (employee_id, month) -> counter increments and latest present `date`
+    """
+    deltas = {}
+    for employee_id, day, status, marked in records:
+        delta = deltas.setdefault((employee_id, month_start(day)), {
+            "present_days": 0, "absent_days": 0, "total_days": 0, "last_attendance": None
+        })
+        delta["total_days"] += 1
+        if status == "present":
+            delta["present_days"] += 1
+        elif status == "absent":
+            delta["absent_days"] += 1
+        if status == "present" and marked is not None and (
+            delta["last_attendance"] is None or marked > delta["last_attendance"]
+        ):
+            delta["last_attendance"] = marked
+    return deltas
+
+def apply_summary_deltas(connection, deltas: dict):
+    """
+    Add increments to the summary in the caller's transaction, creating
+    rows for months that have none yet
+    
+    Rows are upserted in key order so concurrent writers lock them in the
+    same order.
+    """
+    if not deltas:
+        return
+    rows = [
+        (employee_id, month, *(delta[name] for name in SUMMARY_COUNTERS), delta["last_attendance"])
+        for (employee_id, month), delta in sorted(deltas.items())
+    ]
+    for start in range(0, len(rows), SUMMARY_UPSERT_ROWS):
+        chunk = rows[start:start + SUMMARY_UPSERT_ROWS]
+        params = {
+            f"{field}_{index}": value
+            for index, row in enumerate(chunk)
+            for field, value in zip(SUMMARY_UPSERT_FIELDS, row)
+        }
+        connection.execute(summary_upsert(len(chunk)), params)
+
+def rebuild_attendance_summary(connection, keys=None, employee_ids=None) -> int:
+    """
+    Recompute summary rows from the attendance table
+    
+    Args:
+        connection: Connection inside the caller's transaction
+        keys: (employee_id, month) pairs to recompute
+        employee_ids: Employees to recompute entirely
+    
+    With neither, the whole summary is rebuilt.
+    
+    Returns:
+        int: Number of summary rows written
+    """
+    month = MONTH_EXPRESSIONS[connection.dialect.name](Attendance.attendance_day)
+    aggregate = select(
+        Attendance.employee_id,
+        month,
+        func.sum(case((Attendance.status == "present", 1), else_=0)),
+        func.sum(case((Attendance.status == "absent", 1), else_=0)),
+        func.count(Attendance.id),
+        func.max(case((Attendance.status == "present", Attendance.date)))
+    ).group_by(Attendance.employee_id, month)
+    remove = delete(SUMMARY_TABLE)
+    
+    if keys is not None:
+        keys = sorted(set(keys))
+        if not keys:
+            return 0
+        aggregate = aggregate.where(or_(*(
+            and_(
+                Attendance.employee_id == employee_id,
+                Attendance.attendance_day >= month_first,
+                Attendance.attendance_day < add_months(month_first, 1)
+            ) for employee_id, month_first in keys
+        )))
+        remove = remove.where(or_(*(
+            and_(SUMMARY_TABLE.c.employee_id == employee_id, SUMMARY_TABLE.c.month == month_first)
+            for employee_id, month_first in keys
+        )))
+    elif employee_ids is not None:
+        aggregate = aggregate.where(Attendance.employee_id.in_(employee_ids))
+        remove = remove.where(SUMMARY_TABLE.c.employee_id.in_(employee_ids))
+    elif connection.dialect.name == "postgresql":
+        # Writers that commit attendance meanwhile wait here, then add their increments on top
+        connection.execute(text(f"LOCK TABLE {SUMMARY_TABLE.name} IN EXCLUSIVE MODE"))
+    
+    connection.execute(remove)
+    result = connection.execute(insert(SUMMARY_TABLE).from_select(
+        ["employee_id", "month", *SUMMARY_COUNTERS, "last_attendance"], aggregate
+    ))
+    return result.rowcount
+
+def _enable_active_history(target, value, oldvalue, initiator):
+    """
+    Intentionally empty: registering any "set" listener with
+    active_history=True makes SQLAlchemy load the previous value on
+    assignment even when it was expired, so get_history() in
+    update_attendance_summary sees the employee and month a record moved
+    away from and refreshes that summary row too
+    """
+
+for _field in ("employee_id", "attendance_day"):
+    event.listen(getattr(Attendance, _field), "set", _enable_active_history, active_history=True)
+
+@event.listens_for(Session, "after_flush")
+def update_attendance_summary(session, flush_context):
+    """
+    Keep the summary in step with attendance written through the ORM, in
+    the same transaction
+    
+    Inserts add increments. Updates and deletes that touch the counted
+    fields recompute the affected months, since an old `last_attendance`
+    cannot be taken back incrementally. Core-level bulk inserts call
+    apply_summary_deltas themselves.
+    """
+    inserted = [
+        tuple(getattr(obj, field) for field in SUMMARY_FIELDS)
+        for obj in session.new if isinstance(obj, Attendance)
+    ]
+    stale = set()
+    for obj in session.dirty:
+        if not isinstance(obj, Attendance):
+            continue
+        histories = [get_history(obj, field) for field in SUMMARY_FIELDS]
+        if not any(history.has_changes() for history in histories):
+            continue
+        employee_history, day_history = histories[0], histories[1]
+        for employee_id in [*employee_history.non_added(), *employee_history.added]:
+            for day in [*day_history.non_added(), *day_history.added]:
+                if employee_id is not None and day is not None:
+                    stale.add((employee_id, month_start(day)))
+    for obj in session.deleted:
+        if isinstance(obj, Attendance):
+            stale.add((obj.employee_id, month_start(obj.attendance_day)))
+    
+    if inserted:
+        apply_summary_deltas(session.connection(), summary_deltas(inserted))
+    if stale:
+        rebuild_attendance_summary(session.connection(), stale)
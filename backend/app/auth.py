@@ -10,6 +10,34 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+EVENT_TICKET_AUDIENCE = "event-stream"
+
+def create_event_ticket(payload: dict) -> str:
+    """
+    Short-lived token that can only open the event stream
+    
+    EventSource cannot send headers, so the stream is authorized through
+    the URL, which ends up in access logs. The ticket carries its own
+    audience and is rejected by verify_token, so a logged ticket cannot be
+    used as a session.
+    """
+    expire = datetime.utcnow() + timedelta(seconds=settings.EVENT_TICKET_SECONDS)
+    claims = {"sub": payload.get("sub"), "role": payload.get("role"), "aud": EVENT_TICKET_AUDIENCE, "exp": expire}
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def verify_event_ticket(ticket: str):
+    try:
+        # require_aud: a session JWT has no audience and must not pass as a ticket
+        return jwt.decode(
+            ticket, settings.SECRET_KEY, algorithms=[settings.ALGORITHM],
+            audience=EVENT_TICKET_AUDIENCE, options={"require_aud": True}
+        )
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Event stream ticket is invalid or expired",
+        )
+
 def verify_token(token: str):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
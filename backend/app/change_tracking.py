@@ -0,0 +1,182 @@
+import hashlib
+import json
+from datetime import datetime, date, time, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import Attendance, Employee, ChangeCounter
+
+CHANGE_COUNTER = "attendance"
+TRACKED_MODELS = (Attendance, Employee)
+
+def allocate_change_seqs(connection, count: int = 1) -> int:
+    """
+    Reserve `count` change sequence numbers in the current transaction
+    
+    The counter row stays locked until the transaction ends, so sequence
+    numbers become visible in commit order: a reader that sees seq N has
+    also seen every seq below it. That is what makes `since` cursors safe.
+    
+    Known limit: the same lock serializes every writing transaction. A
+    PostgreSQL sequence would not block, but it hands out numbers in
+    allocation order, not commit order. Bulk writers therefore reserve a
+    whole range in one call.
+    
+    Args:
+        connection: Connection inside the writing transaction
+        count: How many numbers to reserve
+    
+    Returns:
+        int: The last reserved number; the range is last - count + 1 .. last
+    """
+    now = datetime.utcnow()
+    bump = update(ChangeCounter).where(ChangeCounter.name == CHANGE_COUNTER).values(
+        version=ChangeCounter.version + count, updated_at=now
+    )
+    if connection.dialect.update_returning:
+        # One round trip on PostgreSQL and SQLite >= 3.35
+        version = connection.execute(bump.returning(ChangeCounter.version)).scalar()
+    else:
+        version = connection.execute(
+            select(ChangeCounter.version).where(ChangeCounter.name == CHANGE_COUNTER)
+        ).scalar() if connection.execute(bump).rowcount else None
+    
+    if version is None:
+        connection.execute(insert(ChangeCounter).values(name=CHANGE_COUNTER, version=count, updated_at=now))
+        return count
+    return version
+
+def ensure_change_counter(bind):
+    """Seed the counter row so concurrent first writers never race to insert it"""
+    with bind.begin() as conn:
+        exists = conn.execute(
+            select(ChangeCounter.name).where(ChangeCounter.name == CHANGE_COUNTER)
+        ).first()
+        if exists:
+            return
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(ChangeCounter).values(
+                    name=CHANGE_COUNTER, version=0, updated_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            pass  # another worker seeded it first
+
+@event.listens_for(Session, "before_flush")
+def stamp_change_seqs(session, flush_context, instances):
+    """
+    Give every inserted or updated attendance/employee row the next change
+    sequence number, in the same transaction as the write
+    
+    Core-level bulk inserts bypass the ORM and call allocate_change_seqs
+    themselves.
+    """
+    changed = [obj for obj in session.new if isinstance(obj, TRACKED_MODELS)]
+    changed += [
+        obj for obj in session.dirty
+        if isinstance(obj, TRACKED_MODELS) and session.is_modified(obj, include_collections=False)
+    ]
+    deleted = any(isinstance(obj, TRACKED_MODELS) for obj in session.deleted)
+    if not changed and not deleted:
+        return
+    
+    last = allocate_change_seqs(session.connection(), max(len(changed), 1))
+    for seq, obj in enumerate(changed, start=last - len(changed) + 1):
+        obj.change_seq = seq
+
+class ChangeState:
+    """
+    Snapshot of the change counter, used to answer conditional GETs
+    
+    The ETag and Last-Modified change whenever attendance or employee rows
+    are written, and at midnight (listings default to "today"), so a poll
+    that matches them can get a bodiless 304 for the price of one
+    primary-key lookup.
+    
+    The counter only moves on writes made through the application. Listings
+    that report HMAC verdicts use for_content() instead, so a row tampered
+    with directly in the database still changes the validator.
+    """
+    
+    __slots__ = ("version", "updated_at", "day", "content")
+    
+    def __init__(self, version: int, updated_at: datetime = None, day: date = None, content: str = None):
+        self.version = version
+        self.updated_at = updated_at
+        self.day = day or date.today()
+        self.content = content
+    
+    def for_content(self, body) -> "ChangeState":
+        """
+        The same state with a digest of the response body folded into the
+        ETag
+        
+        Such a state answers If-None-Match only: Last-Modified cannot
+        reflect edits that bypassed the counter, so it is neither sent nor
+        honoured. The rows are still read and verified, but an unchanged
+        poll gets a bodiless 304.
+        """
+        digest = hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return ChangeState(self.version, self.updated_at, self.day, digest)
+    
+    @property
+    def etag(self) -> str:
+        stamp = f"{self.version}:{self.updated_at.isoformat() if self.updated_at else ''}:{self.day.isoformat()}"
+        if self.content is not None:
+            stamp += f":{self.content}"
+        return '"' + hashlib.sha256(stamp.encode("utf-8")).hexdigest()[:24] + '"'
+    
+    @property
+    def last_modified(self) -> datetime:
+        midnight = datetime.combine(self.day, time()).astimezone(timezone.utc)
+        if self.updated_at is None:
+            return midnight
+        # HTTP dates have one-second resolution
+        return max(self.updated_at.replace(tzinfo=timezone.utc, microsecond=0), midnight)
+    
+    def headers(self) -> dict:
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": "private, no-cache",
+            "X-Change-Seq": str(self.version)
+        }
+        if self.content is None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+    
+    def matches(self, request: Request) -> bool:
+        """RFC 7232 precedence: If-None-Match wins; If-Modified-Since only when it is absent"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+            return "*" in candidates or any(
+                (candidate[2:] if candidate.startswith("W/") else candidate) == self.etag for candidate in candidates
+            )
+        
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and self.content is None:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+    
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self.headers())
+
+async def read_change_state(db) -> ChangeState:
+    """
+    Current change counter
+    
+    Read it before the rows: every sequence number up to this version is
+    already committed, so a client resuming from it with `since` cannot
+    miss a row.
+    """
+    row = (await db.execute(
+        select(ChangeCounter.version, ChangeCounter.updated_at).where(ChangeCounter.name == CHANGE_COUNTER)
+    )).first()
+    if row is None:
+        return ChangeState(0)
+    return ChangeState(row.version, row.updated_at)
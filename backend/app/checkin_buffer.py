@@ -0,0 +1,384 @@
+import asyncio
+import glob
+import json
+import os
+import time
+from datetime import date, datetime
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Attendance, Employee
+from app.attendance_ingest import insert_attendance_rows, inserted_records
+from app.events import publish_attendance
+
+try:
+    import fcntl
+except ImportError:  # Windows: segments cannot be told apart from a live writer's, so none are replayed
+    fcntl = None
+
+ROW_DATETIME_FIELDS = ("date", "marked_at")
+
+class DuplicateCheckIn(Exception):
+    """The employee already has a check-in for that day"""
+
+class UnknownEmployee(Exception):
+    """No employee with that id; the insert would fail after the check-in was acknowledged"""
+
+class CheckInBufferError(RuntimeError):
+    """The check-in could not be made durable"""
+
+class CheckInLog:
+    """
+    Append-only, fsync'd log of acknowledged check-ins that are not in the
+    database yet
+    
+    Each process writes its own segment files and holds an exclusive lock
+    on them. A segment is deleted once every check-in in it has been
+    committed. Segments nobody holds a lock on belong to a process that
+    died, and are replayed at startup.
+    """
+    
+    def __init__(self, log_dir: str, segment_bytes: int):
+        self.log_dir = log_dir
+        self.segment_bytes = segment_bytes
+        self._file = None
+        self._segment = None
+        self._sequence = 0
+        self._unflushed = {}  # segment path -> check-ins not committed yet
+        self._closed = set()  # segments that no longer take appends
+    
+    def _open_segment(self):
+        self._sequence += 1
+        path = os.path.join(self.log_dir, f"checkins-{os.getpid()}-{int(time.time())}-{self._sequence}.log")
+        handle = open(path, "ab")
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._file, self._segment = handle, path
+        self._unflushed[path] = 0
+    
+    def active_segment(self) -> str:
+        """Segment the next append goes to, rotating once the current one is full"""
+        if self._file is None or self._file.tell() >= self.segment_bytes:
+            self._rotate()
+        return self._segment
+    
+    def write(self, rows):
+        """Append rows to the active segment and fsync once for all of them (blocking; run in a thread)"""
+        payload = b"".join(
+            json.dumps(row, default=str, separators=(",", ":")).encode("utf-8") + b"\n" for row in rows
+        )
+        self._file.write(payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def appended(self, segment: str, count: int):
+        self._unflushed[segment] += count
+    
+    def committed(self, segment: str, count: int):
+        """Record that `count` check-ins from `segment` reached the database"""
+        self._unflushed[segment] -= count
+        if segment in self._closed and self._unflushed[segment] <= 0:
+            self._remove(segment)
+    
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._closed.add(self._segment)
+            if self._unflushed[self._segment] <= 0:
+                self._remove(self._segment)
+        self._open_segment()
+    
+    def _remove(self, segment: str):
+        self._unflushed.pop(segment, None)
+        self._closed.discard(segment)
+        try:
+            os.remove(segment)
+        except FileNotFoundError:
+            pass
+    
+    def close(self):
+        """Close the active segment; it is deleted if everything in it was committed"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._closed.add(self._segment)
+        if self._unflushed[self._segment] <= 0:
+            self._remove(self._segment)
+        self._file = self._segment = None
+    
+    def claim_orphans(self) -> list:
+        """
+        Lock and read every segment left behind by a dead process
+        
+        Returns:
+            list: (path, open locked handle, rows) per orphaned segment
+        """
+        os.makedirs(self.log_dir, exist_ok=True)
+        if fcntl is None:
+            return []
+        orphans = []
+        for path in sorted(glob.glob(os.path.join(self.log_dir, "checkins-*.log"))):
+            handle = open(path, "rb")
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()  # a live worker owns it
+                continue
+            rows = []
+            for line in handle.read().splitlines():
+                try:
+                    rows.append(decode_row(json.loads(line)))
+                except ValueError:
+                    break  # torn last line from the crash; it was never acknowledged
+            orphans.append((path, handle, rows))
+        return orphans
+
+def decode_row(data: dict) -> dict:
+    for field in ROW_DATETIME_FIELDS:
+        data[field] = datetime.fromisoformat(data[field])
+    data["attendance_day"] = date.fromisoformat(data["attendance_day"])
+    return data
+
+class CheckInBuffer:
+    """
+    Optional write-behind path for mark_attendance (ATTENDANCE_WRITE_BEHIND)
+    
+    A check-in is acknowledged once it is in the append-only log. Log
+    writes issued while an fsync is running are grouped into the next one.
+    A background task then moves check-ins into the attendance table in
+    micro-batches, every WRITE_BEHIND_FLUSH_MS or WRITE_BEHIND_BATCH_SIZE
+    rows, with one INSERT ... ON CONFLICT DO NOTHING per batch. The
+    morning spike then costs one database commit per batch rather than
+    one per employee.
+    
+    Duplicates are answered from an in-memory set of (employee, day)
+    pairs, seeded from today's rows at startup. Employee ids are checked
+    against a cached set too, since a failed insert can no longer be
+    reported to the client. With several workers each
+    set only knows its own check-ins. A cross-worker duplicate is still
+    acknowledged, and the unique constraint drops it at flush time.
+    
+    With WRITE_BEHIND_LOG_DIR empty the log is skipped: acknowledged
+    check-ins still in memory are lost if the process dies.
+    """
+    
+    def __init__(self, flush_interval_ms: int, batch_size: int, queue_size: int, log_dir: str, segment_bytes: int):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.log = CheckInLog(log_dir, segment_bytes) if log_dir else None
+        self._queue = None
+        self._worker = None
+        self._log_writer = None
+        self._log_pending = []
+        self._log_wakeup = None
+        self._seen_day = None
+        self._seen = set()
+        self._employee_ids = set()
+        self.acknowledged = 0
+        self.flushed = 0
+        self.batches = 0
+        self.dropped_duplicates = 0
+    
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+    
+    async def start(self):
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.log is not None:
+            await self._replay_orphans()
+            self._log_wakeup = asyncio.Event()
+            self._log_writer = asyncio.create_task(self._write_log())
+        async with AsyncSessionLocal() as db:
+            self._employee_ids = set((await db.execute(select(Employee.id))).scalars())
+        await self._load_seen(date.today())
+        self._worker = asyncio.create_task(self._run())
+        print(f"[✓] Check-in write-behind started (flush every {self.flush_interval * 1000:.0f} ms "
+              f"or {self.batch_size} rows, log {'in ' + self.log.log_dir if self.log else 'disabled'})")
+    
+    async def stop(self, drain_timeout: float = 10.0):
+        """Flush what is buffered (up to drain_timeout), then close the log"""
+        if not self.is_running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️  Check-in buffer stopped with {self._queue.qsize()} check-ins left in the log for replay")
+        for task in (self._worker, self._log_writer):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._worker = self._log_writer = None
+        if self.log is not None:
+            self.log.close()
+    
+    def remember(self, employee_id: int, day: date):
+        """Note a check-in written by another path (e.g. batch upload)"""
+        if day == self._seen_day:
+            self._seen.add(employee_id)
+    
+    async def submit(self, row: dict):
+        """
+        Acknowledge a signed attendance row once it is durable
+        
+        Raises:
+            UnknownEmployee: If there is no such employee
+            DuplicateCheckIn: If the employee already checked in that day
+            CheckInBufferError: If the log could not be written
+        """
+        if row["employee_id"] not in self._employee_ids:
+            await self._load_employee(row["employee_id"])
+        day = row["attendance_day"]
+        if day != self._seen_day:
+            await self._load_seen(day)
+        # Check and reserve without awaiting in between, so concurrent requests cannot both pass
+        if row["employee_id"] in self._seen:
+            raise DuplicateCheckIn()
+        self._seen.add(row["employee_id"])
+        
+        try:
+            segment = await self._append_to_log(row) if self.log is not None else None
+        except OSError as e:
+            self._seen.discard(row["employee_id"])
+            raise CheckInBufferError(f"Could not write check-in log: {str(e)}")
+        
+        await self._queue.put((row, segment))
+        self.acknowledged += 1
+    
+    async def _load_employee(self, employee_id: int):
+        """Cache miss: the employee may have signed up after startup"""
+        async with AsyncSessionLocal() as db:
+            if await db.get(Employee, employee_id) is None:
+                raise UnknownEmployee()
+        self._employee_ids.add(employee_id)
+    
+    async def _load_seen(self, day: date):
+        async with AsyncSessionLocal() as db:
+            employee_ids = (await db.execute(
+                select(Attendance.employee_id).where(Attendance.attendance_day == day)
+            )).scalars().all()
+        if day != self._seen_day:
+            self._seen_day, self._seen = day, set()
+        self._seen.update(employee_ids)
+    
+    async def _append_to_log(self, row: dict) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self._log_pending.append((row, future))
+        self._log_wakeup.set()
+        return await future
+    
+    async def _write_log(self):
+        """Group commit for the log: one write + fsync for everything pending"""
+        while True:
+            await self._log_wakeup.wait()
+            self._log_wakeup.clear()
+            pending, self._log_pending = self._log_pending, []
+            if not pending:
+                continue
+            # Segment bookkeeping stays on the event loop; only the write and fsync run in a thread
+            try:
+                segment = self.log.active_segment()
+                await asyncio.to_thread(self.log.write, [row for row, _ in pending])
+                self.log.appended(segment, len(pending))
+            except OSError as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for _, future in pending:
+                if not future.done():
+                    future.set_result(segment)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def _flush(self, batch, retry_delay: float = 0.5):
+        rows = [row for row, _ in batch]
+        while True:
+            try:
+                accepted = await self._insert(rows)
+                break
+            except IntegrityError:
+                # A bad row (e.g. unknown employee) must not sink the whole batch
+                accepted = []
+                for row in rows:
+                    try:
+                        accepted += await self._insert([row])
+                    except IntegrityError as e:
+                        print(f"[ERROR] Dropping buffered check-in for employee {row['employee_id']}: {str(e.orig)}")
+                break
+            except SQLAlchemyError as e:
+                print(f"[ERROR] Check-in flush failed, retrying: {str(e)}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 10)
+        
+        self.batches += 1
+        self.flushed += len(accepted)
+        self.dropped_duplicates += len(rows) - len(accepted)
+        if self.log is not None:
+            per_segment = {}
+            for _, segment in batch:
+                per_segment[segment] = per_segment.get(segment, 0) + 1
+            for segment, count in per_segment.items():
+                self.log.committed(segment, count)
+        publish_attendance(accepted)
+    
+    async def _insert(self, rows) -> list:
+        async with AsyncSessionLocal() as db:
+            inserted = await insert_attendance_rows(db, [dict(row) for row in rows])
+            await db.commit()
+        return inserted_records(rows, inserted)
+    
+    async def _replay_orphans(self):
+        for path, handle, rows in await asyncio.to_thread(self.log.claim_orphans):
+            try:
+                accepted = []
+                for start in range(0, len(rows), self.batch_size):
+                    accepted += await self._insert(rows[start:start + self.batch_size])
+                print(f"[✓] Replayed {len(rows)} logged check-ins from {os.path.basename(path)} "
+                      f"({len(accepted)} new)")
+                os.remove(path)
+            finally:
+                handle.close()
+    
+    def stats(self) -> dict:
+        return {
+            "running": self.is_running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "acknowledged": self.acknowledged,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "dropped_duplicates": self.dropped_duplicates,
+            "log_dir": self.log.log_dir if self.log else None
+        }
+
+checkin_buffer = CheckInBuffer(
+    flush_interval_ms=settings.WRITE_BEHIND_FLUSH_MS,
+    batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+    queue_size=settings.WRITE_BEHIND_QUEUE_SIZE,
+    log_dir=settings.WRITE_BEHIND_LOG_DIR,
+    segment_bytes=settings.WRITE_BEHIND_SEGMENT_BYTES
+)
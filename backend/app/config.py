@@ -7,15 +7,62 @@ class Settings:
     SECRET_KEY = os.getenv("SECRET_KEY")
     ALGORITHM = "HS256"
     DATABASE_URL = os.getenv("DATABASE_URL")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+    
+    ATTENDANCE_PARTITION_MONTHS_AHEAD = int(os.getenv("ATTENDANCE_PARTITION_MONTHS_AHEAD", 3))  # PostgreSQL only
+    ATTENDANCE_BATCH_MAX = int(os.getenv("ATTENDANCE_BATCH_MAX", 5000))  # records per batch upload
+    
+    # Write-behind check-ins: acknowledge after an fsync'd log append, insert in micro-batches
+    ATTENDANCE_WRITE_BEHIND = os.getenv("ATTENDANCE_WRITE_BEHIND", "false").lower() == "true"
+    WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", 50))
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 500))
+    WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", 20000))
+    WRITE_BEHIND_LOG_DIR = os.getenv("WRITE_BEHIND_LOG_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "checkin-log"))  # empty: no log
+    WRITE_BEHIND_SEGMENT_BYTES = int(os.getenv("WRITE_BEHIND_SEGMENT_BYTES", 4 * 1024 * 1024))
+    
+    # End-of-day absence job: writes "absent" rows for approved employees who did not check in (opt-in)
+    ABSENCE_JOB_ENABLED = os.getenv("ABSENCE_JOB_ENABLED", "false").lower() == "true"
+    ABSENCE_JOB_TIME = os.getenv("ABSENCE_JOB_TIME", "00:15")  # local HH:MM; covers the days before today
+    WORKING_DAYS = os.getenv("WORKING_DAYS", "mon,tue,wed,thu,fri")
+    ABSENCE_CATCHUP_DAYS = int(os.getenv("ABSENCE_CATCHUP_DAYS", 31))  # how far back missed runs are caught up
+    
+    # Attendance zones: polygons in the geofences table, matched through an in-memory grid
+    GEOFENCE_GRID_CELL_DEGREES = float(os.getenv("GEOFENCE_GRID_CELL_DEGREES", 0.001))  # about 110 m of latitude
+    GEOFENCE_REFRESH_SECONDS = float(os.getenv("GEOFENCE_REFRESH_SECONDS", 30))  # fence edits made by other workers
     
     SMTP_SERVER = os.getenv("SMTP_SERVER")
     SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
     SMTP_USERNAME = os.getenv("SMTP_USERNAME")
     SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
     FROM_EMAIL = os.getenv("FROM_EMAIL")
+    MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", 1000))
+    MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", 3))
+    MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", 2.0))
+    
+    WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", 1))  # set by run.py for its workers
     
     HTTPS_ENABLED = os.getenv("HTTPS_ENABLED", "true").lower() == "true"
     SSL_CERT_PATH = os.getenv("SSL_CERT_PATH", "certs/cert.pem")
     SSL_KEY_PATH = os.getenv("SSL_KEY_PATH", "certs/key.pem")
+    KEY_ROTATION_CHECK_SECONDS = float(os.getenv("KEY_ROTATION_CHECK_SECONDS", 30))
+    PUBLIC_KEY_MAX_AGE = int(os.getenv("PUBLIC_KEY_MAX_AGE", 86400))
+    KEY_DIR = os.getenv("KEY_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "certs"))
+    
+    EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 256))  # per SSE subscriber
+    EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", 1000))  # replayable via Last-Event-ID
+    EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", 15))
+    EVENT_RETRY_MS = int(os.getenv("EVENT_RETRY_MS", 5000))
+    EVENT_TICKET_SECONDS = int(os.getenv("EVENT_TICKET_SECONDS", 60))  # lifetime of a stream ticket
+    
+    HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 4))
 
 settings = Settings()
\ No newline at end of file
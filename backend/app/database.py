@@ -1,15 +1,158 @@
-from sqlalchemy import create_engine
+import re
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
 
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+# Async drivers used when DATABASE_URL names only the backend (or a sync driver)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg"
+}
+
+def sqlite_pragmas() -> dict:
+    """Per-connection SQLite settings applied on every new DBAPI connection"""
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,  # negative = KiB rather than pages
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "temp_store": "MEMORY"
+    }
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def _pool_options(url) -> dict:
+    if _is_memory_sqlite(url):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE
+    }
+
+def _install_sqlite_pragmas(sync_engine, in_memory: bool):
+    pragmas = sqlite_pragmas()
+    
+    @event.listens_for(sync_engine, "connect")
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if name == "journal_mode" and in_memory:
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def build_engine(database_url: str):
+    """
+    Create the application engine with pooling and, for SQLite, WAL mode
+    and the pragmas above so concurrent check-ins wait for the write lock
+    instead of failing with "database is locked"
+    """
+    url = make_url(database_url)
+    options = {"pool_pre_ping": True, **_pool_options(url)}
+    is_sqlite = url.get_backend_name() == "sqlite"
+    
+    if is_sqlite:
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+        }
+    
+    new_engine = create_engine(database_url, **options)
+    
+    if is_sqlite:
+        _install_sqlite_pragmas(new_engine, _is_memory_sqlite(url))
+    
+    return new_engine
+
+def async_database_url(database_url: str) -> str:
+    """Swap the driver in DATABASE_URL for its asyncio counterpart"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS and url.drivername != ASYNC_DRIVERS[backend]:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+    return url.render_as_string(hide_password=False)
+
+def build_async_engine(database_url: str):
+    """Asyncio engine with the same pooling and SQLite pragmas as build_engine"""
+    url = make_url(async_database_url(database_url))
+    options = {"pool_pre_ping": True, **_pool_options(url)}
+    is_sqlite = url.get_backend_name() == "sqlite"
+    
+    if is_sqlite:
+        options["connect_args"] = {"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if not _is_memory_sqlite(url):
+            # aiosqlite defaults to NullPool; reuse connections (and their threads) instead
+            options["poolclass"] = AsyncAdaptedQueuePool
+    
+    new_engine = create_async_engine(url, **options)
+    
+    if is_sqlite:
+        _install_sqlite_pragmas(new_engine.sync_engine, _is_memory_sqlite(url))
+    
+    return new_engine
+
+engine = build_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = build_async_engine(settings.DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# PostgreSQL error codes; the detail names the key columns even when the
+# constraint itself belongs to a partition and carries a generated name
+PG_UNIQUE_VIOLATION = "23505"
+PG_FOREIGN_KEY_VIOLATION = "23503"
+PG_KEY_DETAIL = re.compile(r"Key \((.*?)\)=")
+SQLITE_UNIQUE_FAILED = "UNIQUE constraint failed: "
+
+def _pg_error(error):
+    """(SQLSTATE, detail) of a PostgreSQL error from asyncpg or psycopg2"""
+    original = error.orig
+    cause = getattr(original, "__cause__", None)
+    if hasattr(cause, "sqlstate"):  # asyncpg, wrapped by SQLAlchemy's adapter
+        return cause.sqlstate, cause.detail or ""
+    diag = getattr(original, "diag", None)
+    if diag is not None:  # psycopg2
+        return original.pgcode, diag.message_detail or ""
+    return None, ""
+
+def unique_violation_columns(error) -> tuple:
+    """
+    Columns of the unique constraint an IntegrityError violated
+    
+    Returns:
+        tuple: Column names, or None if the error is not a unique violation
+    """
+    message = str(error.orig)
+    if message.startswith(SQLITE_UNIQUE_FAILED):
+        # "UNIQUE constraint failed: attendance.employee_id, attendance.attendance_day"
+        return tuple(column.rsplit(".", 1)[-1] for column in message[len(SQLITE_UNIQUE_FAILED):].split(", "))
+    code, detail = _pg_error(error)
+    if code != PG_UNIQUE_VIOLATION:
+        return None
+    match = PG_KEY_DETAIL.search(detail)
+    return tuple(column.strip() for column in match.group(1).split(",")) if match else ()
+
+def is_foreign_key_violation(error) -> bool:
+    if str(error.orig).startswith("FOREIGN KEY constraint failed"):
+        return True
+    return _pg_error(error)[0] == PG_FOREIGN_KEY_VIOLATION
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,62 +1,207 @@
-import random
-import string
-import smtplib
+import asyncio
+import uuid
+import aiosmtplib
+from collections import OrderedDict
+from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from app.models import OTP
 from app.config import settings
-from app.encryption import get_password_hash
+from app.otp_store import otp_store
 
-async def send_email(to_email: str, subject: str, body: str):
-    try:
-        print(f"\n📧 Attempting to send email...")
-        print(f"   From: {settings.FROM_EMAIL}")
-        print(f"   To: {to_email}")
-        print(f"   Server: {settings.SMTP_SERVER}:{settings.SMTP_PORT}")
+class MailQueueError(Exception):
+    """Raised when a message cannot be accepted for delivery"""
+
+
+class MailDispatcher:
+    """
+    Background SMTP sender
+    
+    Messages are queued by request handlers and delivered by a single worker
+    task that keeps one authenticated aiosmtplib connection open across
+    messages, reconnecting and retrying with exponential backoff on failure.
+    """
+    
+    def __init__(self, max_queue: int, max_retries: int, retry_backoff: float, status_history: int = 10000):
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.status_history = status_history
+        self._queue = None
+        self._worker = None
+        self._smtp = None
+        self._statuses = OrderedDict()
+    
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+    
+    async def start(self):
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker = asyncio.create_task(self._run())
+        print(f"📧 Mail dispatcher started (queue size {self.max_queue})")
+    
+    async def stop(self, drain_timeout: float = 10.0):
+        """Deliver what is already queued (up to drain_timeout), then close the connection"""
+        if not self.is_running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️  Mail dispatcher stopped with {self._queue.qsize()} undelivered messages")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        await self._disconnect()
+    
+    def enqueue(self, to_email: str, subject: str, body: str) -> str:
+        """
+        Queue a message for delivery
+        
+        Returns:
+            Message ID for the delivery status API
+        
+        Raises:
+            MailQueueError: If SMTP is not configured, the dispatcher is not
+                running, or the queue is full
+        """
+        if not settings.SMTP_SERVER:
+            raise MailQueueError("SMTP_SERVER is not configured")
+        if not self.is_running:
+            raise MailQueueError("Mail dispatcher is not running")
+        
+        message_id = uuid.uuid4().hex
+        try:
+            self._queue.put_nowait((message_id, to_email, subject, body))
+        except asyncio.QueueFull:
+            raise MailQueueError("Mail queue is full")
+        
+        self._set_status(message_id, to_email, "queued")
+        return message_id
+    
+    def enqueue_many(self, messages) -> list:
+        """
+        Queue (to_email, subject, body) messages; the worker sends them
+        back-to-back over the same SMTP connection
         
+        Returns:
+            Message IDs in the same order, None for messages that could not be queued
+        """
+        message_ids = []
+        for to_email, subject, body in messages:
+            try:
+                message_ids.append(self.enqueue(to_email, subject, body))
+            except MailQueueError as e:
+                print(f"❌ Could not queue email to {to_email}: {str(e)}")
+                message_ids.append(None)
+        return message_ids
+    
+    def get_status(self, message_id: str):
+        return self._statuses.get(message_id)
+    
+    def stats(self) -> dict:
+        return {
+            "running": self.is_running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "connected": self._smtp is not None and self._smtp.is_connected
+        }
+    
+    def _set_status(self, message_id: str, to_email: str, state: str, attempts: int = 0, error: str = None):
+        self._statuses[message_id] = {
+            "id": message_id,
+            "to": to_email,
+            "status": state,
+            "attempts": attempts,
+            "error": error,
+            "updated_at": datetime.now().isoformat()
+        }
+        self._statuses.move_to_end(message_id)
+        while len(self._statuses) > self.status_history:
+            self._statuses.popitem(last=False)
+    
+    async def _run(self):
+        while True:
+            message_id, to_email, subject, body = await self._queue.get()
+            try:
+                await self._deliver(message_id, to_email, subject, body)
+            finally:
+                self._queue.task_done()
+    
+    async def _deliver(self, message_id: str, to_email: str, subject: str, body: str):
         msg = MIMEMultipart()
         msg['From'] = settings.FROM_EMAIL
         msg['To'] = to_email
         msg['Subject'] = subject
-        
         msg.attach(MIMEText(body, 'html'))
         
-        server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT)
-        server.starttls()
-        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-        server.send_message(msg)
-        server.quit()
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                smtp = await self._connection()
+                await smtp.send_message(msg)
+                self._set_status(message_id, to_email, "sent", attempt)
+                print(f"✅ Email sent successfully to: {to_email}")
+                return
+            except Exception as e:
+                error = f"{type(e).__name__}: {str(e)}"
+                print(f"❌ SMTP ERROR (attempt {attempt}/{self.max_retries}) for {to_email}: {error}")
+                await self._disconnect()
+                if attempt == self.max_retries:
+                    self._set_status(message_id, to_email, "failed", attempt, error)
+                    return
+                self._set_status(message_id, to_email, "retrying", attempt, error)
+                await asyncio.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+    
+    async def _connection(self) -> aiosmtplib.SMTP:
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
         
-        print(f"✅ Email sent successfully to: {to_email}\n")
-        return True
-    except Exception as e:
-        print(f"\n❌ SMTP ERROR:")
-        print(f"   {type(e).__name__}: {str(e)}\n")
-        print(f"⚠️  TROUBLESHOOTING:")
-        print(f"   1. Check SMTP_PASSWORD is correct (16 chars with spaces)")
-        print(f"   2. Check SMTP_USERNAME matches FROM_EMAIL")
-        print(f"   3. Verify 2FA is enabled on Gmail")
-        print(f"   4. Generate NEW app password\n")
-        return False
+        smtp = aiosmtplib.SMTP(hostname=settings.SMTP_SERVER, port=settings.SMTP_PORT)
+        await smtp.connect()
+        if settings.SMTP_USERNAME:
+            await smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        self._smtp = smtp
+        return smtp
+    
+    async def _disconnect(self):
+        if self._smtp is None:
+            return
+        try:
+            if self._smtp.is_connected:
+                await self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
 
-def generate_otp():
-    return ''.join(random.choices(string.digits, k=6))
 
-async def send_otp_email(db: Session, email: str):
-    db.query(OTP).filter(OTP.email == email).delete()
-    
-    otp_code = generate_otp()
-    expires_at = datetime.now() + timedelta(minutes=10)
+mail_dispatcher = MailDispatcher(
+    max_queue=settings.MAIL_QUEUE_SIZE,
+    max_retries=settings.MAIL_MAX_RETRIES,
+    retry_backoff=settings.MAIL_RETRY_BACKOFF
+)
+
+async def send_email(to_email: str, subject: str, body: str):
+    """
+    Queue an email for background delivery
     
-    otp = OTP(
-        email=email,
-        otp_code=get_password_hash(otp_code),
-        expires_at=expires_at
-    )
-    db.add(otp)
-    db.commit()
+    Returns:
+        Message ID, or None if the message could not be queued
+    """
+    try:
+        message_id = mail_dispatcher.enqueue(to_email, subject, body)
+        print(f"📧 Email to {to_email} queued ({message_id})")
+        return message_id
+    except MailQueueError as e:
+        print(f"\n❌ Could not queue email to {to_email}: {str(e)}\n")
+        return None
+
+async def send_otp_email(db: Session, email: str):
+    otp_code = otp_store.issue(db, email)
     
     subject = "Your Employee Attendance System OTP"
     body = f"""
@@ -85,12 +230,12 @@ async def send_otp_email(db: Session, email: str):
     </html>
     """
     
-    email_sent = await send_email(email, subject, body)
-    return email_sent
+    return await send_email(email, subject, body)
 
-async def send_approval_email(email: str, employee_name: str, employee_id: str):
-    subject = "Your Employee Account Has Been Approved"
-    body = f"""
+APPROVAL_SUBJECT = "Your Employee Account Has Been Approved"
+
+def build_approval_email(employee_name: str, employee_id: str) -> str:
+    return f"""
     <html>
         <body style="font-family: Arial, sans-serif; background-color: #f5f5f5; padding: 20px;">
             <div style="max-width: 600px; margin: 0 auto; background-color: white; padding: 30px; border-radius: 10px; box-shadow: 0 0 10px rgba(0,0,0,0.1);">
@@ -117,6 +262,24 @@ async def send_approval_email(email: str, employee_name: str, employee_id: str):
         </body>
     </html>
     """
+
+async def send_approval_email(email: str, employee_name: str, employee_id: str):
+    return await send_email(email, APPROVAL_SUBJECT, build_approval_email(employee_name, employee_id))
+
+async def send_approval_emails(recipients):
+    """
+    Queue approval emails for a batch of employees in one call
     
-    email_sent = await send_email(email, subject, body)
-    return email_sent
\ No newline at end of file
+    Args:
+        recipients: Sequence of (email, employee_name, employee_id)
+    
+    Returns:
+        Delivery IDs in the same order, None where a message could not be queued
+    """
+    messages = [
+        (email, APPROVAL_SUBJECT, build_approval_email(employee_name, employee_id))
+        for email, employee_name, employee_id in recipients
+    ]
+    delivery_ids = mail_dispatcher.enqueue_many(messages)
+    print(f"📧 Queued {sum(1 for d in delivery_ids if d)}/{len(messages)} approval emails")
+    return delivery_ids
@@ -1,5 +1,9 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import hashlib
+import threading
+from app.config import settings
 
 pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
 
@@ -11,4 +15,60 @@ def get_password_hash(password):
 
 def get_deterministic_hash(value):
     """Returns SHA-256 hash of the value for deterministic matching (e.g. CNIC)"""
-    return hashlib.sha256(value.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+class HashingExecutor:
+    """
+    Bounded worker pool for Argon2 hashing and verification
+
+    argon2-cffi releases the GIL while hashing, so a thread pool spreads the
+    work across all cores while the event loop keeps serving other requests.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="argon2")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._peak_queued = 0
+
+    async def run(self, func, *args):
+        with self._lock:
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._tracked_call, func, args)
+
+    def _tracked_call(self, func, args):
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+
+    def stats(self) -> dict:
+        """Return queue-depth metrics for monitoring"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self._queued,
+                "active": self._active,
+                "completed": self._completed,
+                "peak_queued": self._peak_queued
+            }
+
+
+hashing_executor = HashingExecutor(settings.HASH_WORKERS)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await hashing_executor.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await hashing_executor.run(get_password_hash, password)
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import secrets
+import threading
+from collections import deque
+from datetime import date
+from app.config import settings
+
+EVENT_TOPICS = ("attendance", "approval", "stats")
+
+class Subscription:
+    """One connected dashboard: a bounded queue plus what it wants to see"""
+    
+    __slots__ = ("queue", "topics", "employee_id", "overflowed")
+    
+    def __init__(self, topics, employee_id: int = None, queue_size: int = 256):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.topics = frozenset(topics)
+        self.employee_id = employee_id
+        self.overflowed = False
+    
+    def wants(self, topic: str, data: dict) -> bool:
+        if topic not in self.topics:
+            return False
+        # Employees only see their own records
+        return self.employee_id is None or data.get("employee_id") == self.employee_id
+
+class EventBroker:
+    """
+    In-process pub/sub that fans dashboard events out to SSE subscribers
+    
+    Publishing is a non-blocking put into each matching subscriber's
+    bounded queue. A subscriber that falls behind is marked overflowed and
+    told to resync rather than slowing down publishers. An idle
+    subscriber costs one small queue and one parked coroutine, so
+    thousands of open dashboards are cheap.
+    
+    Recent events are kept in a ring buffer so a client reconnecting with
+    Last-Event-ID is replayed what it missed. If the gap is too old, the
+    client is told to resync.
+    
+    The broker only sees writes handled by its own process. Event ids are
+    "<instance>-<n>", with an instance tag picked at startup. A client
+    that reconnects to another worker, or to a restarted one, presents an
+    id from a different instance and is told to resync rather than
+    replayed the wrong events. Under several workers, dashboards also keep
+    a slow conditional-GET poll for writes handled elsewhere (see
+    frontend/js/live-updates.js).
+    """
+    
+    def __init__(self, queue_size: int = None, history_size: int = None):
+        self.queue_size = queue_size or settings.EVENT_QUEUE_SIZE
+        self.instance = secrets.token_hex(4)
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size or settings.EVENT_HISTORY_SIZE)
+        self._next_id = 1
+        self._loop = None
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped_subscribers = 0
+    
+    def subscribe(self, topics, employee_id: int = None, last_event_id: int = None):
+        """
+        Register a subscriber
+        
+        Args:
+            topics: Iterable of topic names to receive
+            employee_id: Restrict events to this employee (employee dashboards)
+            last_event_id: Last id the client saw ("<instance>-<n>"), for replay after reconnecting
+        
+        Returns:
+            tuple: (Subscription, list of missed events or None if a resync is needed)
+        """
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(topics, employee_id, self.queue_size)
+        
+        missed = []
+        if last_event_id:
+            instance, _, sequence = last_event_id.rpartition("-")
+            last_event_id = int(sequence) if instance == self.instance and sequence.isdigit() else None
+            if last_event_id is None:
+                missed = None  # an id from another worker or an earlier run
+        if last_event_id is not None:
+            with self._lock:
+                oldest = self._history[0][0] if self._history else self._next_id
+                if last_event_id + 1 < oldest:
+                    missed = None
+                else:
+                    missed = [event for event in self._history
+                              if event[0] > last_event_id and subscription.wants(event[1], event[2])]
+        
+        self._subscribers.add(subscription)
+        return subscription, missed
+    
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+    
+    def publish(self, topic: str, data: dict) -> int:
+        """
+        Publish an event to every interested subscriber
+        
+        Safe to call from worker threads; delivery then hops onto the event loop.
+        
+        Returns:
+            int: The event's sequence number in this process
+        """
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            event = (event_id, topic, data)
+            self._history.append(event)
+        self.published += 1
+        
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        
+        if running_loop is not None and running_loop is self._loop:
+            self._deliver(event)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._deliver, event)
+        return event_id
+    
+    def _deliver(self, event):
+        _, topic, data = event
+        for subscription in list(self._subscribers):
+            if subscription.overflowed or not subscription.wants(topic, data):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too slow to keep up: stop feeding it; the stream tells the client to resync
+                subscription.overflowed = True
+                self.dropped_subscribers += 1
+    
+    def event_id(self, sequence: int) -> str:
+        return f"{self.instance}-{sequence}"
+    
+    @property
+    def last_event_id(self) -> str:
+        return self.event_id(self._next_id - 1)
+    
+    def stats(self) -> dict:
+        return {
+            "instance": self.instance,
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "history": len(self._history),
+            "last_event_id": self.last_event_id,
+            "dropped_subscribers": self.dropped_subscribers
+        }
+
+def format_sse(event_id, topic: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {topic}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+async def event_stream(subscription: Subscription, missed, heartbeat: float = None):
+    """
+    SSE body for one subscriber: replayed events, then live events, with a
+    comment heartbeat so idle connections survive proxies
+    
+    The subscription is removed when the client disconnects and the
+    response task is cancelled.
+    """
+    heartbeat = heartbeat or settings.EVENT_HEARTBEAT_SECONDS
+    try:
+        yield f"retry: {settings.EVENT_RETRY_MS}\n\n"
+        if missed is None:
+            yield format_sse(event_broker.last_event_id, "resync", {"reason": "history"})
+        else:
+            for sequence, topic, data in missed:
+                yield format_sse(event_broker.event_id(sequence), topic, data)
+        
+        while True:
+            if subscription.overflowed:
+                yield format_sse(event_broker.last_event_id, "resync", {"reason": "overflow"})
+                return
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            sequence, topic, data = event
+            yield format_sse(event_broker.event_id(sequence), topic, data)
+    finally:
+        event_broker.unsubscribe(subscription)
+
+event_broker = EventBroker()
+
+def publish_attendance(records, replaced: int = 0):
+    """
+    Announce committed attendance records and the matching stat deltas
+    
+    Args:
+        records: Attendance rows (or objects with the same attributes)
+        replaced: How many of them overwrote an absence rather than adding a day
+    """
+    present_today = 0
+    today = date.today()
+    for record in records:
+        event_broker.publish("attendance", {
+            "id": record.id,
+            "change_seq": record.change_seq,
+            "employee_id": record.employee_id,
+            "status": record.status,
+            "attendance_day": record.attendance_day.isoformat() if record.attendance_day else None,
+            "marked_at": record.marked_at.isoformat() if record.marked_at else None,
+            "location_name": record.location_name
+        })
+        if record.status == "present" and record.attendance_day == today:
+            present_today += 1
+    if records:
+        event_broker.publish("stats", {"delta": {"total_attendance": len(records) - replaced, "present_today": present_today}})
+
+def publish_approvals(employee_ids, action: str):
+    """
+    Announce approval state changes and the matching stat deltas
+    
+    Args:
+        employee_ids: Internal ids of the affected employees
+        action: "pending" (new signup), "approved" or "disapproved"
+    """
+    for employee_id in employee_ids:
+        event_broker.publish("approval", {"employee_id": employee_id, "action": action})
+    count = len(employee_ids)
+    if not count:
+        return
+    if action == "pending":
+        delta = {"pending": count}
+    elif action == "approved":
+        delta = {"pending": -count, "total_employees": count}
+    else:
+        delta = {"pending": -count}
+    event_broker.publish("stats", {"delta": delta})
@@ -0,0 +1,324 @@
+import asyncio
+import json
+import math
+from bisect import bisect_left
+from datetime import datetime
+from sqlalchemy import select, func, insert
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.database import engine
+from app.models import Geofence
+
+# The bounding box check-ins were validated against before fences were
+# configurable; seeded as the first fence so existing installs keep working
+DEFAULT_GEOFENCE_NAME = "NUST H-12 Islamabad"
+DEFAULT_GEOFENCE_POLYGON = [[33.60, 72.95], [33.60, 73.25], [33.70, 73.25], [33.70, 72.95]]
+
+# Upper bound on grid cells across all fences; the cell size doubles until the grid fits
+GEOFENCE_GRID_MAX_CELLS = 1_000_000
+
+def parse_polygon(value) -> list:
+    """
+    Validate a polygon given as [[lat, lon], ...] (or its JSON text)
+    
+    A closing vertex equal to the first one is dropped.
+    
+    Raises:
+        ValueError: If the polygon is malformed
+    
+    Returns:
+        list: [(lat, lon), ...] with at least three vertices
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise ValueError("Polygon is not valid JSON")
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("Polygon must be a list of [latitude, longitude] pairs")
+    
+    vertices = []
+    for point in value:
+        if (not isinstance(point, (list, tuple)) or len(point) != 2
+                or not all(isinstance(coord, (int, float)) and not isinstance(coord, bool) for coord in point)):
+            raise ValueError("Polygon must be a list of [latitude, longitude] pairs")
+        lat, lon = float(point[0]), float(point[1])
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Vertex out of range: [{lat}, {lon}]")
+        vertices.append((lat, lon))
+    if len(vertices) > 1 and vertices[0] == vertices[-1]:
+        vertices.pop()
+    if len(vertices) < 3:
+        raise ValueError("Polygon needs at least three vertices")
+    return vertices
+
+class Fence:
+    """One active geofence: a simple polygon of (lat, lon) vertices"""
+    
+    def __init__(self, fence_id: int, name: str, vertices):
+        self.id = fence_id
+        self.name = name
+        self.vertices = list(vertices)
+        self.min_lat = min(lat for lat, _ in self.vertices)
+        self.max_lat = max(lat for lat, _ in self.vertices)
+        self.min_lon = min(lon for _, lon in self.vertices)
+        self.max_lon = max(lon for _, lon in self.vertices)
+        # Edges that can cross a line of constant latitude, with the
+        # longitude step per degree of latitude precomputed
+        self.edges = [
+            (lat1, lon1, lat2, (lon2 - lon1) / (lat2 - lat1))
+            for (lat1, lon1), (lat2, lon2) in zip(self.vertices, self.vertices[1:] + self.vertices[:1])
+            if lat1 != lat2
+        ]
+    
+    def contains(self, lat: float, lon: float) -> bool:
+        """Even-odd ray cast towards increasing longitude"""
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon):
+            return False
+        inside = False
+        for lat1, lon1, lat2, slope in self.edges:
+            if (lat1 > lat) != (lat2 > lat) and lon < lon1 + (lat - lat1) * slope:
+                inside = not inside
+        return inside
+    
+    def contains_many(self, latitudes, longitudes) -> list:
+        """
+        Ray cast a column of points, one edge at a time across all of them
+        
+        Returns:
+            list: One boolean per point
+        """
+        inside = [False] * len(latitudes)
+        points = list(enumerate(zip(latitudes, longitudes)))
+        for lat1, lon1, lat2, slope in self.edges:
+            low, high = (lat1, lat2) if lat1 < lat2 else (lat2, lat1)
+            for position, (lat, lon) in points:
+                if low <= lat < high and lon < lon1 + (lat - lat1) * slope:
+                    inside[position] = not inside[position]
+        return inside
+    
+    def crossings(self, lat: float) -> list:
+        """Sorted longitudes where the line at `lat` crosses the outline"""
+        return sorted(
+            lon1 + (lat - lat1) * slope
+            for lat1, lon1, lat2, slope in self.edges
+            if (lat1 > lat) != (lat2 > lat)
+        )
+
+class GeofenceIndex:
+    """
+    Uniform grid over all fences, built once per fence set
+    
+    Every cell a fence touches records whether the cell lies entirely
+    inside that fence or is crossed by its outline. Points in an inside
+    cell resolve with a dictionary lookup; only points in outline cells
+    need a point-in-polygon test. Where fences overlap, the one created
+    first wins.
+    """
+    
+    def __init__(self, fences, cell_size: float = None):
+        self.fences = list(fences)
+        self.cells = {}
+        if not self.fences:
+            self.cell_size = cell_size or settings.GEOFENCE_GRID_CELL_DEGREES
+            self.origin = (0.0, 0.0)
+            return
+        
+        self.origin = (min(fence.min_lat for fence in self.fences), min(fence.min_lon for fence in self.fences))
+        cell_size = cell_size or settings.GEOFENCE_GRID_CELL_DEGREES
+        while sum(self._bbox_cell_count(fence, cell_size) for fence in self.fences) > GEOFENCE_GRID_MAX_CELLS:
+            cell_size *= 2
+        self.cell_size = cell_size
+        for position, fence in enumerate(self.fences):
+            self._add_fence(position, fence)
+    
+    def _bbox_cell_count(self, fence: Fence, cell_size: float) -> int:
+        rows = int((fence.max_lat - fence.min_lat) / cell_size) + 2
+        columns = int((fence.max_lon - fence.min_lon) / cell_size) + 2
+        return rows * columns
+    
+    def cell_of(self, lat: float, lon: float) -> tuple:
+        return (
+            math.floor((lat - self.origin[0]) / self.cell_size),
+            math.floor((lon - self.origin[1]) / self.cell_size)
+        )
+    
+    def _outline_cells(self, fence: Fence) -> set:
+        """Cells the outline passes through, found column by column along each edge"""
+        size = self.cell_size
+        origin_lat, origin_lon = self.origin
+        cells = set()
+        for (lat1, lon1), (lat2, lon2) in zip(fence.vertices, fence.vertices[1:] + fence.vertices[:1]):
+            first_column, last_column = sorted((self.cell_of(lat1, lon1)[1], self.cell_of(lat2, lon2)[1]))
+            for column in range(first_column, last_column + 1):
+                if lon1 == lon2:
+                    low, high = sorted((lat1, lat2))
+                else:
+                    # The part of the edge inside this column's longitude slab
+                    slab_west = max(min(lon1, lon2), origin_lon + column * size)
+                    slab_east = min(max(lon1, lon2), origin_lon + (column + 1) * size)
+                    ends = [lat1 + (slab_lon - lon1) * (lat2 - lat1) / (lon2 - lon1) for slab_lon in (slab_west, slab_east)]
+                    low, high = min(ends), max(ends)
+                for row in range(self.cell_of(low, 0)[0], self.cell_of(high, 0)[0] + 1):
+                    cells.add((row, column))
+        return cells
+    
+    def _add_fence(self, position: int, fence: Fence):
+        size = self.cell_size
+        origin_lat, origin_lon = self.origin
+        outline = self._outline_cells(fence)
+        for cell in outline:
+            self.cells.setdefault(cell, []).append((position, False))
+        
+        first_row, first_column = self.cell_of(fence.min_lat, fence.min_lon)
+        last_row, last_column = self.cell_of(fence.max_lat, fence.max_lon)
+        for row in range(first_row, last_row + 1):
+            # A cell the outline does not cross is inside iff its centre is
+            crossings = fence.crossings(origin_lat + (row + 0.5) * size)
+            if not crossings:
+                continue
+            for column in range(first_column, last_column + 1):
+                if (row, column) in outline:
+                    continue
+                if bisect_left(crossings, origin_lon + (column + 0.5) * size) % 2:
+                    self.cells.setdefault((row, column), []).append((position, True))
+    
+    def locate(self, lat: float, lon: float):
+        """
+        Returns:
+            Fence: The fence containing the point, or None
+        """
+        for position, inside in self.cells.get(self.cell_of(lat, lon), ()):
+            fence = self.fences[position]
+            if inside or fence.contains(lat, lon):
+                return fence
+        return None
+    
+    def locate_many(self, latitudes, longitudes) -> list:
+        """
+        Locate a batch of points
+        
+        Points are bucketed by grid cell first; the ones left in outline
+        cells are then tested a fence at a time, each fence against all
+        of its candidate points in one pass.
+        
+        Returns:
+            list: Fence or None per point
+        """
+        located = [None] * len(latitudes)
+        pending = []  # (point index, cell entries, position of the next entry to try)
+        for index, (lat, lon) in enumerate(zip(latitudes, longitudes)):
+            entries = self.cells.get(self.cell_of(lat, lon))
+            if entries:
+                pending.append((index, entries, 0))
+        
+        while pending:
+            candidates = {}
+            for item in pending:
+                index, entries, next_entry = item
+                position, inside = entries[next_entry]
+                if inside:
+                    located[index] = self.fences[position]
+                else:
+                    candidates.setdefault(position, []).append(item)
+            
+            pending = []
+            for position, items in candidates.items():
+                fence = self.fences[position]
+                hits = fence.contains_many(
+                    [latitudes[index] for index, _, _ in items], [longitudes[index] for index, _, _ in items]
+                )
+                for (index, entries, next_entry), hit in zip(items, hits):
+                    if hit:
+                        located[index] = fence
+                    elif next_entry + 1 < len(entries):
+                        pending.append((index, entries, next_entry + 1))
+        return located
+
+def load_fences(connection) -> list:
+    rows = connection.execute(
+        select(Geofence.id, Geofence.name, Geofence.polygon)
+        .where(Geofence.is_active == True)
+        .order_by(Geofence.id)
+    ).all()
+    fences = []
+    for fence_id, name, polygon in rows:
+        try:
+            fences.append(Fence(fence_id, name, parse_polygon(polygon)))
+        except ValueError as e:
+            print(f"[!] Skipping geofence {name!r}: {str(e)}")
+    return fences
+
+def fence_set_version(connection) -> tuple:
+    """Changes whenever a fence is added, edited, toggled or deleted"""
+    return tuple(connection.execute(select(func.count(Geofence.id), func.max(Geofence.updated_at))).one())
+
+def ensure_default_geofence(bind):
+    """Seed the original campus box when no fence has been configured yet"""
+    with bind.begin() as conn:
+        if conn.execute(select(Geofence.id).limit(1)).first():
+            return
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(Geofence).values(
+                    name=DEFAULT_GEOFENCE_NAME,
+                    polygon=json.dumps(DEFAULT_GEOFENCE_POLYGON),
+                    is_active=True,
+                    updated_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            pass  # another worker seeded it first
+
+class GeofenceRegistry:
+    """
+    The in-memory index check-ins are matched against
+    
+    Loaded at startup and swapped whole when the fence set changes; this
+    worker reloads right after editing a fence, others pick the change up
+    within GEOFENCE_REFRESH_SECONDS.
+    """
+    
+    def __init__(self):
+        self._index = None
+        self._version = None
+    
+    def load(self, bind=engine) -> GeofenceIndex:
+        """Rebuild the index from the database (blocking)"""
+        with bind.connect() as conn:
+            version = fence_set_version(conn)
+            fences = load_fences(conn)
+        self._index, self._version = GeofenceIndex(fences), version
+        print(f"[✓] Loaded {len(fences)} geofence(s)")
+        return self._index
+    
+    async def reload(self):
+        return await asyncio.to_thread(self.load)
+    
+    @property
+    def index(self) -> GeofenceIndex:
+        if self._index is None:
+            # Normally loaded at startup; scripts calling the ingest helpers directly load on first use
+            self.load()
+        return self._index
+    
+    def locate(self, lat: float, lon: float):
+        return self.index.locate(lat, lon)
+    
+    def locate_many(self, latitudes, longitudes) -> list:
+        return self.index.locate_many(latitudes, longitudes)
+    
+    def _changed(self) -> bool:
+        with engine.connect() as conn:
+            return fence_set_version(conn) != self._version
+    
+    async def watch(self):
+        """Background task picking up fence changes made by other workers"""
+        while True:
+            await asyncio.sleep(settings.GEOFENCE_REFRESH_SECONDS)
+            try:
+                if await asyncio.to_thread(self._changed):
+                    await self.reload()
+            except Exception as e:
+                print(f"[ERROR] Geofence refresh failed: {str(e)}")
+
+geofences = GeofenceRegistry()
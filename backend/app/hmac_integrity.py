@@ -1,13 +1,80 @@
 import hmac
 import hashlib
 import os
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
+from sqlalchemy import event
+from app.models import Attendance
+from app.worker_pool import ChunkedThreadPool
 
 load_dotenv()
 
+# Below this many rows a thread pool costs more than it saves
+PARALLEL_VERIFY_THRESHOLD = int(os.getenv("HMAC_PARALLEL_THRESHOLD", 50000))
+VERIFY_WORKERS = int(os.getenv("HMAC_WORKERS", 1))
+VERDICT_CACHE_SIZE = int(os.getenv("HMAC_VERDICT_CACHE_SIZE", 100000))
+
+class IntegrityVerdictCache:
+    """
+    Bounded LRU cache of HMAC verdicts per attendance row
+    
+    Entries are keyed by attendance id and tagged with the row version: the
+    stored HMAC plus every signed field. A verdict is only reused while the
+    row still carries exactly that content, so an out-of-band edit (even one
+    that bypasses the ORM write hooks) misses the cache and is re-verified.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, attendance_id: int, row_version: tuple):
+        with self._lock:
+            entry = self._entries.get(attendance_id)
+            if entry is None or entry[0] != row_version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(attendance_id)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, attendance_id: int, row_version: tuple, verdict: bool):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[attendance_id] = (row_version, verdict)
+            self._entries.move_to_end(attendance_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, attendance_id: int):
+        with self._lock:
+            self._entries.pop(attendance_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
 class HMACIntegrity:
     def __init__(self):
         self.secret_key = os.getenv("HMAC_SECRET_KEY", "your-super-secret-hmac-key-change-in-production").encode()
+        # Pre-keyed state: .copy() skips re-deriving the inner/outer pads per row
+        self._keyed_hmac = hmac.new(self.secret_key, digestmod=hashlib.sha256)
+        self.pool = ChunkedThreadPool(VERIFY_WORKERS, thread_name_prefix="hmac")
+        self.verdict_cache = IntegrityVerdictCache(VERDICT_CACHE_SIZE)
     
     def compute_attendance_hmac(self, employee_id: int, date_str: str, status: str, latitude: str = "", longitude: str = "") -> str:
         """
@@ -28,13 +95,28 @@ class HMACIntegrity:
         """
         data_to_sign = f"{employee_id}|{date_str}|{status}|{latitude}|{longitude}".encode()
         
-        signature = hmac.new(
-            self.secret_key,
-            data_to_sign,
-            hashlib.sha256
-        ).hexdigest()
+        signature = self._keyed_hmac.copy()
+        signature.update(data_to_sign)
         
-        return signature
+        return signature.hexdigest()
+    
+    def compute_attendance_hmacs(self, rows) -> list:
+        """
+        Sign many attendance rows in one pass
+        
+        Args:
+            rows: Sequence of (employee_id, date_str, status, latitude, longitude)
+        
+        Returns:
+            List of hex signatures in the same order as rows
+        """
+        keyed_hmac = self._keyed_hmac
+        signatures = []
+        for employee_id, date_str, status, latitude, longitude in rows:
+            signature = keyed_hmac.copy()
+            signature.update(f"{employee_id}|{date_str}|{status}|{latitude}|{longitude}".encode())
+            signatures.append(signature.hexdigest())
+        return signatures
     
     def verify_attendance_hmac(self, employee_id: int, date_str: str, status: str, stored_hmac: str, latitude: str = "", longitude: str = "") -> bool:
         """
@@ -54,6 +136,87 @@ class HMACIntegrity:
         computed_hmac = self.compute_attendance_hmac(employee_id, date_str, status, latitude, longitude)
         
         return hmac.compare_digest(computed_hmac, stored_hmac)
+    
+    def verify_attendance_rows(self, rows, max_workers: int = None) -> list:
+        """
+        Verify many attendance rows in one pass
+        
+        Args:
+            rows: Sequence of (employee_id, date_str, status, stored_hmac, latitude, longitude)
+            max_workers: Chunks to split a large batch into (default: HMAC_WORKERS);
+                the pool itself always has HMAC_WORKERS threads
+        
+        Returns:
+            List of booleans in the same order as rows
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        max_workers = max_workers or VERIFY_WORKERS
+        
+        if max_workers <= 1 or len(rows) < PARALLEL_VERIFY_THRESHOLD:
+            return self._verify_chunk(rows)
+        
+        return self.pool.map_chunks(self._verify_chunk, rows, chunks=max_workers)
+    
+    def verify_attendance_columns(self, employee_ids, date_strs, statuses, stored_hmacs, latitudes, longitudes, max_workers: int = None) -> list:
+        """Column-oriented variant of verify_attendance_rows"""
+        return self.verify_attendance_rows(
+            list(zip(employee_ids, date_strs, statuses, stored_hmacs, latitudes, longitudes)),
+            max_workers=max_workers
+        )
+    
+    def verify_attendance_records(self, records, max_workers: int = None) -> list:
+        """
+        Verify a sequence of Attendance model instances
+        
+        Rows whose content is unchanged since their last verification are
+        answered from the verdict cache; only the rest are recomputed.
+        """
+        records = records if isinstance(records, list) else list(records)
+        rows = [attendance_signing_row(record) for record in records]
+        verdicts = [None] * len(rows)
+        
+        pending = []
+        for index, (record, row) in enumerate(zip(records, rows)):
+            verdict = self.verdict_cache.get(record.id, row)
+            if verdict is None:
+                pending.append(index)
+            else:
+                verdicts[index] = verdict
+        
+        if pending:
+            computed = self.verify_attendance_rows([rows[i] for i in pending], max_workers=max_workers)
+            for index, verdict in zip(pending, computed):
+                verdicts[index] = verdict
+                self.verdict_cache.put(records[index].id, rows[index], verdict)
+        
+        return verdicts
+    
+    def _verify_chunk(self, rows) -> list:
+        keyed_hmac = self._keyed_hmac
+        compare_digest = hmac.compare_digest
+        results = []
+        for employee_id, date_str, status, stored_hmac, latitude, longitude in rows:
+            signature = keyed_hmac.copy()
+            signature.update(f"{employee_id}|{date_str}|{status}|{latitude}|{longitude}".encode())
+            results.append(compare_digest(signature.hexdigest(), stored_hmac or ""))
+        return results
+
+
+def attendance_signing_row(record) -> tuple:
+    """Fields of an Attendance record covered by its HMAC, plus the stored HMAC"""
+    return (
+        record.employee_id,
+        record.date.date().isoformat() if record.date else "",
+        record.status,
+        record.hmac,
+        record.latitude or "",
+        record.longitude or ""
+    )
 
 
 hmac_integrity = HMACIntegrity()
+
+@event.listens_for(Attendance, "after_update")
+@event.listens_for(Attendance, "after_delete")
+def _invalidate_cached_verdict(mapper, connection, target):
+    hmac_integrity.verdict_cache.invalidate(target.id)
@@ -0,0 +1,207 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks; generate keys before starting workers
+    fcntl = None
+
+PRIVATE_KEY_FILE = "rsa_private.pem"
+PUBLIC_KEY_FILE = "rsa_public.pem"
+RSA_KEY_SIZE = 4096
+
+class KeyNotFoundError(RuntimeError):
+    """Raised when the RSA key pair has not been generated yet"""
+
+@contextmanager
+def key_generation_lock(key_dir: str):
+    """
+    Exclusive cross-process lock around key generation so that concurrent
+    generators agree on one key pair instead of each writing their own
+    """
+    os.makedirs(key_dir, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    
+    with open(os.path.join(key_dir, ".keygen.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_key_file(path: str, data: bytes, mode: int = 0o644):
+    """Write via a temp file and rename so readers never see a partial PEM"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+class KeyManager:
+    """
+    Single owner of the RSA-4096 key pair
+    
+    Nothing is read at import time: the private key file is parsed once, on
+    first use, and shared by every consumer (pq_crypto, rsa_key_exchange).
+    Keys are never generated implicitly; run `python generate_keys.py`.
+    """
+    
+    def __init__(self, key_dir: str = None):
+        self.key_dir = key_dir or settings.KEY_DIR
+        self._private_key = None
+        self._public_key = None
+        self._public_key_pem = None
+        self._lock = threading.Lock()
+        self._loaded_stamp = None  # (mtime_ns, size) of rsa_private.pem when it was parsed
+        self._checked_at = 0.0
+        self.version = 0  # bumped on every (re)load so derived caches know to rebuild
+    
+    @property
+    def private_key_path(self) -> str:
+        return os.path.join(self.key_dir, PRIVATE_KEY_FILE)
+    
+    @property
+    def public_key_path(self) -> str:
+        return os.path.join(self.key_dir, PUBLIC_KEY_FILE)
+    
+    def keys_exist(self) -> bool:
+        return os.path.exists(self.private_key_path) and os.path.exists(self.public_key_path)
+    
+    def _file_stamp(self):
+        stat = os.stat(self.private_key_path)
+        return stat.st_mtime_ns, stat.st_size
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._private_key is not None
+    
+    def _load(self):
+        with self._lock:
+            if self._private_key is not None:
+                return
+            if not self.keys_exist():
+                raise KeyNotFoundError(
+                    f"RSA key pair not found in {self.key_dir}; run `python generate_keys.py` first"
+                )
+            stamp = self._file_stamp()
+            with open(self.private_key_path, "rb") as f:
+                private_key = serialization.load_pem_private_key(
+                    f.read(),
+                    password=None,
+                    backend=default_backend()
+                )
+            # Derived from the private key rather than parsing rsa_public.pem a second time
+            self._public_key = private_key.public_key()
+            self._public_key_pem = self._public_key.public_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo
+            ).decode('utf-8')
+            self._private_key = private_key
+            self._loaded_stamp = stamp
+            self.version += 1
+    
+    @property
+    def private_key(self):
+        if self._private_key is None:
+            self._load()
+        return self._private_key
+    
+    @property
+    def public_key(self):
+        if self._public_key is None:
+            self._load()
+        return self._public_key
+    
+    @property
+    def public_key_pem(self) -> str:
+        if self._public_key_pem is None:
+            self._load()
+        return self._public_key_pem
+    
+    def refresh_if_rotated(self, interval: float = None) -> bool:
+        """
+        Reload the keys if rsa_private.pem changed on disk since it was
+        parsed (e.g. `generate_keys.py --force` while servers are running)
+        
+        The file is stat'ed at most once per `interval` seconds, so this is
+        cheap enough to call on every request.
+        
+        Args:
+            interval: Minimum seconds between checks (default: KEY_ROTATION_CHECK_SECONDS)
+        
+        Returns:
+            bool: True if the keys were dropped and will be re-read
+        """
+        interval = settings.KEY_ROTATION_CHECK_SECONDS if interval is None else interval
+        now = time.monotonic()
+        if not self.is_loaded or now - self._checked_at < interval:
+            return False
+        self._checked_at = now
+        
+        try:
+            rotated = self._file_stamp() != self._loaded_stamp
+        except FileNotFoundError:
+            return False
+        if rotated:
+            self.reload()
+        return rotated
+    
+    def reload(self):
+        """Drop the cached keys so the next access re-reads them from disk"""
+        with self._lock:
+            self._private_key = None
+            self._public_key = None
+            self._public_key_pem = None
+            self._loaded_stamp = None
+    
+    def generate_keys(self, overwrite: bool = False) -> bool:
+        """
+        Generate and store a new RSA-4096 key pair
+        
+        Args:
+            overwrite: Replace an existing key pair
+        
+        Returns:
+            bool: True if a new pair was written, False if one already existed
+        """
+        with key_generation_lock(self.key_dir):
+            # Another process may have generated them while we waited
+            if self.keys_exist() and not overwrite:
+                return False
+            
+            private_key = rsa.generate_private_key(
+                public_exponent=65537,
+                key_size=RSA_KEY_SIZE,
+                backend=default_backend()
+            )
+            private_pem = private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.TraditionalOpenSSL,
+                encryption_algorithm=serialization.NoEncryption()
+            )
+            public_pem = private_key.public_key().public_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo
+            )
+            
+            # Public key last: both files existing means the pair is complete
+            write_key_file(self.private_key_path, private_pem, mode=0o600)
+            write_key_file(self.public_key_path, public_pem)
+        
+        self.reload()
+        return True
+
+key_manager = KeyManager()
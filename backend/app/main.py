@@ -1,30 +1,44 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, date
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, func, or_, and_, union
+from datetime import datetime, date, timedelta
 import random
 import string
+import asyncio
 from pydantic import BaseModel
+from typing import List, Optional
 import traceback
+import json
 import os
 
-from app.database import get_db, engine, Base
-from app.models import User, Employee, Attendance, OTP
-from app.encryption import verify_password, get_password_hash, get_deterministic_hash
-from app.email_service import send_otp_email, send_approval_email
+from app.config import settings
+from app.database import get_db, get_async_db, engine, AsyncSessionLocal, unique_violation_columns, is_foreign_key_violation
+from app.models import User, Employee, Attendance, AttendanceMonthlySummary, Geofence
+from app.encryption import verify_password_async, get_password_hash_async, get_deterministic_hash, hashing_executor
+from app.email_service import send_otp_email, send_approval_email, send_approval_emails, mail_dispatcher
+from app.otp_store import otp_store
 from app.password_validator import password_validator
-from app.auth import create_access_token
 from app.pq_crypto import pq_crypto
 from app.hmac_integrity import hmac_integrity
 from app.aes_encryption import aes_encryption
 from app.rsa_key_exchange import rsa_key_exchange
+from app.report_export import export_query, stream_csv, stream_ndjson, stream_txt, EXPORT_MEDIA_TYPES
+from app.schema import create_schema, is_postgresql, maintain_attendance_partitions
+from app.key_manager import key_manager
+from app.public_key_cache import public_key_response
+from app.change_tracking import read_change_state
+from app.absence_job import run_absence_job
+from app.checkin_buffer import checkin_buffer, DuplicateCheckIn, UnknownEmployee, CheckInBufferError
+from app.attendance_ingest import ingest_attendance, location_name, DUPLICATE
+from app.geofence import geofences, parse_polygon
+from app.events import event_broker, event_stream, publish_attendance, publish_approvals, EVENT_TOPICS
+from app.auth import create_access_token, verify_token, create_event_ticket, verify_event_ticket
 import re
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(title="Employee Attendance System")
 
 app.add_middleware(
@@ -46,6 +60,35 @@ async def global_exception_handler(request, exc):
         content={"detail": f"Server error: {str(exc)}"}
     )
 
+background_tasks = []
+
+@app.on_event("startup")
+async def start_background_services():
+    # Create tables at startup rather than at import, off the event loop
+    await asyncio.to_thread(create_schema, engine)
+    await geofences.reload()
+    if not key_manager.keys_exist():
+        print(f"⚠️  RSA key pair missing in {key_manager.key_dir}; run `python generate_keys.py`")
+    await mail_dispatcher.start()
+    if settings.ATTENDANCE_WRITE_BEHIND:
+        await checkin_buffer.start()
+    if is_postgresql(engine):
+        background_tasks.append(asyncio.create_task(maintain_attendance_partitions(engine)))
+    if settings.ABSENCE_JOB_ENABLED and settings.WORKER_PROCESSES == 1:
+        # With several workers, run.py runs the job once in the launcher instead
+        background_tasks.append(asyncio.create_task(run_absence_job()))
+    background_tasks.append(asyncio.create_task(geofences.watch()))
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    await checkin_buffer.stop()
+    await mail_dispatcher.stop()
+    hmac_integrity.pool.shutdown()
+    aes_encryption.pool.shutdown()
+
 # Pydantic models
 class EmployeeSignup(BaseModel):
     full_name: str
@@ -70,26 +113,40 @@ class MarkAttendanceRequest(BaseModel):
     employee_id: int
     latitude: float
     longitude: float
-    location_name: str = ""
+
+class AttendanceBatchRecord(BaseModel):
+    employee_id: int
+    latitude: float
+    longitude: float
+    marked_at: Optional[datetime] = None  # when the kiosk recorded it; defaults to upload time
+
+class GeofenceRequest(BaseModel):
+    name: str
+    polygon: List[List[float]]  # [[lat, lon], ...]
+    is_active: bool = True
 
 def validate_email(email: str) -> bool:
     """Validate email format using regex pattern"""
     pattern = r'^[^\s@]+@[^\s@]+\.[^\s@]+$'
     return re.match(pattern, email) is not None
 
-def validate_location(latitude: float, longitude: float) -> bool:
-    ALLOWED_LAT_RANGE = (33.60, 33.70)
-    ALLOWED_LON_RANGE = (72.95, 73.25)
-    
-    is_valid = (ALLOWED_LAT_RANGE[0] <= latitude <= ALLOWED_LAT_RANGE[1] and 
-            ALLOWED_LON_RANGE[0] <= longitude <= ALLOWED_LON_RANGE[1])
-    
-    print("[DEBUG] Location validation:")
-    print("  Latitude: {} (range: {}-{})".format(latitude, ALLOWED_LAT_RANGE[0], ALLOWED_LAT_RANGE[1]))
-    print("  Longitude: {} (range: {}-{})".format(longitude, ALLOWED_LON_RANGE[0], ALLOWED_LON_RANGE[1]))
-    print("  Valid: {}".format(is_valid))
-    
-    return is_valid
+def parse_date_range(start_date: str, end_date: str, default_days: int):
+    """Resolve optional YYYY-MM-DD query strings to a (start, end) pair of dates"""
+    try:
+        end_day = date.fromisoformat(end_date) if end_date else date.today()
+        start_day = date.fromisoformat(start_date) if start_date else date.today() - timedelta(days=default_days)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    return start_day, end_day
+
+def geofence_response(fence: Geofence) -> dict:
+    return {
+        "id": fence.id,
+        "name": fence.name,
+        "polygon": parse_polygon(fence.polygon),
+        "is_active": fence.is_active,
+        "updated_at": fence.updated_at.isoformat() if fence.updated_at else None
+    }
 
 # Routes
 @app.get("/api/test")
@@ -101,24 +158,9 @@ async def options_handler(path: str):
     return {"message": "OK"}
 
 @app.get("/api/security/public-key")
-async def get_public_key():
-    """Return RSA-4096 public key for encryption"""
-    try:
-        with open("certs/rsa_public.pem", "r") as f:
-            rsa_public_key = f.read()
-        
-        return {
-            "algorithm": "RSA-4096",
-            "encryption_type": "RSA OAEP with SHA-256",
-            "public_key": rsa_public_key,
-            "key_size": "4096 bits",
-            "status": "ACTIVE"
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "message": f"Could not load public key: {str(e)}"
-        }
+async def get_security_public_key(request: Request):
+    """Return RSA-4096 public key for encryption (cached, ETag-validated)"""
+    return public_key_response.respond(request)
 
 @app.get("/api/security/info")
 async def get_security_info():
@@ -174,10 +216,17 @@ async def employee_signup(signup_data: EmployeeSignup, db: Session = Depends(get
         print(f"[SIGNUP] ❌ CNIC already exists: {signup_data.cnic}")
         raise HTTPException(status_code=400, detail="CNIC already registered")
     
+    print(f"[SIGNUP] 🔨 Hashing credentials...")
+    hashed_password, hashed_question, hashed_answer = await asyncio.gather(
+        get_password_hash_async(signup_data.password),
+        get_password_hash_async(signup_data.security_question),
+        get_password_hash_async(signup_data.security_answer)
+    )
+    
     print(f"[SIGNUP] 🔨 Creating user record...")
     user = User(
         email=signup_data.email,
-        hashed_password=get_password_hash(signup_data.password),
+        hashed_password=hashed_password,
         role="employee",
         is_active=False
     )
@@ -197,8 +246,8 @@ async def employee_signup(signup_data: EmployeeSignup, db: Session = Depends(get
         full_name=signup_data.full_name,
         cnic=hashed_cnic,
         cnic_encrypted=encrypted_cnic,
-        security_question=get_password_hash(signup_data.security_question),
-        security_answer=get_password_hash(signup_data.security_answer),
+        security_question=hashed_question,
+        security_answer=hashed_answer,
         is_approved=False
     )
     db.add(employee)
@@ -207,23 +256,20 @@ async def employee_signup(signup_data: EmployeeSignup, db: Session = Depends(get
     print(f"[SIGNUP] ✅ Employee committed to database")
     db.refresh(employee)
     print(f"[SIGNUP] ✅ Employee record created with ID: {employee.id}, Status: pending approval")
+    publish_approvals([employee.id], "pending")
     
     print(f"[SIGNUP] ✅ SIGNUP COMPLETE - Sending response...")
     return {"message": "Registration successful. Waiting for HR approval."}
 
 @app.get("/api/auth/public-key")
-async def get_public_key():
-    return {
-        "public_key": rsa_key_exchange.get_public_key_pem(),
-        "key_format": "PEM",
-        "algorithm": "RSA-4096"
-    }
+async def get_auth_public_key(request: Request):
+    return public_key_response.respond(request)
 
 @app.post("/api/auth/login")
 async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     # Find user
     user = db.query(User).filter(User.email == login_data.email).first()
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if not user or not await verify_password_async(login_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Invalid credentials")
     
     if not user.is_active:
@@ -232,29 +278,13 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     # For HR and Admin, require security questions and OTP
     if user.role in ['hr', 'admin']:
         # Verify security answer
-        if not user.security_answer or not verify_password(login_data.security_answer, user.security_answer):
+        if not user.security_answer or not await verify_password_async(login_data.security_answer, user.security_answer):
             raise HTTPException(status_code=400, detail="Invalid security answer")
         
-        # Verify OTP
-        otp_records = db.query(OTP).filter(
-            OTP.email == login_data.email,
-            OTP.expires_at > datetime.now(),
-            OTP.is_used == False
-        ).all()
-        
-        valid_otp_record = None
-        for record in otp_records:
-            if verify_password(login_data.otp, record.otp_code):
-                valid_otp_record = record
-                break
-        
-        if not valid_otp_record:
+        # Verify and consume OTP
+        if not otp_store.verify(db, login_data.email, login_data.otp):
             raise HTTPException(status_code=400, detail="Invalid or expired OTP")
         
-        # Mark OTP as used
-        valid_otp_record.is_used = True
-        db.commit()
-        
         # Create JWT token
         access_token = create_access_token({"sub": user.email, "role": user.role})
         
@@ -270,29 +300,13 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     if not employee:
         raise HTTPException(status_code=400, detail="Employee record not found")
     
-    if not verify_password(login_data.security_answer, employee.security_answer):
+    if not await verify_password_async(login_data.security_answer, employee.security_answer):
         raise HTTPException(status_code=400, detail="Invalid security answer")
     
-    # Verify OTP for employees
-    otp_records = db.query(OTP).filter(
-        OTP.email == login_data.email,
-        OTP.expires_at > datetime.now(),
-        OTP.is_used == False
-    ).all()
-    
-    valid_otp_record = None
-    for record in otp_records:
-        if verify_password(login_data.otp, record.otp_code):
-            valid_otp_record = record
-            break
-    
-    if not valid_otp_record:
+    # Verify and consume OTP for employees
+    if not otp_store.verify(db, login_data.email, login_data.otp):
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
     
-    # Mark OTP as used
-    valid_otp_record.is_used = True
-    db.commit()
-    
     # Create JWT token
     access_token = create_access_token({"sub": user.email, "role": user.role})
     
@@ -316,25 +330,21 @@ async def request_otp(email: str, db: Session = Depends(get_db)):
         if not user.is_active:
             raise HTTPException(status_code=400, detail="Account not approved yet")
         
-        print(f"[DEBUG] Sending OTP email...")
+        print(f"[DEBUG] Queueing OTP email...")
+        delivery_id = None
         try:
-            success = await send_otp_email(db, email)
-            print(f"[DEBUG] OTP send result: {success}")
+            delivery_id = await send_otp_email(db, email)
+            print(f"[DEBUG] OTP email delivery ID: {delivery_id}")
+            success = delivery_id is not None
         except Exception as email_error:
             print(f"[WARNING] Email sending failed: {email_error}")
             print(f"[INFO] Generating OTP without sending email (DEV MODE)")
-            from app.email_service import generate_otp
-            from datetime import timedelta
-            otp_code = generate_otp()
-            expires_at = datetime.now() + timedelta(minutes=10)
-            otp = OTP(email=email, otp_code=get_password_hash(otp_code), expires_at=expires_at)
-            db.add(otp)
-            db.commit()
+            otp_code = otp_store.issue(db, email)
             print(f"[DEV] Generated OTP: {otp_code}")
             success = True
         
         if success:
-            return {"message": "OTP sent to your email"}
+            return {"message": "OTP sent to your email", "delivery_id": delivery_id}
         else:
             raise HTTPException(status_code=500, detail="Failed to send OTP")
     except Exception as e:
@@ -342,6 +352,80 @@ async def request_otp(email: str, db: Session = Depends(get_db)):
         print(traceback.format_exc())
         raise
 
+@app.get("/api/mail/status/{delivery_id}")
+async def get_mail_status(delivery_id: str):
+    """
+    Delivery status of a queued email (queued, retrying, sent or failed)
+    
+    Statuses live in the memory of the worker that queued the message, so
+    the endpoint is single-worker only: with several workers a poll could
+    land elsewhere and wrongly report the id as unknown.
+    """
+    if settings.WORKER_PROCESSES > 1:
+        raise HTTPException(
+            status_code=501,
+            detail="Mail delivery status is only available when the server runs a single worker"
+        )
+    delivery_status = mail_dispatcher.get_status(delivery_id)
+    if not delivery_status:
+        raise HTTPException(status_code=404, detail="Unknown delivery ID")
+    return delivery_status
+
+@app.post("/api/events/ticket")
+async def issue_event_ticket(request: Request):
+    """
+    Exchange the session JWT (Authorization: Bearer) for a short-lived
+    ticket that opens /api/events/stream
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    ticket = create_event_ticket(verify_token(token))
+    return {"ticket": ticket, "expires_in": settings.EVENT_TICKET_SECONDS}
+
+@app.get("/api/events/stream")
+async def stream_events(request: Request, ticket: str, topics: str = ",".join(EVENT_TOPICS)):
+    """
+    Server-Sent Events channel for dashboards
+    
+    Pushes `attendance`, `approval` and `stats` (delta) events as soon as the
+    corresponding writes commit. EventSource cannot send headers, so the
+    stream is opened with a ticket from /api/events/ticket rather than the
+    session JWT. HR and admin receive every event; employees receive only
+    their own attendance events. Reconnecting clients send Last-Event-ID
+    and are replayed what they missed; a gap that is too old, or an id
+    issued by another worker, gets a `resync` event instead.
+    """
+    payload = verify_event_ticket(ticket)
+    role = payload.get("role")
+    requested = {topic for topic in topics.split(",") if topic in EVENT_TOPICS}
+    
+    if role in ("hr", "admin"):
+        scope = None
+    elif role == "employee":
+        # Resolve the caller's employee record once; no session is held while streaming
+        async with AsyncSessionLocal() as db:
+            scope = await db.scalar(
+                select(Employee.id).join(User, User.id == Employee.user_id).where(User.email == payload.get("sub"))
+            )
+        if scope is None:
+            raise HTTPException(status_code=403, detail="No employee record for this account")
+        requested &= {"attendance"}
+    else:
+        raise HTTPException(status_code=403, detail="Not authorized for live updates")
+    
+    if not requested:
+        raise HTTPException(status_code=400, detail=f"topics must include one of: {', '.join(EVENT_TOPICS)}")
+    
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("lastEventId")
+    
+    subscription, missed = event_broker.subscribe(requested, scope, last_event_id)
+    return StreamingResponse(
+        event_stream(subscription, missed),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/debug/all-employees")
 async def debug_all_employees(db: Session = Depends(get_db)):
     """Debug endpoint to check all employees in database"""
@@ -367,48 +451,81 @@ async def debug_all_employees(db: Session = Depends(get_db)):
     return result
 
 @app.get("/api/hr/pending-approvals")
-async def get_pending_approvals(db: Session = Depends(get_db)):
-    pending_employees = db.query(Employee).filter(
-        (Employee.is_approved == False) & (Employee.is_disapproved == False)
-    ).all()
-    total_employees = db.query(Employee).filter(Employee.is_approved == True).count()
+async def get_pending_approvals(
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = 100,
+    offset: int = 0,
+    include_cnic: bool = True
+):
+    """
+    Pending applicants with their user email, oldest first
+    
+    With include_cnic=false the CNICs are not decrypted here; HR fetches
+    one at a time from /api/hr/applicant-cnic/{employee_id}.
+    """
+    limit = max(1, min(limit, 1000))
+    offset = max(0, offset)
+    pending_filter = (Employee.is_approved == False) & (Employee.is_disapproved == False)
     
-    print(f"\n[HR APPROVALS] Found {len(pending_employees)} pending employees")
+    pending_rows = (await db.execute(
+        select(Employee, User.email).join(
+            User, User.id == Employee.user_id
+        ).where(pending_filter).order_by(Employee.created_at, Employee.id).offset(offset).limit(limit)
+    )).all()
+    pending_count = await db.scalar(
+        select(func.count(Employee.id)).join(User, User.id == Employee.user_id).where(pending_filter)
+    )
+    total_employees = await db.scalar(
+        select(func.count(Employee.id)).where(Employee.is_approved == True)
+    )
+    
+    print(f"\n[HR APPROVALS] Found {pending_count} pending employees")
     print(f"[HR APPROVALS] Found {total_employees} approved employees")
     
+    if include_cnic:
+        loop = asyncio.get_running_loop()
+        cnics = await loop.run_in_executor(
+            None, aes_encryption.decrypt_many, [emp.cnic_encrypted for emp, _ in pending_rows]
+        )
+    else:
+        cnics = [None] * len(pending_rows)
+    
     result = []
-    for emp in pending_employees:
-        user = db.query(User).filter(User.id == emp.user_id).first()
-        if user:
-            decrypted_cnic = "Unable to decrypt"
-            try:
-                if emp.cnic_encrypted:
-                    decrypted_cnic = aes_encryption.decrypt_cnic(emp.cnic_encrypted)
-            except Exception as e:
-                print(f"[WARNING] Failed to decrypt CNIC for {emp.full_name}: {e}")
-            
-            emp_data = {
-                "id": emp.id,
-                "full_name": emp.full_name,
-                "email": user.email,
-                "cnic": decrypted_cnic,
-                "department": emp.department or "N/A",
-                "position": emp.position or "N/A",
-                "security_question": emp.security_question,
-                "created_at": emp.created_at.isoformat() if emp.created_at else None
-            }
-            print(f"[HR APPROVALS] Added employee: {emp.full_name} ({user.email})")
-            result.append(emp_data)
+    for (emp, email), cnic in zip(pending_rows, cnics):
+        if include_cnic and cnic is None:
+            print(f"[WARNING] Failed to decrypt CNIC for {emp.full_name}")
+        result.append({
+            "id": emp.id,
+            "full_name": emp.full_name,
+            "email": email,
+            "cnic": (cnic or "Unable to decrypt") if include_cnic else None,
+            "department": emp.department or "N/A",
+            "position": emp.position or "N/A",
+            "security_question": emp.security_question,
+            "created_at": emp.created_at.isoformat() if emp.created_at else None
+        })
     
     return {
         "pending_employees": result,
         "total_employees": total_employees,
-        "pending_count": len(result)
+        "pending_count": pending_count,
+        "limit": limit,
+        "offset": offset
     }
 
+@app.get("/api/hr/applicant-cnic/{employee_id}")
+async def get_applicant_cnic(employee_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Decrypt a single applicant's CNIC on demand"""
+    employee = await db.get(Employee, employee_id)
+    if not employee:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    
+    cnic = aes_encryption.decrypt_many([employee.cnic_encrypted])[0]
+    return {"id": employee.id, "cnic": cnic or "Unable to decrypt"}
+
 @app.post("/api/hr/approve-employee")
-async def approve_employee(approval_data: HRApproval, db: Session = Depends(get_db)):
-    employee = db.query(Employee).filter(Employee.id == approval_data.employee_id).first()
+async def approve_employee(approval_data: HRApproval, db: AsyncSession = Depends(get_async_db)):
+    employee = await db.get(Employee, approval_data.employee_id)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     
@@ -423,55 +540,114 @@ async def approve_employee(approval_data: HRApproval, db: Session = Depends(get_
     employee.approved_at = datetime.now()
     
     # Activate user account
-    user = db.query(User).filter(User.id == employee.user_id).first()
+    user = await db.get(User, employee.user_id)
     user.is_active = True
     
-    db.commit()
+    await db.commit()
+    publish_approvals([employee.id], "approved")
+    
+    # Queue approval email
+    delivery_id = await send_approval_email(user.email, employee.full_name, employee_id)
+    
+    return {"message": "Employee approved successfully", "delivery_id": delivery_id}
+
+@app.post("/api/hr/approve-employees")
+async def approve_employees(approvals: List[HRApproval], db: AsyncSession = Depends(get_async_db)):
+    """
+    Approve a batch of employees in one transaction
+    
+    Returns a result per entry; the approval emails are queued together
+    once the transaction has committed.
+    """
+    requested_ids = {approval.employee_id for approval in approvals}
+    rows = (await db.execute(
+        select(Employee, User).outerjoin(
+            User, User.id == Employee.user_id
+        ).where(Employee.id.in_(requested_ids))
+    )).all()
+    employees = {employee.id: (employee, user) for employee, user in rows}
+    
+    now = datetime.now()
+    results = []
+    approved = []
+    seen = set()
     
-    # Send approval email
-    await send_approval_email(user.email, employee.full_name, employee_id)
+    for approval in approvals:
+        result = {"employee_id": approval.employee_id, "success": False}
+        results.append(result)
+        
+        if approval.employee_id in seen:
+            result["error"] = "Duplicate entry in request"
+            continue
+        seen.add(approval.employee_id)
+        
+        employee, user = employees.get(approval.employee_id, (None, None))
+        if not employee:
+            result["error"] = "Employee not found"
+            continue
+        if not user:
+            result["error"] = "User account not found"
+            continue
+        if employee.is_approved:
+            result["error"] = "Employee already approved"
+            continue
+        
+        employee.employee_id = f"EMP{employee.id:04d}"
+        employee.department = approval.department
+        employee.position = approval.position
+        employee.is_approved = True
+        employee.approved_at = now
+        user.is_active = True
+        
+        result.update({"success": True, "assigned_employee_id": employee.employee_id})
+        approved.append((result, user.email, employee.full_name, employee.employee_id))
     
-    return {"message": "Employee approved successfully"}
+    await db.commit()
+    print(f"[HR APPROVALS] Bulk approved {len(approved)}/{len(approvals)} employees")
+    publish_approvals([result["employee_id"] for result, *_ in approved], "approved")
+    
+    delivery_ids = await send_approval_emails([(email, name, emp_id) for _, email, name, emp_id in approved])
+    for (result, *_), delivery_id in zip(approved, delivery_ids):
+        result["delivery_id"] = delivery_id
+    
+    return {
+        "approved_count": len(approved),
+        "failed_count": len(approvals) - len(approved),
+        "results": results
+    }
 
 @app.post("/api/hr/disapprove-employee")
-async def disapprove_employee(data: dict, db: Session = Depends(get_db)):
+async def disapprove_employee(data: dict, db: AsyncSession = Depends(get_async_db)):
     employee_id = data.get('employee_id')
-    employee = db.query(Employee).filter(Employee.id == employee_id).first()
+    employee = await db.get(Employee, employee_id) if employee_id is not None else None
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     
     employee.is_disapproved = True
-    db.commit()
+    await db.commit()
+    publish_approvals([employee.id], "disapproved")
     
     print(f"[HR DISAPPROVAL] Employee {employee.full_name} (ID: {employee.id}) has been disapproved")
     
     return {"message": "Employee disapproved successfully"}
 
 @app.post("/api/employee/mark-attendance")
-async def mark_attendance(request: MarkAttendanceRequest, db: Session = Depends(get_db)):
-    today = date.today()
-
+async def mark_attendance(request: MarkAttendanceRequest, db: AsyncSession = Depends(get_async_db)):
     dev_mode = os.getenv("DEV_MODE", "false").lower() == "true"
     
     print(f"\n[MARK ATTENDANCE] Employee ID: {request.employee_id} | Type: {type(request.employee_id)}")
     
-    if not dev_mode and not validate_location(request.latitude, request.longitude):
+    # The location name comes from the matching fence, never from the client
+    fence = geofences.locate(request.latitude, request.longitude)
+    if fence is None and not dev_mode:
         raise HTTPException(
             status_code=400, 
-            detail="Location not authorized. You must be at NUST H-12 Islamabad to mark attendance."
+            detail="Location not authorized. You must be inside an attendance zone to mark attendance."
         )
     
-    if dev_mode:
+    if fence is None:
         print("[DEV MODE] Location validation skipped")
-
-    existing_attendance = db.query(Attendance).filter(
-        Attendance.employee_id == request.employee_id,
-        func.date(Attendance.date) == today
-    ).first()
-
-    if existing_attendance:
-        raise HTTPException(status_code=400, detail="Attendance already marked for today")
-
+    
     now = datetime.now()
     date_str = now.strftime("%Y-%m-%d")
     
@@ -483,45 +659,113 @@ async def mark_attendance(request: MarkAttendanceRequest, db: Session = Depends(
         longitude=str(request.longitude)
     )
     
-    attendance = Attendance(
+    record = dict(
         employee_id=request.employee_id,
         date=now,
+        attendance_day=now.date(),
         status="present",
         marked_at=now,
         latitude=str(request.latitude),
         longitude=str(request.longitude),
-        location_name=request.location_name or "NUST H-12 Islamabad",
+        location_name=location_name(fence),
         hmac=hmac_signature
     )
-
+    
+    if checkin_buffer.is_running:
+        # Write-behind: acknowledged once logged; inserted with the next micro-batch
+        try:
+            await checkin_buffer.submit(record)
+        except UnknownEmployee:
+            raise HTTPException(status_code=404, detail="Employee not found")
+        except DuplicateCheckIn:
+            raise HTTPException(status_code=400, detail="Attendance already marked for today")
+        except CheckInBufferError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        return {"message": "Attendance marked successfully", "queued": True}
+    
+    attendance = Attendance(**record)
     db.add(attendance)
-    db.commit()
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        # uq_attendance_employee_day: one record per employee per day
+        if unique_violation_columns(e) == ("employee_id", "attendance_day"):
+            raise HTTPException(status_code=400, detail="Attendance already marked for today")
+        if is_foreign_key_violation(e):
+            raise HTTPException(status_code=404, detail="Employee not found")
+        raise
     
+    publish_attendance([attendance])
     print(f"[MARK ATTENDANCE] ✅ Saved attendance record: ID={attendance.id}, Employee={attendance.employee_id}, Status={attendance.status}")
     print(f"[MARK ATTENDANCE] 🔐 HMAC Signature: {hmac_signature[:16]}...")
-
+    
     return {"message": "Attendance marked successfully"}
 
 
+@app.post("/api/attendance/batch")
+async def ingest_attendance_batch(records: List[AttendanceBatchRecord], db: AsyncSession = Depends(get_async_db)):
+    """
+    Upload a batch of check-ins (gate kiosks, offline sync) in one transaction
+    
+    Locations are validated and HMACs computed for the whole batch at once,
+    and rows are inserted with a single INSERT ... ON CONFLICT DO NOTHING.
+    Returns a result per record, in request order: "accepted" (with the new
+    id), "duplicate" (already marked for that day) or "rejected" (with an
+    error). A check-in for a day the absence job already marked absent
+    replaces the absence and comes back "accepted" with "replaced_absence".
+    Re-uploading the same batch is safe.
+    """
+    if len(records) > settings.ATTENDANCE_BATCH_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: at most {settings.ATTENDANCE_BATCH_MAX} records per upload"
+        )
+    
+    dev_mode = os.getenv("DEV_MODE", "false").lower() == "true"
+    results, accepted = await ingest_attendance(db, records, check_location=not dev_mode)
+    publish_attendance(accepted, replaced=sum(1 for result in results if result.get("replaced_absence")))
+    for attendance in accepted:
+        checkin_buffer.remember(attendance.employee_id, attendance.attendance_day)
+    
+    duplicate_count = sum(1 for result in results if result["result"] == DUPLICATE)
+    print(f"[ATTENDANCE BATCH] {len(accepted)} accepted, {duplicate_count} duplicate, "
+          f"{len(results) - len(accepted) - duplicate_count} rejected of {len(records)}")
+    
+    return {
+        "accepted_count": len(accepted),
+        "duplicate_count": duplicate_count,
+        "rejected_count": len(results) - len(accepted) - duplicate_count,
+        "results": results
+    }
+
 @app.get("/api/employee/my-attendance")
-async def get_my_attendance(employee_id: int, db: Session = Depends(get_db)):
-    attendance_records = db.query(Attendance).filter(
-        Attendance.employee_id == employee_id
-    ).order_by(Attendance.date.desc()).all()
+async def get_my_attendance(
+    request: Request,
+    response: Response,
+    employee_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    since: int = None
+):
+    """
+    An employee's attendance, newest first
+    
+    Supports conditional GET (ETag) and, with `since`, only the records
+    written after that change sequence number (X-Change-Seq of an earlier
+    response). The ETag covers the integrity verdicts, so tampering done
+    outside the application is never hidden behind a 304.
+    """
+    change_state = await read_change_state(db)
+    
+    query = select(Attendance).where(Attendance.employee_id == employee_id)
+    if since is not None:
+        query = query.where(Attendance.change_seq > since)
+    attendance_records = (await db.execute(query.order_by(Attendance.date.desc()))).scalars().all()
+    
+    verdicts = hmac_integrity.verify_attendance_records(attendance_records)
     
     result = []
-    for record in attendance_records:
-        date_str = record.date.strftime("%Y-%m-%d") if record.date else ""
-        
-        is_valid = hmac_integrity.verify_attendance_hmac(
-            employee_id=record.employee_id,
-            date_str=date_str,
-            status=record.status,
-            stored_hmac=record.hmac,
-            latitude=record.latitude or "",
-            longitude=record.longitude or ""
-        )
-        
+    for record, is_valid in zip(attendance_records, verdicts):
         result.append({
             "id": record.id,
             "employee_id": record.employee_id,
@@ -535,65 +779,125 @@ async def get_my_attendance(employee_id: int, db: Session = Depends(get_db)):
             "tampered": not is_valid
         })
     
+    change_state = change_state.for_content(result)
+    if change_state.matches(request):
+        return change_state.not_modified()
+    response.headers.update(change_state.headers())
     return result
 
+ATTENDANCE_PAGE_LIMIT = 500
+ATTENDANCE_PAGE_MAX = 5000
+
+def encode_attendance_cursor(record: Attendance) -> str:
+    """Opaque keyset cursor pointing just after the given record"""
+    return "{}|{}".format(record.date.isoformat(), record.id)
+
+def decode_attendance_cursor(cursor: str):
+    try:
+        date_part, id_part = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/admin/all-attendance")
 async def get_all_attendance(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     start_date: str = None,
-    end_date: str = None
+    end_date: str = None,
+    limit: int = ATTENDANCE_PAGE_LIMIT,
+    cursor: str = None,
+    since: int = None
 ):
+    """
+    Attendance rows joined with employee and user details, newest first
+    
+    Results are keyset-paginated: when more rows exist the response carries
+    an X-Next-Cursor header to pass back as `cursor` for the next page.
+    
+    Delta sync: with `since` (the X-Change-Seq of an earlier response) only
+    rows written after it are returned, oldest change first, and `cursor` is
+    ignored. Pass the new X-Change-Seq next time; a full page means more
+    changes are waiting. Unchanged polls revalidating with If-None-Match
+    get a 304; the ETag covers the page's integrity verdicts, so rows
+    tampered with outside the application still show up. (Delta syncs do
+    not re-send such rows; a full listing does.)
+    """
+    limit = max(1, min(limit, ATTENDANCE_PAGE_MAX))
+    cursor_position = decode_attendance_cursor(cursor) if cursor and since is None else None
+    start_day, end_day = parse_date_range(start_date, end_date, default_days=0)
+    
+    change_state = await read_change_state(db)
+    
     try:
-        print("[*] Loading attendance records...")
+        print(f"[ADMIN] Date range: {start_day} to {end_day}")
         
-        result = []
-        approved_employees = db.query(Employee).filter(Employee.is_approved == True).all()
-        print("[INFO] Found {} approved employees".format(len(approved_employees)))
-        
-        if not start_date:
-            start_date = str(date.today())
-        if not end_date:
-            end_date = str(date.today())
-        
-        print(f"[ADMIN] Date range: {start_date} to {end_date}")
-        
-        for employee in approved_employees:
-            user = db.query(User).filter(User.id == employee.user_id).first()
-            attendance_records = db.query(Attendance).filter(
-                Attendance.employee_id == employee.id,
-                func.date(Attendance.date) >= start_date,
-                func.date(Attendance.date) <= end_date
-            ).order_by(Attendance.date.desc()).all()
+        query = select(Attendance, Employee, User).join(
+            Employee, Employee.id == Attendance.employee_id
+        ).outerjoin(
+            User, User.id == Employee.user_id
+        ).where(
+            Employee.is_approved == True,
+            Attendance.attendance_day >= start_day,
+            Attendance.attendance_day <= end_day
+        )
+        
+        resume_seq = None
+        if since is not None:
+            rows = (await db.execute(
+                query.where(Attendance.change_seq > since).order_by(Attendance.change_seq).limit(limit + 1)
+            )).all()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                # Resume right after the last row sent, not at the counter
+                resume_seq = rows[-1][0].change_seq
+        else:
+            if cursor_position:
+                cursor_date, cursor_id = cursor_position
+                query = query.where(or_(
+                    Attendance.date < cursor_date,
+                    and_(Attendance.date == cursor_date, Attendance.id < cursor_id)
+                ))
             
-            for attendance_record in attendance_records:
-                date_str = attendance_record.date.strftime("%Y-%m-%d") if attendance_record.date else ""
-                
-                is_valid = hmac_integrity.verify_attendance_hmac(
-                    employee_id=attendance_record.employee_id,
-                    date_str=date_str,
-                    status=attendance_record.status,
-                    stored_hmac=attendance_record.hmac,
-                    latitude=attendance_record.latitude or "",
-                    longitude=attendance_record.longitude or ""
-                )
-                
-                result.append({
-                    "date": str(attendance_record.date),
-                    "employee_name": employee.full_name or "Unknown",
-                    "employee_id": employee.employee_id or "PENDING",
-                    "email": user.email if user else "N/A",
-                    "department": employee.department or "N/A",
-                    "position": employee.position or "N/A",
-                    "status": attendance_record.status,
-                    "marked_at": str(attendance_record.marked_at) if attendance_record.marked_at else None,
-                    "latitude": attendance_record.latitude,
-                    "longitude": attendance_record.longitude,
-                    "location_name": attendance_record.location_name or "N/A",
-                    "integrity_verified": is_valid,
-                    "tampered": not is_valid
-                })
+            rows = (await db.execute(
+                query.order_by(Attendance.date.desc(), Attendance.id.desc()).limit(limit + 1)
+            )).all()
+            
+            if len(rows) > limit:
+                rows = rows[:limit]
+                response.headers["X-Next-Cursor"] = encode_attendance_cursor(rows[-1][0])
         
-        print("[SUCCESS] Returning {} employee records".format(len(result)))
+        verdicts = hmac_integrity.verify_attendance_records(row[0] for row in rows)
+        
+        result = []
+        for (attendance_record, employee, user), is_valid in zip(rows, verdicts):
+            result.append({
+                "id": attendance_record.id,
+                "change_seq": attendance_record.change_seq,
+                "date": str(attendance_record.date),
+                "employee_name": employee.full_name or "Unknown",
+                "employee_id": employee.employee_id or "PENDING",
+                "email": user.email if user else "N/A",
+                "department": employee.department or "N/A",
+                "position": employee.position or "N/A",
+                "status": attendance_record.status,
+                "marked_at": str(attendance_record.marked_at) if attendance_record.marked_at else None,
+                "latitude": attendance_record.latitude,
+                "longitude": attendance_record.longitude,
+                "location_name": attendance_record.location_name or "N/A",
+                "integrity_verified": is_valid,
+                "tampered": not is_valid
+            })
+        
+        change_state = change_state.for_content(result)
+        if change_state.matches(request):
+            return change_state.not_modified()
+        response.headers.update(change_state.headers())
+        if resume_seq is not None:
+            response.headers["X-Change-Seq"] = str(resume_seq)
+        
+        print("[SUCCESS] Returning {} attendance records".format(len(result)))
         return result
     except Exception as e:
         print("[ERROR] Fatal error in get_all_attendance: {}".format(str(e)))
@@ -602,43 +906,36 @@ async def get_all_attendance(
 @app.get("/api/admin/employee-report/{employee_id}")
 async def get_employee_report(
     employee_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     start_date: str = None,
     end_date: str = None
 ):
+    start_day, end_day = parse_date_range(start_date, end_date, default_days=30)
+    start_date, end_date = str(start_day), str(end_day)
+    
     try:
-        if not start_date:
-            start_date = str(date.today() - __import__('datetime').timedelta(days=30))
-        if not end_date:
-            end_date = str(date.today())
-        
-        employee = db.query(Employee).filter(Employee.id == employee_id).first()
+        employee = await db.get(Employee, employee_id)
         if not employee:
             raise HTTPException(status_code=404, detail="Employee not found")
         
-        user = db.query(User).filter(User.id == employee.user_id).first()
+        user = await db.get(User, employee.user_id)
         
-        attendance_records = db.query(Attendance).filter(
-            Attendance.employee_id == employee_id,
-            func.date(Attendance.date) >= start_date,
-            func.date(Attendance.date) <= end_date
-        ).order_by(Attendance.date.desc()).all()
+        attendance_records = (await db.execute(
+            select(Attendance).where(
+                Attendance.employee_id == employee_id,
+                Attendance.attendance_day >= start_day,
+                Attendance.attendance_day <= end_day
+            ).order_by(Attendance.date.desc())
+        )).scalars().all()
         
         total_days = len(attendance_records)
         present_days = len([a for a in attendance_records if a.status == 'present'])
         absent_days = len([a for a in attendance_records if a.status == 'absent'])
         
+        verdicts = hmac_integrity.verify_attendance_records(attendance_records)
+        
         attendance_data = []
-        for a in attendance_records:
-            date_str = a.date.strftime("%Y-%m-%d") if a.date else ""
-            is_valid = hmac_integrity.verify_attendance_hmac(
-                employee_id=a.employee_id,
-                date_str=date_str,
-                status=a.status,
-                stored_hmac=a.hmac,
-                latitude=a.latitude or "",
-                longitude=a.longitude or ""
-            )
+        for a, is_valid in zip(attendance_records, verdicts):
             attendance_data.append({
                 "date": str(a.date),
                 "status": a.status,
@@ -666,9 +963,14 @@ async def get_employee_report(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/hr/employee-stats")
-async def get_employee_stats(db: Session = Depends(get_db)):
-    total_employees = db.query(Employee).filter(Employee.is_approved == True).count()
-    pending_approvals = db.query(Employee).filter(Employee.is_approved == False).count()
+async def get_employee_stats(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    change_state = await read_change_state(db)
+    if change_state.matches(request):
+        return change_state.not_modified()
+    response.headers.update(change_state.headers())
+    
+    total_employees = await db.scalar(select(func.count(Employee.id)).where(Employee.is_approved == True))
+    pending_approvals = await db.scalar(select(func.count(Employee.id)).where(Employee.is_approved == False))
     
     return {
         "total_employees": total_employees,
@@ -695,18 +997,21 @@ async def get_all_employees(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/admin/employees-list")
-async def get_employees_list(db: Session = Depends(get_db)):
+async def get_employees_list(db: AsyncSession = Depends(get_async_db)):
     """Get list of all approved employees for admin"""
     try:
-        employees = db.query(Employee).filter(Employee.is_approved == True).all()
+        rows = (await db.execute(
+            select(Employee, User.email).outerjoin(
+                User, User.id == Employee.user_id
+            ).where(Employee.is_approved == True)
+        )).all()
         result = []
-        for emp in employees:
-            user = db.query(User).filter(User.id == emp.user_id).first()
+        for emp, email in rows:
             result.append({
                 "id": emp.id,
                 "employee_id": emp.employee_id,
                 "full_name": emp.full_name,
-                "email": user.email if user else "N/A",
+                "email": email or "N/A",
                 "department": emp.department or "N/A",
                 "position": emp.position or "N/A"
             })
@@ -715,34 +1020,134 @@ async def get_employees_list(db: Session = Depends(get_db)):
         print("[ERROR] Error in get_employees_list: {}".format(str(e)))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/geofences")
+async def list_active_geofences(db: AsyncSession = Depends(get_async_db)):
+    """Active attendance zones, for drawing on the employee map"""
+    fences = (await db.execute(
+        select(Geofence).where(Geofence.is_active == True).order_by(Geofence.id)
+    )).scalars().all()
+    return [{"id": fence.id, "name": fence.name, "polygon": parse_polygon(fence.polygon)} for fence in fences]
+
+@app.get("/api/admin/geofences")
+async def list_geofences(db: AsyncSession = Depends(get_async_db)):
+    """All attendance zones, including inactive ones"""
+    fences = (await db.execute(select(Geofence).order_by(Geofence.id))).scalars().all()
+    return [geofence_response(fence) for fence in fences]
+
+async def save_geofence(db: AsyncSession, fence: Geofence, request: GeofenceRequest) -> dict:
+    """Validate and store a fence, then rebuild this worker's index"""
+    try:
+        vertices = parse_polygon(request.polygon)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    name = request.name.strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Geofence name is required")
+    
+    fence.name = name
+    fence.polygon = json.dumps([list(vertex) for vertex in vertices])
+    fence.is_active = request.is_active
+    fence.updated_at = datetime.utcnow()
+    db.add(fence)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if unique_violation_columns(e) == ("name",):
+            raise HTTPException(status_code=400, detail=f"A geofence named {name!r} already exists")
+        raise
+    
+    await geofences.reload()
+    print(f"[GEOFENCE] Saved {fence.name!r} ({len(vertices)} vertices, active={fence.is_active})")
+    return geofence_response(fence)
+
+@app.post("/api/admin/geofences")
+async def create_geofence(request: GeofenceRequest, db: AsyncSession = Depends(get_async_db)):
+    """Add an attendance zone; check-ins inside it are stored with its name"""
+    return await save_geofence(db, Geofence(), request)
+
+@app.put("/api/admin/geofences/{fence_id}")
+async def update_geofence(fence_id: int, request: GeofenceRequest, db: AsyncSession = Depends(get_async_db)):
+    """Replace a zone's name, outline or active flag; existing attendance keeps the name it was stored with"""
+    fence = await db.get(Geofence, fence_id)
+    if not fence:
+        raise HTTPException(status_code=404, detail="Geofence not found")
+    return await save_geofence(db, fence, request)
+
+@app.delete("/api/admin/geofences/{fence_id}")
+async def delete_geofence(fence_id: int, db: AsyncSession = Depends(get_async_db)):
+    fence = await db.get(Geofence, fence_id)
+    if not fence:
+        raise HTTPException(status_code=404, detail="Geofence not found")
+    await db.delete(fence)
+    await db.commit()
+    await geofences.reload()
+    print(f"[GEOFENCE] Deleted {fence.name!r}")
+    return {"message": "Geofence deleted successfully"}
+
 @app.get("/api/admin/all-employees-stats")
-async def get_all_employees_stats(db: Session = Depends(get_db)):
-    """Get all employees with their attendance statistics"""
+async def get_all_employees_stats(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    since: int = None
+):
+    """
+    Get all employees with their attendance statistics
+    
+    With `since`, only employees whose record or attendance changed after
+    that change sequence number are returned. Supports conditional GET.
+    """
+    change_state = await read_change_state(db)
+    if change_state.matches(request):
+        return change_state.not_modified()
+    response.headers.update(change_state.headers())
+    
     try:
-        employees = db.query(Employee).filter(Employee.is_approved == True).order_by(Employee.full_name).all()
-        result = []
+        # All-time totals from the monthly rollup: one row per employee-month, not per day
+        totals_query = select(
+            AttendanceMonthlySummary.employee_id.label("employee_id"),
+            func.sum(AttendanceMonthlySummary.total_days).label("total_attendance"),
+            func.sum(AttendanceMonthlySummary.present_days).label("present_count"),
+            func.sum(AttendanceMonthlySummary.absent_days).label("absent_count"),
+            func.max(AttendanceMonthlySummary.last_attendance).label("last_attendance")
+        ).group_by(AttendanceMonthlySummary.employee_id)
         
-        for emp in employees:
-            user = db.query(User).filter(User.id == emp.user_id).first()
-            
-            attendance_records = db.query(Attendance).filter(
-                Attendance.employee_id == emp.id
-            ).all()
-            
-            total_attendance = len(attendance_records)
-            present_count = len([a for a in attendance_records if a.status == 'present'])
-            absent_count = len([a for a in attendance_records if a.status == 'absent'])
+        changed_filter = []
+        if since is not None:
+            # Only aggregate the employees that actually changed
+            changed_employees = union(
+                select(Employee.id).where(Employee.change_seq > since),
+                select(Attendance.employee_id).where(Attendance.change_seq > since)
+            ).subquery()
+            changed_filter.append(Employee.id.in_(select(changed_employees.c[0])))
+            totals_query = totals_query.where(AttendanceMonthlySummary.employee_id.in_(select(changed_employees.c[0])))
+        attendance_totals = totals_query.subquery()
+        
+        rows = (await db.execute(
+            select(
+                Employee, User.email, attendance_totals.c.total_attendance, attendance_totals.c.present_count,
+                attendance_totals.c.absent_count, attendance_totals.c.last_attendance
+            ).outerjoin(
+                User, User.id == Employee.user_id
+            ).outerjoin(
+                attendance_totals, attendance_totals.c.employee_id == Employee.id
+            ).where(Employee.is_approved == True, *changed_filter).order_by(Employee.full_name)
+        )).all()
+        
+        result = []
+        for row in rows:
+            emp = row.Employee
+            total_attendance = row.total_attendance or 0
+            present_count = row.present_count or 0
+            absent_count = row.absent_count or 0
             attendance_rate = round((present_count / total_attendance * 100) if total_attendance > 0 else 0, 2)
             
-            last_attendance = db.query(Attendance).filter(
-                Attendance.employee_id == emp.id
-            ).order_by(Attendance.date.desc()).first()
-            
             result.append({
                 "id": emp.id,
                 "employee_id": emp.employee_id,
                 "full_name": emp.full_name,
-                "email": user.email if user else "N/A",
+                "email": row.email or "N/A",
                 "department": emp.department or "N/A",
                 "position": emp.position or "N/A",
                 "cnic": emp.cnic or "N/A",
@@ -750,7 +1155,7 @@ async def get_all_employees_stats(db: Session = Depends(get_db)):
                 "present_count": present_count,
                 "absent_count": absent_count,
                 "attendance_rate": attendance_rate,
-                "last_attendance": str(last_attendance.date) if last_attendance else "No record",
+                "last_attendance": str(row.last_attendance) if row.last_attendance else "No record",
                 "joined_at": str(emp.created_at.date()) if emp.created_at else "N/A"
             })
         
@@ -762,44 +1167,37 @@ async def get_all_employees_stats(db: Session = Depends(get_db)):
 @app.get("/api/admin/employee-attendance-history/{employee_id}")
 async def get_employee_attendance_history(
     employee_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     start_date: str = None,
     end_date: str = None
 ):
     """Get complete attendance history for a specific employee"""
+    start_day, end_day = parse_date_range(start_date, end_date, default_days=90)
+    start_date, end_date = str(start_day), str(end_day)
+    
     try:
-        if not start_date:
-            start_date = str(date.today() - __import__('datetime').timedelta(days=90))
-        if not end_date:
-            end_date = str(date.today())
-        
-        employee = db.query(Employee).filter(Employee.id == employee_id).first()
+        employee = await db.get(Employee, employee_id)
         if not employee:
             raise HTTPException(status_code=404, detail="Employee not found")
         
-        user = db.query(User).filter(User.id == employee.user_id).first()
+        user = await db.get(User, employee.user_id)
         
-        attendance_records = db.query(Attendance).filter(
-            Attendance.employee_id == employee_id,
-            func.date(Attendance.date) >= start_date,
-            func.date(Attendance.date) <= end_date
-        ).order_by(Attendance.date.desc()).all()
+        attendance_records = (await db.execute(
+            select(Attendance).where(
+                Attendance.employee_id == employee_id,
+                Attendance.attendance_day >= start_day,
+                Attendance.attendance_day <= end_day
+            ).order_by(Attendance.date.desc())
+        )).scalars().all()
         
         total_days = len(attendance_records)
         present_days = len([a for a in attendance_records if a.status == 'present'])
         absent_days = len([a for a in attendance_records if a.status == 'absent'])
         
+        verdicts = hmac_integrity.verify_attendance_records(attendance_records)
+        
         attendance_data = []
-        for a in attendance_records:
-            date_str = a.date.strftime("%Y-%m-%d") if a.date else ""
-            is_valid = hmac_integrity.verify_attendance_hmac(
-                employee_id=a.employee_id,
-                date_str=date_str,
-                status=a.status,
-                stored_hmac=a.hmac,
-                latitude=a.latitude or "",
-                longitude=a.longitude or ""
-            )
+        for a, is_valid in zip(attendance_records, verdicts):
             attendance_data.append({
                 "date": str(a.date.date()) if a.date else "N/A",
                 "status": a.status,
@@ -832,28 +1230,28 @@ async def get_employee_attendance_history(
 @app.get("/api/admin/generate-report/{employee_id}")
 async def generate_report(
     employee_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     start_date: str = None,
     end_date: str = None
 ):
     """Generate attendance report in TXT format"""
+    start_day, end_day = parse_date_range(start_date, end_date, default_days=90)
+    start_date, end_date = str(start_day), str(end_day)
+    
     try:
-        if not start_date:
-            start_date = str(date.today() - __import__('datetime').timedelta(days=90))
-        if not end_date:
-            end_date = str(date.today())
-        
-        employee = db.query(Employee).filter(Employee.id == employee_id).first()
+        employee = await db.get(Employee, employee_id)
         if not employee:
             raise HTTPException(status_code=404, detail="Employee not found")
         
-        user = db.query(User).filter(User.id == employee.user_id).first()
+        user = await db.get(User, employee.user_id)
         
-        attendance_records = db.query(Attendance).filter(
-            Attendance.employee_id == employee_id,
-            func.date(Attendance.date) >= start_date,
-            func.date(Attendance.date) <= end_date
-        ).order_by(Attendance.date.asc()).all()
+        attendance_records = (await db.execute(
+            select(Attendance).where(
+                Attendance.employee_id == employee_id,
+                Attendance.attendance_day >= start_day,
+                Attendance.attendance_day <= end_day
+            ).order_by(Attendance.date.asc())
+        )).scalars().all()
         
         total_days = len(attendance_records)
         present_days = len([a for a in attendance_records if a.status == 'present'])
@@ -890,22 +1288,14 @@ async def generate_report(
         report_lines.append("Date          | Status   | Time              | Location")
         report_lines.append("-" * 80)
         
-        for record in attendance_records:
+        verdicts = hmac_integrity.verify_attendance_records(attendance_records)
+        
+        for record, is_valid in zip(attendance_records, verdicts):
             date_str = str(record.date.date()) if record.date else "N/A"
             status_str = record.status.upper()
             time_str = record.marked_at.strftime("%H:%M:%S") if record.marked_at else "N/A"
             location_str = record.location_name or "N/A"
             
-            date_only = record.date.strftime("%Y-%m-%d") if record.date else ""
-            is_valid = hmac_integrity.verify_attendance_hmac(
-                employee_id=record.employee_id,
-                date_str=date_only,
-                status=record.status,
-                stored_hmac=record.hmac,
-                latitude=record.latitude or "",
-                longitude=record.longitude or ""
-            )
-            
             tamper_flag = " [TAMPERED]" if not is_valid else ""
             report_lines.append("{} | {} | {} | {}{}".format(
                 date_str.ljust(13),
@@ -933,6 +1323,62 @@ async def generate_report(
         print("[ERROR] Error in generate_report: {}".format(str(e)))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/admin/export-report")
+async def export_report(
+    db: AsyncSession = Depends(get_async_db),
+    format: str = "csv",
+    employee_id: int = None,
+    department: str = None,
+    start_date: str = None,
+    end_date: str = None
+):
+    """
+    Stream an attendance export as TXT, CSV or NDJSON
+    
+    Covers one employee (employee_id), one department, or all approved
+    employees. Rows are fetched in batches and HMAC-verified as they stream,
+    so memory use does not grow with the date range.
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be one of: txt, csv, ndjson")
+    
+    start_day, end_day = parse_date_range(start_date, end_date, default_days=90)
+    
+    if employee_id is not None:
+        employee = await db.get(Employee, employee_id)
+        if not employee:
+            raise HTTPException(status_code=404, detail="Employee not found")
+        scope = "{} ({})".format(employee.full_name, employee.employee_id)
+        scope_slug = employee.employee_id or str(employee.id)
+    elif department:
+        scope = "Department: {}".format(department)
+        scope_slug = re.sub(r'[^A-Za-z0-9]+', '_', department)
+    else:
+        scope = "All employees"
+        scope_slug = "ALL"
+    
+    query = export_query(start_day, end_day, employee_id=employee_id, department=department)
+    
+    if format == "csv":
+        content = stream_csv(query)
+    elif format == "ndjson":
+        content = stream_ndjson(query)
+    else:
+        content = stream_txt(query, str(start_day), str(end_day), scope)
+    
+    filename = "Attendance_Report_{}_{}_{}.{}".format(
+        scope_slug,
+        start_day.strftime("%Y%m%d"),
+        end_day.strftime("%Y%m%d"),
+        format
+    )
+    
+    return StreamingResponse(
+        content,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": 'attachment; filename="{}"'.format(filename)}
+    )
+
 @app.get("/api/debug/status")
 async def debug_status(db: Session = Depends(get_db)):
     try:
@@ -945,7 +1391,12 @@ async def debug_status(db: Session = Depends(get_db)):
             "database": "OK",
             "total_attendance": attendance_count,
             "total_employees": employee_count,
-            "total_users": user_count
+            "total_users": user_count,
+            "hash_pool": hashing_executor.stats(),
+            "integrity_cache": hmac_integrity.verdict_cache.stats(),
+            "mail_queue": mail_dispatcher.stats(),
+            "events": event_broker.stats(),
+            "checkin_buffer": checkin_buffer.stats()
         }
     except Exception as e:
         print("[ERROR] Debug status error: {}".format(str(e)))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Text, ForeignKey, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -33,26 +33,72 @@ class Employee(Base):
     approved_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     approved_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    change_seq = Column(Integer, nullable=True, index=True)  # set from the change counter on every write
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        # One record per employee per day; also serves (employee_id, day) range scans
+        UniqueConstraint("employee_id", "attendance_day", name="uq_attendance_employee_day"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("employees.id"))
     date = Column(DateTime(timezone=True), server_default=func.now())
+    attendance_day = Column(Date, nullable=False, index=True)  # calendar day of `date`, for sargable range filters
     status = Column(String(20))  # present, absent
     marked_at = Column(DateTime(timezone=True), server_default=func.now())
     latitude = Column(String(50), nullable=True)
     longitude = Column(String(50), nullable=True)
     location_name = Column(String(255), nullable=True)
     hmac = Column(String(64), nullable=False)  # HMAC-SHA256 signature for integrity
+    change_seq = Column(Integer, nullable=True, index=True)  # set from the change counter on every write
+
+class AttendanceMonthlySummary(Base):
+    __tablename__ = "attendance_monthly_summary"
+    
+    employee_id = Column(Integer, ForeignKey("employees.id"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    present_days = Column(Integer, nullable=False, default=0)
+    absent_days = Column(Integer, nullable=False, default=0)
+    total_days = Column(Integer, nullable=False, default=0)
+    last_attendance = Column(DateTime(timezone=True), nullable=True)  # latest present `date` in the month
+
+class Holiday(Base):
+    __tablename__ = "holidays"
+    
+    day = Column(Date, primary_key=True)
+    name = Column(String(100))
+
+class AbsenceRun(Base):
+    __tablename__ = "absence_runs"
+    
+    day = Column(Date, primary_key=True)  # working day whose absences were written
+    absent_count = Column(Integer, nullable=False, default=0)
+    completed_at = Column(DateTime, nullable=True)  # UTC
+
+class Geofence(Base):
+    __tablename__ = "geofences"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, nullable=False)  # stored as the check-in's location_name
+    polygon = Column(Text, nullable=False)  # JSON [[lat, lon], ...], outline of a simple polygon
+    is_active = Column(Boolean, nullable=False, default=True)
+    updated_at = Column(DateTime, nullable=True)  # UTC
+
+class ChangeCounter(Base):
+    __tablename__ = "change_counters"
+    
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)  # UTC
 
 class OTP(Base):
     __tablename__ = "otps"
     
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String(100))
-    otp_code = Column(String(255))
+    email = Column(String(100), unique=True, index=True)
+    otp_code = Column(String(255))  # HMAC-SHA256 digest of the code
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     expires_at = Column(DateTime(timezone=True))
     is_used = Column(Boolean, default=False)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import hmac
+import hashlib
+import os
+import secrets
+import string
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.models import OTP
+from app.config import settings
+
+OTP_LENGTH = 6
+OTP_TTL_MINUTES = 10
+
+def generate_otp():
+    return ''.join(secrets.choice(string.digits) for _ in range(OTP_LENGTH))
+
+class OTPStore:
+    """
+    One active OTP per email, stored as a keyed HMAC digest
+
+    OTPs are short-lived and random, so a keyed HMAC is enough to keep them
+    unusable if the database leaks, and checking one costs a single indexed
+    lookup plus one SHA-256 instead of an Argon2 verification per stored row.
+    """
+
+    def __init__(self):
+        secret = os.getenv("OTP_SECRET_KEY") or settings.SECRET_KEY or "your-otp-secret-key-change-in-production"
+        self.secret_key = secret.encode()
+
+    def digest(self, email: str, otp_code: str) -> str:
+        """HMAC-SHA256 of the code bound to the email it was issued for"""
+        return hmac.new(self.secret_key, f"{email}|{otp_code}".encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, db: Session, email: str) -> str:
+        """
+        Replace any OTP for this email with a fresh one
+
+        Returns:
+            The plain text OTP (to be delivered to the user, never stored)
+        """
+        self.purge_expired(db)
+        db.query(OTP).filter(OTP.email == email).delete(synchronize_session=False)
+        
+        otp_code = generate_otp()
+        db.add(OTP(
+            email=email,
+            otp_code=self.digest(email, otp_code),
+            expires_at=datetime.now() + timedelta(minutes=OTP_TTL_MINUTES)
+        ))
+        db.commit()
+        return otp_code
+
+    def verify(self, db: Session, email: str, otp_code: str) -> bool:
+        """
+        Check the active OTP for this email and consume it if it matches
+        
+        Matching and consuming are one UPDATE, so two concurrent logins with
+        the same code cannot both succeed. Comparing digests in SQL leaks
+        nothing useful about the code itself.
+        """
+        consumed = db.query(OTP).filter(
+            OTP.email == email,
+            OTP.otp_code == self.digest(email, otp_code or ""),
+            OTP.is_used == False,
+            OTP.expires_at > datetime.now()
+        ).update({OTP.is_used: True}, synchronize_session=False)
+        db.commit()
+        return consumed == 1
+
+    def purge_expired(self, db: Session) -> int:
+        """Bulk delete expired and used OTP rows"""
+        deleted = db.query(OTP).filter(
+            (OTP.expires_at <= datetime.now()) | (OTP.is_used == True)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+
+otp_store = OTPStore()
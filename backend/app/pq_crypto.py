@@ -1,70 +1,116 @@
 import os
 import base64
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.backends import default_backend
+import struct
+from typing import Iterable, Iterator
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from app.key_manager import key_manager
 
-class PostQuantumCrypto:
-    def __init__(self, key_dir="certs"):
-        self.key_dir = key_dir
-        self.private_key = None
-        self.public_key = None
-        self._load_or_generate_keys()
+# Envelope format: RSA-OAEP wraps a random AES-256-GCM data key, the data
+# itself is sealed in fixed-size chunks (STREAM construction: nonce =
+# 7-byte random prefix | 4-byte chunk counter | 1-byte last-chunk flag, so
+# reordered, dropped or truncated chunks fail authentication)
+ENVELOPE_MAGIC = b"EAS1"
+ENVELOPE_CHUNK_SIZE = int(os.getenv("ENVELOPE_CHUNK_SIZE", 64 * 1024))
+ENVELOPE_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+DATA_KEY_BYTES = 32
+NONCE_PREFIX_BYTES = 7
+GCM_TAG_BYTES = 16
+_HEADER_FIXED = struct.Struct(">4sIH")  # magic, chunk size, wrapped key length
+_FRAME_LENGTH = struct.Struct(">I")
 
-    def _load_or_generate_keys(self):
-        """Load RSA keys for encryption (RSA-4096 implementation)"""
-        private_key_path = os.path.join(self.key_dir, "rsa_private.pem")
-        public_key_path = os.path.join(self.key_dir, "rsa_public.pem")
-        
-        if os.path.exists(private_key_path) and os.path.exists(public_key_path):
-            with open(private_key_path, "rb") as f:
-                self.private_key = serialization.load_pem_private_key(
-                    f.read(),
-                    password=None,
-                    backend=default_backend()
-                )
-            with open(public_key_path, "rb") as f:
-                self.public_key = serialization.load_pem_public_key(
-                    f.read(),
-                    backend=default_backend()
-                )
-        else:
-            self._generate_keys()
-    
-    def _generate_keys(self):
-        """Generate RSA 4096-bit key pair for encryption"""
-        os.makedirs(self.key_dir, exist_ok=True)
-        
-        self.private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=4096,
-            backend=default_backend()
-        )
-        self.public_key = self.private_key.public_key()
-        
-        private_pem = self.private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.TraditionalOpenSSL,
-            encryption_algorithm=serialization.NoEncryption()
-        )
+class EnvelopeError(ValueError):
+    """Raised when an envelope is malformed, tampered with or truncated"""
+
+def _oaep():
+    return padding.OAEP(
+        mgf=padding.MGF1(algorithm=hashes.SHA256()),
+        algorithm=hashes.SHA256(),
+        label=None
+    )
+
+def _chunk_nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    return prefix + struct.pack(">IB", counter, 1 if last else 0)
+
+def _rechunk(source: Iterable[bytes], chunk_size: int) -> Iterator[bytes]:
+    """Regroup arbitrary byte pieces into chunk_size blocks (the last may be shorter)"""
+    buffer = bytearray()
+    for piece in source:
+        buffer += piece
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    if buffer:
+        yield bytes(buffer)
+
+class EnvelopeSession:
+    """
+    AES-256-GCM data key for one client session or file
+
+    The key is RSA-unwrapped once when the session is opened; every message
+    after that costs only symmetric work.
+    """
+    
+    def __init__(self, data_key: bytes, wrapped_key: bytes):
+        self.wrapped_key = wrapped_key
+        self._aead = AESGCM(data_key)
+    
+    @property
+    def wrapped_key_base64(self) -> str:
+        return base64.b64encode(self.wrapped_key).decode('utf-8')
+    
+    def encrypt(self, data, associated_data: bytes = None) -> str:
+        """
+        Encrypt one message under the session key
         
-        public_pem = self.public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
+        Args:
+            data: str or bytes of any length
+            associated_data: Optional bytes authenticated but not encrypted
         
-        with open(os.path.join(self.key_dir, "rsa_private.pem"), "wb") as f:
-            f.write(private_pem)
+        Returns:
+            str: base64(nonce | ciphertext | tag)
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        nonce = os.urandom(12)
+        return base64.b64encode(nonce + self._aead.encrypt(nonce, data, associated_data)).decode('utf-8')
+    
+    def decrypt(self, token, associated_data: bytes = None) -> bytes:
+        """
+        Decrypt a message produced by encrypt()
         
-        with open(os.path.join(self.key_dir, "rsa_public.pem"), "wb") as f:
-            f.write(public_pem)
+        Raises:
+            EnvelopeError: If the message was tampered with or uses another key
+        """
+        if isinstance(token, str):
+            token = base64.b64decode(token.encode('utf-8'))
+        try:
+            return self._aead.decrypt(token[:12], token[12:], associated_data)
+        except InvalidTag:
+            raise EnvelopeError("Envelope message failed authentication")
+
+class PostQuantumCrypto:
+    def __init__(self, keys=None):
+        # Keys are loaded by the key manager on first use, not at import
+        self.keys = keys or key_manager
+    
+    @property
+    def key_dir(self):
+        return self.keys.key_dir
+    
+    @property
+    def private_key(self):
+        return self.keys.private_key
+    
+    @property
+    def public_key(self):
+        return self.keys.public_key
     
     def get_public_key_pem(self):
         """Return public key in PEM format for client"""
-        return self.public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        ).decode('utf-8')
+        return self.keys.public_key_pem
     
     def encrypt_data(self, data: str) -> str:
         """Encrypt data using RSA-4096 (public key)"""
@@ -95,5 +141,152 @@ class PostQuantumCrypto:
             )
         )
         return decrypted.decode('utf-8')
+    
+    def wrap_key(self, data_key: bytes) -> bytes:
+        """RSA-OAEP wrap a symmetric data key with the public key"""
+        return self.public_key.encrypt(data_key, _oaep())
+    
+    def unwrap_key(self, wrapped_key: bytes) -> bytes:
+        """RSA-OAEP unwrap a data key (the only private-key operation per envelope)"""
+        try:
+            data_key = self.private_key.decrypt(wrapped_key, _oaep())
+        except ValueError:
+            raise EnvelopeError("Could not unwrap envelope key")
+        if len(data_key) != DATA_KEY_BYTES:
+            raise EnvelopeError("Unexpected envelope key length")
+        return data_key
+    
+    def new_session(self) -> EnvelopeSession:
+        """Create a session with a fresh random data key, wrapped for this server"""
+        data_key = AESGCM.generate_key(bit_length=DATA_KEY_BYTES * 8)
+        return EnvelopeSession(data_key, self.wrap_key(data_key))
+    
+    def open_session(self, wrapped_key) -> EnvelopeSession:
+        """
+        Open a session from a client-supplied wrapped key
+        
+        Args:
+            wrapped_key: RSA-OAEP(SHA-256) wrapped 32-byte AES key, raw or base64
+        
+        Returns:
+            EnvelopeSession: Ready to decrypt/encrypt any number of messages
+        """
+        if isinstance(wrapped_key, str):
+            wrapped_key = base64.b64decode(wrapped_key.encode('utf-8'))
+        return EnvelopeSession(self.unwrap_key(wrapped_key), wrapped_key)
+    
+    def encrypt_stream(self, source: Iterable[bytes], chunk_size: int = None) -> Iterator[bytes]:
+        """
+        Envelope-encrypt a byte stream of any size in constant memory
+        
+        Args:
+            source: Iterable of bytes pieces (file chunks, generator output, ...)
+            chunk_size: Plaintext bytes per sealed chunk (default: ENVELOPE_CHUNK_SIZE)
+        
+        Yields:
+            bytes: The header, then one length-prefixed frame per chunk
+        """
+        chunk_size = chunk_size or ENVELOPE_CHUNK_SIZE
+        if not 0 < chunk_size <= ENVELOPE_MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be between 1 and {ENVELOPE_MAX_CHUNK_SIZE}")
+        
+        data_key = AESGCM.generate_key(bit_length=DATA_KEY_BYTES * 8)
+        wrapped_key = self.wrap_key(data_key)
+        nonce_prefix = os.urandom(NONCE_PREFIX_BYTES)
+        header = _HEADER_FIXED.pack(ENVELOPE_MAGIC, chunk_size, len(wrapped_key)) + wrapped_key + nonce_prefix
+        aead = AESGCM(data_key)
+        yield header
+        
+        counter = 0
+        pending = None
+        # Hold one chunk back so the final one can be flagged as last
+        for chunk in _rechunk(source, chunk_size):
+            if pending is not None:
+                sealed = aead.encrypt(_chunk_nonce(nonce_prefix, counter, False), pending, header)
+                yield _FRAME_LENGTH.pack(len(sealed)) + sealed
+                counter += 1
+            pending = chunk
+        
+        sealed = aead.encrypt(_chunk_nonce(nonce_prefix, counter, True), pending or b"", header)
+        yield _FRAME_LENGTH.pack(len(sealed)) + sealed
+    
+    def decrypt_stream(self, source: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Decrypt a stream produced by encrypt_stream, one RSA unwrap per stream
+        
+        Each chunk is authenticated before it is yielded; a stream cut short
+        raises EnvelopeError at the end, so consumers must not treat the
+        output as complete until iteration finishes.
+        
+        Args:
+            source: Iterable of bytes pieces, split anywhere
+        
+        Yields:
+            bytes: Plaintext chunks
+        
+        Raises:
+            EnvelopeError: On a malformed header, tampered chunk or truncation
+        """
+        buffer = bytearray()
+        pieces = iter(source)
+        
+        def fill(size: int) -> bool:
+            while len(buffer) < size:
+                piece = next(pieces, None)
+                if piece is None:
+                    return False
+                buffer.extend(piece)
+            return True
+        
+        if not fill(_HEADER_FIXED.size):
+            raise EnvelopeError("Envelope header is incomplete")
+        magic, chunk_size, wrapped_length = _HEADER_FIXED.unpack_from(buffer)
+        if magic != ENVELOPE_MAGIC or not 0 < chunk_size <= ENVELOPE_MAX_CHUNK_SIZE:
+            raise EnvelopeError("Not an envelope stream")
+        header_length = _HEADER_FIXED.size + wrapped_length + NONCE_PREFIX_BYTES
+        if not fill(header_length):
+            raise EnvelopeError("Envelope header is incomplete")
+        
+        header = bytes(buffer[:header_length])
+        wrapped_key = header[_HEADER_FIXED.size:_HEADER_FIXED.size + wrapped_length]
+        nonce_prefix = header[-NONCE_PREFIX_BYTES:]
+        aead = AESGCM(self.unwrap_key(wrapped_key))
+        del buffer[:header_length]
+        
+        def open_frame(sealed: bytes, counter: int, last: bool) -> bytes:
+            try:
+                return aead.decrypt(_chunk_nonce(nonce_prefix, counter, last), sealed, header)
+            except InvalidTag:
+                raise EnvelopeError(f"Envelope chunk {counter} failed authentication")
+        
+        counter = 0
+        pending = None
+        while fill(_FRAME_LENGTH.size):
+            (frame_length,) = _FRAME_LENGTH.unpack_from(buffer)
+            if frame_length > chunk_size + GCM_TAG_BYTES:
+                raise EnvelopeError("Envelope chunk exceeds the declared chunk size")
+            if not fill(_FRAME_LENGTH.size + frame_length):
+                raise EnvelopeError("Envelope stream is truncated")
+            sealed = bytes(buffer[_FRAME_LENGTH.size:_FRAME_LENGTH.size + frame_length])
+            del buffer[:_FRAME_LENGTH.size + frame_length]
+            
+            if pending is not None:
+                yield open_frame(pending, counter, False)
+                counter += 1
+            pending = sealed
+        
+        if buffer or pending is None:
+            raise EnvelopeError("Envelope stream is truncated")
+        yield open_frame(pending, counter, True)
+    
+    def encrypt_envelope(self, data) -> bytes:
+        """Envelope-encrypt an in-memory payload of any size"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return b"".join(self.encrypt_stream([data]))
+    
+    def decrypt_envelope(self, envelope: bytes) -> bytes:
+        """Decrypt a payload produced by encrypt_envelope or encrypt_stream"""
+        return b"".join(self.decrypt_stream([envelope]))
 
 pq_crypto = PostQuantumCrypto()
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import threading
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from app.config import settings
+from app.key_manager import key_manager, KeyNotFoundError
+
+class PublicKeyResponse:
+    """
+    Precomputed response for the public key endpoints
+    
+    The JSON body and its strong ETag are built once per key version and
+    shared by /api/security/public-key and /api/auth/public-key. Clients
+    revalidating with If-None-Match get a bodiless 304. When the key
+    manager picks up a rotated key pair, the body is rebuilt and the
+    ETag changes.
+    """
+    
+    def __init__(self, keys=None, max_age: int = None):
+        self.keys = keys or key_manager
+        self.max_age = settings.PUBLIC_KEY_MAX_AGE if max_age is None else max_age
+        self._version = None
+        self._body = None
+        self._etag = None
+        self._lock = threading.Lock()
+    
+    def _build(self):
+        public_key_pem = self.keys.public_key_pem
+        # Union of the fields both endpoints used to return, so either client keeps working
+        body = json.dumps({
+            "algorithm": "RSA-4096",
+            "encryption_type": "RSA OAEP with SHA-256",
+            "public_key": public_key_pem,
+            "key_format": "PEM",
+            "key_size": "4096 bits",
+            "status": "ACTIVE"
+        }, separators=(",", ":")).encode("utf-8")
+        return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    
+    def current(self):
+        """
+        Returns:
+            tuple: (body bytes, ETag) for the current key pair
+        
+        Raises:
+            KeyNotFoundError: If no key pair has been generated
+        """
+        self.keys.refresh_if_rotated()
+        # After a rotation the key manager is unloaded until the next access
+        if self._body is None or not self.keys.is_loaded or self._version != self.keys.version:
+            with self._lock:
+                body, etag = self._build()
+                self._body, self._etag, self._version = body, etag, self.keys.version
+        return self._body, self._etag
+    
+    @staticmethod
+    def _etag_matches(if_none_match: str, etag: str) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+        # If-None-Match uses weak comparison, so a W/ prefix still matches
+        return "*" in candidates or any(
+            (candidate[2:] if candidate.startswith("W/") else candidate) == etag for candidate in candidates
+        )
+    
+    def respond(self, request: Request) -> Response:
+        try:
+            body, etag = self.current()
+        except KeyNotFoundError as e:
+            return JSONResponse(
+                status_code=503,
+                content={"status": "error", "message": f"Could not load public key: {str(e)}"}
+            )
+        
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={self.max_age}"}
+        if self._etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+public_key_response = PublicKeyResponse()
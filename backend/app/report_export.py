@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select
+from app.database import SessionLocal
+from app.models import User, Employee, Attendance
+from app.hmac_integrity import hmac_integrity
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "txt": "text/plain",
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+CSV_COLUMNS = [
+    "employee_id", "employee_name", "email", "department", "position", "date", "status",
+    "marked_at", "location", "latitude", "longitude", "integrity_verified"
+]
+
+def export_query(start_day, end_day, employee_id: int = None, department: str = None):
+    """Attendance rows with employee details for the export scope, grouped by employee"""
+    query = select(
+        Attendance.employee_id, Attendance.date, Attendance.status, Attendance.hmac,
+        Attendance.latitude, Attendance.longitude, Attendance.marked_at, Attendance.location_name,
+        Employee.employee_id.label("employee_code"), Employee.full_name, Employee.department,
+        Employee.position, User.email
+    ).join(
+        Employee, Employee.id == Attendance.employee_id
+    ).outerjoin(
+        User, User.id == Employee.user_id
+    ).where(
+        Attendance.attendance_day >= start_day,
+        Attendance.attendance_day <= end_day
+    )
+    
+    if employee_id is not None:
+        query = query.where(Attendance.employee_id == employee_id)
+    else:
+        query = query.where(Employee.is_approved == True)
+        if department:
+            query = query.where(Employee.department == department)
+    
+    return query.order_by(Employee.full_name, Employee.id, Attendance.attendance_day).execution_options(
+        stream_results=True, yield_per=EXPORT_BATCH_SIZE
+    )
+
+def iter_verified_batches(query):
+    """
+    Stream (row, is_valid) batches through a server-side cursor
+    
+    Uses its own session so the stream outlives the request's session, and
+    verifies each fetched batch with one HMAC batch call.
+    """
+    db = SessionLocal()
+    try:
+        for partition in db.execute(query).partitions():
+            verdicts = hmac_integrity.verify_attendance_rows([
+                (
+                    row.employee_id,
+                    row.date.date().isoformat() if row.date else "",
+                    row.status,
+                    row.hmac,
+                    row.latitude or "",
+                    row.longitude or ""
+                )
+                for row in partition
+            ])
+            yield list(zip(partition, verdicts))
+    finally:
+        db.close()
+
+def export_record(row, is_valid: bool) -> dict:
+    return {
+        "employee_id": row.employee_code,
+        "employee_name": row.full_name,
+        "email": row.email or "N/A",
+        "department": row.department or "N/A",
+        "position": row.position or "N/A",
+        "date": str(row.date.date()) if row.date else None,
+        "status": row.status,
+        "marked_at": str(row.marked_at) if row.marked_at else None,
+        "location": row.location_name or "N/A",
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "integrity_verified": is_valid
+    }
+
+def stream_csv(query):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for batch in iter_verified_batches(query):
+        writer.writerows(export_record(row, is_valid) for row, is_valid in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # No rows at all: the header is still pending
+        yield buffer.getvalue()
+
+def stream_ndjson(query):
+    for batch in iter_verified_batches(query):
+        yield "".join(json.dumps(export_record(row, is_valid)) + "\n" for row, is_valid in batch)
+
+def stream_txt(query, start_date: str, end_date: str, scope: str):
+    """Plain-text report with one section and running summary per employee"""
+    yield "\n".join([
+        "=" * 80,
+        "EMPLOYEE ATTENDANCE REPORT".center(80),
+        "=" * 80,
+        "Scope:         {}".format(scope),
+        "From Date:     {}".format(start_date),
+        "To Date:       {}".format(end_date),
+        ""
+    ]) + "\n"
+    
+    current = None
+    totals = None
+    
+    def section_footer():
+        total_days = totals["present"] + totals["absent"]
+        rate = round((totals["present"] / total_days * 100) if total_days > 0 else 0, 2)
+        return "\n".join([
+            "-" * 80,
+            "Present Days:  {}   Absent Days:  {}   Attendance Rate: {}%   Tampered: {}".format(
+                totals["present"], totals["absent"], rate, totals["tampered"]
+            ),
+            ""
+        ]) + "\n"
+    
+    for batch in iter_verified_batches(query):
+        lines = []
+        for row, is_valid in batch:
+            if row.employee_id != current:
+                if current is not None:
+                    lines.append(section_footer())
+                current = row.employee_id
+                totals = {"present": 0, "absent": 0, "tampered": 0}
+                lines.append("\n".join([
+                    "-" * 80,
+                    "{} ({}) - {} - {}".format(row.full_name, row.employee_code, row.department or "N/A", row.email or "N/A"),
+                    "-" * 80,
+                    "Date          | Status   | Time              | Location",
+                    ""
+                ]))
+            
+            if row.status in totals:
+                totals[row.status] += 1
+            if not is_valid:
+                totals["tampered"] += 1
+            
+            lines.append("{} | {} | {} | {}{}\n".format(
+                (str(row.date.date()) if row.date else "N/A").ljust(13),
+                row.status.upper().ljust(8),
+                (row.marked_at.strftime("%H:%M:%S") if row.marked_at else "N/A").ljust(17),
+                (row.location_name or "N/A")[:30],
+                "" if is_valid else " [TAMPERED]"
+            ))
+        yield "".join(lines)
+    
+    if current is not None:
+        yield section_footer()
+    
+    yield "\n".join([
+        "=" * 80,
+        "Generated on: {}".format(datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        "=" * 80,
+        ""
+    ])
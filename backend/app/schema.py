@@ -0,0 +1,151 @@
+import asyncio
+from datetime import date
+from sqlalchemy import MetaData, PrimaryKeyConstraint, text
+from app.config import settings
+from app.database import Base
+import app.models  # noqa: F401  (registers the tables on Base.metadata)
+from app.change_tracking import ensure_change_counter
+from app.geofence import ensure_default_geofence
+
+ATTENDANCE_TABLE = "attendance"
+PARTITION_LOCK_KEY = "attendance_partitions"
+PARTITION_CHECK_INTERVAL = 24 * 60 * 60  # seconds between background partition checks
+
+def is_postgresql(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def add_months(day: date, months: int) -> date:
+    """First day of the month `months` after the month containing `day`"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def attendance_partition_name(day: date) -> str:
+    return f"{ATTENDANCE_TABLE}_y{day.year:04d}m{day.month:02d}"
+
+def partitioned_attendance_table(metadata: MetaData = None):
+    """
+    PostgreSQL variant of the attendance table, range-partitioned by month
+    on attendance_day
+    
+    PostgreSQL requires every unique constraint on a partitioned table to
+    include the partition key, so the primary key becomes
+    (id, attendance_day). ids still come from a single sequence and stay
+    unique, which keeps the ORM mapping on `id` valid.
+    
+    Args:
+        metadata: MetaData to build the table in (a private copy by default)
+    
+    Returns:
+        Table: attendance table carrying the partitioned DDL options
+    """
+    metadata = metadata if metadata is not None else MetaData()
+    for table in Base.metadata.sorted_tables:
+        if table.name not in metadata.tables:
+            table.to_metadata(metadata)
+    
+    table = metadata.tables[ATTENDANCE_TABLE]
+    table.c.id.autoincrement = True
+    table.c.attendance_day.primary_key = True
+    table.append_constraint(PrimaryKeyConstraint("id", "attendance_day", name="attendance_pkey"))
+    table.dialect_options["postgresql"]["partition_by"] = "RANGE (attendance_day)"
+    return table
+
+def attendance_is_partitioned(conn) -> bool:
+    relkind = conn.execute(text(
+        "SELECT c.relkind FROM pg_class c "
+        "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+    ), {"name": ATTENDANCE_TABLE}).scalar()
+    return relkind == "p"
+
+def ensure_attendance_partitions(conn, first_day: date, last_day: date) -> list:
+    """
+    Create the monthly attendance partitions covering first_day..last_day
+    
+    Safe to call from several workers at once: creation is serialized with
+    a transaction-scoped advisory lock and skips existing partitions.
+    
+    Args:
+        conn: Connection inside a transaction on a PostgreSQL database
+        first_day: Any day in the first month to cover
+        last_day: Any day in the last month to cover
+    
+    Returns:
+        list: Names of the partitions that were created
+    """
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": PARTITION_LOCK_KEY})
+    existing = set(conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :name AND pg_table_is_visible(parent.oid)"
+    ), {"name": ATTENDANCE_TABLE}).scalars())
+    
+    created = []
+    month = month_start(first_day)
+    while month <= last_day:
+        next_month = add_months(month, 1)
+        name = attendance_partition_name(month)
+        if name not in existing:
+            conn.execute(text(
+                f'CREATE TABLE "{name}" PARTITION OF {ATTENDANCE_TABLE} '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+            ))
+            created.append(name)
+        month = next_month
+    return created
+
+def ensure_upcoming_partitions(bind) -> list:
+    """Partitions for the current month plus ATTENDANCE_PARTITION_MONTHS_AHEAD"""
+    today = date.today()
+    with bind.begin() as conn:
+        if not attendance_is_partitioned(conn):
+            return []
+        return ensure_attendance_partitions(
+            conn, today, add_months(today, settings.ATTENDANCE_PARTITION_MONTHS_AHEAD)
+        )
+
+def create_schema(bind):
+    """
+    Create all tables and seed the change counter and the default
+    geofence; on PostgreSQL,
+    attendance is created partitioned by month together with its upcoming
+    partitions
+    
+    Args:
+        bind: Engine to create the schema on
+    """
+    if not is_postgresql(bind):
+        Base.metadata.create_all(bind=bind)
+        ensure_change_counter(bind)
+        ensure_default_geofence(bind)
+        return
+    
+    others = [table for table in Base.metadata.sorted_tables if table.name != ATTENDANCE_TABLE]
+    Base.metadata.create_all(bind=bind, tables=others)
+    ensure_change_counter(bind)
+    ensure_default_geofence(bind)
+    
+    with bind.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": PARTITION_LOCK_KEY})
+        partitioned_attendance_table().create(bind=conn, checkfirst=True)
+        if not attendance_is_partitioned(conn):
+            print("[!] attendance table is not partitioned; run `python migrate_db.py` to convert it")
+            return
+    
+    created = ensure_upcoming_partitions(bind)
+    if created:
+        print(f"[✓] Created attendance partitions: {', '.join(created)}")
+
+async def maintain_attendance_partitions(bind):
+    """Background task keeping next months' partitions in place on long-running servers"""
+    while True:
+        await asyncio.sleep(PARTITION_CHECK_INTERVAL)
+        try:
+            created = await asyncio.to_thread(ensure_upcoming_partitions, bind)
+            if created:
+                print(f"[✓] Created attendance partitions: {', '.join(created)}")
+        except Exception as e:
+            print(f"[ERROR] Attendance partition maintenance failed: {str(e)}")
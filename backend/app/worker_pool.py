@@ -0,0 +1,49 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class ChunkedThreadPool:
+    """
+    Fixed-size thread pool for CPU-bound batch work (HMAC verification,
+    CNIC decryption)
+    
+    The executor is created on first use, so processes that never handle a
+    large batch never start its threads, and kept until shutdown(). Its size
+    comes from configuration and never changes while the process runs.
+    """
+    
+    def __init__(self, max_workers: int, thread_name_prefix: str):
+        self.max_workers = max(1, max_workers)
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.thread_name_prefix)
+            return self._executor
+    
+    def map_chunks(self, func, items: list, chunks: int = None) -> list:
+        """
+        Split items into contiguous chunks, run func on each in the pool and
+        concatenate the results in order
+        
+        Args:
+            func: Callable taking a list of items and returning a list
+            items: The batch
+            chunks: Number of chunks (default: the pool size); more chunks
+                than threads simply queue
+        """
+        chunks = max(1, chunks or self.max_workers)
+        chunk_size = -(-len(items) // chunks) or 1
+        results = []
+        for chunk_result in self._get_executor().map(func, [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]):
+            results.extend(chunk_result)
+        return results
+    
+    def shutdown(self):
+        """Stop the threads without waiting for queued work; the next batch starts a fresh pool"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,827 @@
+"""
+Performance benchmarks for the Employee Attendance System backend
+
+Each benchmark runs against a throwaway SQLite database so it never
+touches real data.
+
+Usage:
+    python benchmark.py queries [--sizes 100 1000 5000]
+    python benchmark.py hmac [--rows 200000] [--workers 4]
+    python benchmark.py writes [--employees 2000] [--concurrency 32]
+    python benchmark.py concurrency [--clients 200] [--requests 10]
+    python benchmark.py workers [--workers 1 2 4] [--duration 5]
+    python benchmark.py startup [--runs 5] [--budget-ms 1500]
+    python benchmark.py envelope [--mb 64] [--fields 200]
+    python benchmark.py ingest [--records 5000] [--batch-sizes 100 1000 5000]
+    python benchmark.py writebehind [--employees 5000] [--concurrency 200]
+    python benchmark.py rollup [--employees 500] [--days 730]
+    python benchmark.py absences [--employees 50000] [--present 0.9]
+    python benchmark.py geofence [--fences 50] [--vertices 200] [--points 20000]
+"""
+import os
+import sys
+import time
+import hmac
+import hashlib
+import io
+import asyncio
+import argparse
+import tempfile
+import json
+import signal
+import socket
+import subprocess
+import threading
+import http.client
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_DB_PATH = os.path.join(tempfile.gettempdir(), "eas_benchmark.db")
+os.environ["DATABASE_URL"] = os.getenv("BENCHMARK_DATABASE_URL", f"sqlite:///{BENCH_DB_PATH}")
+
+from sqlalchemy import event, insert, select, func, case
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from fastapi import Request, Response
+from app.database import (
+    engine, Base, AsyncSessionLocal, async_engine, build_async_engine, async_database_url
+)
+from app.models import User, Employee, Attendance, AttendanceMonthlySummary
+from app.hmac_integrity import hmac_integrity
+from app.worker_pool import ChunkedThreadPool
+from app.attendance_summary import rebuild_attendance_summary
+from app.geofence import ensure_default_geofence
+
+
+def print_header(title):
+    print("\n" + "=" * 60)
+    print(f" {title}".center(60))
+    print("=" * 60)
+
+def reset_database(bind=engine):
+    Base.metadata.drop_all(bind=bind)
+    Base.metadata.create_all(bind=bind)
+    ensure_default_geofence(bind)
+
+def seed_database(employee_count: int, days: int = 1, bind=engine):
+    """Insert approved employees with `days` of present attendance each"""
+    reset_database(bind)
+    today = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)
+    
+    with bind.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "email": f"bench{i}@example.com", "hashed_password": "x", "role": "employee", "is_active": True}
+            for i in range(1, employee_count + 1)
+        ])
+        conn.execute(insert(Employee), [
+            {"id": i, "user_id": i, "full_name": f"Bench Employee {i}", "cnic": f"cnic-{i}",
+             "employee_id": f"EMP{i:04d}", "department": "Engineering", "position": "Engineer", "is_approved": True}
+            for i in range(1, employee_count + 1)
+        ])
+        rows = []
+        for day in range(days):
+            marked = today - timedelta(days=day)
+            date_str = marked.strftime("%Y-%m-%d")
+            for i in range(1, employee_count + 1):
+                rows.append({
+                    "employee_id": i, "date": marked, "attendance_day": marked.date(), "marked_at": marked, "status": "present",
+                    "latitude": "33.65", "longitude": "73.0", "location_name": "NUST H-12 Islamabad",
+                    "hmac": hmac_integrity.compute_attendance_hmac(i, date_str, "present", "33.65", "73.0")
+                })
+        if rows:
+            conn.execute(insert(Attendance), rows)
+            rebuild_attendance_summary(conn)
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+class QueryCounter:
+    """Counts SQL statements issued through the engine"""
+
+    def __init__(self, bind):
+        self.bind = bind
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, "before_cursor_execute", self._on_execute)
+
+
+def bench_queries(args):
+    """Show that /api/admin/all-attendance issues a constant number of queries"""
+    from app.main import get_all_attendance, ATTENDANCE_PAGE_MAX
+    
+    print_header("ALL-ATTENDANCE QUERY COUNT")
+    print(f"{'employees':>10} | {'rows':>8} | {'queries':>8} | {'time (ms)':>10}")
+    print("-" * 60)
+    
+    async def run_endpoint():
+        async with AsyncSessionLocal() as db:
+            result = await get_all_attendance(
+                request=Request({"type": "http", "headers": [], "query_string": b""}),
+                response=Response(), db=db, start_date=None, end_date=None,
+                limit=ATTENDANCE_PAGE_MAX, cursor=None
+            )
+        # Each size runs under a fresh asyncio.run(); drop connections bound to the previous loop
+        await async_engine.dispose()
+        return result
+    
+    for size in args.sizes:
+        seed_database(size)
+        with QueryCounter(async_engine.sync_engine) as counter:
+            started = time.perf_counter()
+            result = asyncio.run(run_endpoint())
+            elapsed = (time.perf_counter() - started) * 1000
+        print(f"{size:>10} | {len(result):>8} | {counter.count:>8} | {elapsed:>10.1f}")
+
+
+def bench_hmac(args):
+    """Attendance HMAC verification throughput, per-row vs batch"""
+    print_header("HMAC VERIFICATION THROUGHPUT")
+    
+    rows = []
+    for i in range(args.rows):
+        date_str = f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}"
+        signature = hmac_integrity.compute_attendance_hmac(i, date_str, "present", "33.65", "73.0")
+        rows.append((i, date_str, "present", signature, "33.65", "73.0"))
+    
+    def fresh_hmac_per_row():
+        # The pre-batch approach: a new keyed HMAC object for every row
+        key = hmac_integrity.secret_key
+        return [
+            hmac.compare_digest(hmac.new(key, f"{r[0]}|{r[1]}|{r[2]}|{r[4]}|{r[5]}".encode(), hashlib.sha256).hexdigest(), r[3])
+            for r in rows
+        ]
+    
+    runs = [
+        ("hmac.new per row (baseline)", fresh_hmac_per_row),
+        ("verify_attendance_rows (batch)", lambda: hmac_integrity.verify_attendance_rows(rows, max_workers=1)),
+    ]
+    if args.workers > 1:
+        # The pool is sized once from HMAC_WORKERS; give this run one of the requested size
+        hmac_integrity.pool = ChunkedThreadPool(args.workers, thread_name_prefix="hmac")
+        runs.append((
+            f"verify_attendance_rows ({args.workers} threads)",
+            lambda: hmac_integrity.verify_attendance_rows(rows, max_workers=args.workers)
+        ))
+    
+    print(f"{'method':<40} | {'rows/s':>12}")
+    print("-" * 60)
+    for name, run in runs:
+        elapsed = float("inf")
+        for _ in range(3):
+            started = time.perf_counter()
+            verdicts = run()
+            elapsed = min(elapsed, time.perf_counter() - started)
+        assert all(verdicts)
+        print(f"{name:<40} | {len(rows) / elapsed:>12,.0f}")
+
+
+def bench_writes(args):
+    """Concurrent mark_attendance throughput: default engine vs tuned engine"""
+    from app.main import mark_attendance, MarkAttendanceRequest
+    from app.database import build_engine
+    
+    print_header("CONCURRENT CHECK-IN WRITES")
+    print(f"{args.employees} check-ins, {args.concurrency} concurrent clients\n")
+    print(f"{'engine':<28} | {'ok':>6} | {'errors':>6} | {'writes/s':>9} | {'p50 ms':>7} | {'p99 ms':>7}")
+    print("-" * 78)
+    
+    configs = [
+        ("default create_async_engine", lambda url: create_async_engine(async_database_url(url))),
+        ("build_async_engine (WAL)", build_async_engine),
+    ]
+    db_path = os.path.join(tempfile.gettempdir(), "eas_benchmark_writes.db")
+    
+    async def run_check_ins(bench_engine):
+        BenchSession = async_sessionmaker(bench_engine, autoflush=False, expire_on_commit=False)
+        limiter = asyncio.Semaphore(args.concurrency)
+        
+        async def check_in(employee_id):
+            async with limiter, BenchSession() as db:
+                started = time.perf_counter()
+                try:
+                    await mark_attendance(
+                        MarkAttendanceRequest(employee_id=employee_id, latitude=33.65, longitude=73.0), db=db
+                    )
+                    return time.perf_counter() - started, None
+                except Exception as e:
+                    return time.perf_counter() - started, type(e).__name__
+        
+        results = await asyncio.gather(*(check_in(i) for i in range(1, args.employees + 1)))
+        await bench_engine.dispose()
+        return results
+    
+    for name, factory in configs:
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        
+        seed_engine = build_engine(f"sqlite:///{db_path}")
+        seed_database(args.employees, days=0, bind=seed_engine)
+        seed_engine.dispose()
+        
+        with redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            results = asyncio.run(run_check_ins(factory(f"sqlite:///{db_path}")))
+            elapsed = time.perf_counter() - started
+        
+        succeeded = sum(1 for _, error in results if error is None)
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        print(f"{name:<28} | {succeeded:>6} | {len(results) - succeeded:>6} | {succeeded / elapsed:>9.0f} | "
+              f"{percentile(latencies, 0.5):>7.1f} | {percentile(latencies, 0.99):>7.1f}")
+
+async def asgi_get(app, path: str, query: str = "") -> int:
+    """Issue a GET straight into the ASGI app and return the status code"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "headers": [(b"host", b"benchmark")],
+        "client": ("127.0.0.1", 50000), "server": ("benchmark", 80)
+    }
+    status = {}
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+    
+    await app(scope, receive, send)
+    return status.get("code", 0)
+
+def bench_concurrency(args):
+    """Request latency with many concurrent clients on a single event loop (one uvicorn worker)"""
+    from app.main import app
+    
+    print_header("CONCURRENT CLIENT LATENCY")
+    seed_database(args.employees, days=args.days)
+    print(f"{args.clients} clients x {args.requests} requests, {args.employees} employees x {args.days} days\n")
+    print(f"{'endpoint':<38} | {'req/s':>7} | {'p50 ms':>7} | {'p99 ms':>7} | {'errors':>6}")
+    print("-" * 78)
+    
+    endpoints = [
+        ("/api/employee/my-attendance", lambda n: f"employee_id={n % args.employees + 1}"),
+        ("/api/hr/employee-stats", lambda n: ""),
+        ("/api/admin/employee-report/{}", lambda n: ""),
+    ]
+    
+    async def run(path_template, query_for):
+        latencies = []
+        errors = 0
+        
+        async def client(client_id):
+            nonlocal errors
+            for request_number in range(args.requests):
+                n = client_id * args.requests + request_number
+                path = path_template.format(n % args.employees + 1)
+                started = time.perf_counter()
+                code = await asgi_get(app, path, query_for(n))
+                latencies.append((time.perf_counter() - started) * 1000)
+                if code >= 400:
+                    errors += 1
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(args.clients)))
+        return latencies, errors, time.perf_counter() - started
+    
+    async def run_all():
+        # One event loop for every endpoint: the async engine's pool is bound to the loop it first ran on
+        results = [await run(path_template, query_for) for path_template, query_for in endpoints]
+        await async_engine.dispose()
+        return results
+    
+    with redirect_stdout(io.StringIO()):
+        results = asyncio.run(run_all())
+    
+    for (path_template, _), (latencies, errors, elapsed) in zip(endpoints, results):
+        latencies.sort()
+        print(f"{path_template:<38} | {len(latencies) / elapsed:>7.0f} | {percentile(latencies, 0.5):>7.1f} | "
+              f"{percentile(latencies, 0.99):>7.1f} | {errors:>6}")
+
+
+def wait_for_port(port: int, timeout: float = 60.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def http_load(port: int, clients: int, duration: float, make_request) -> tuple:
+    """
+    Drive the server with `clients` keep-alive connections for `duration`
+    seconds; make_request(n) returns (method, path, body)
+
+    Returns:
+        tuple: (completed requests, errors, sorted latencies in ms, elapsed seconds)
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(10 ** 9))
+    deadline = time.perf_counter() + duration
+    
+    def client():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            with lock:
+                n = next(counter)
+            method, path, body = make_request(n)
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+            local_latencies.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+    
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), errors[0], sorted(latencies), time.perf_counter() - started
+
+def bench_workers(args):
+    """Requests per second from run.py --production as the worker count grows"""
+    from cryptography.fernet import Fernet
+    
+    print_header("MULTI-WORKER THROUGHPUT")
+    seed_database(args.employees, days=args.days)
+    print(f"{os.cpu_count()} CPU cores, {args.clients} HTTP clients, {args.duration:.0f}s per run\n")
+    print(f"{'workers':>7} | {'endpoint':<30} | {'req/s':>7} | {'p50 ms':>7} | {'p99 ms':>7} | {'errors':>6}")
+    print("-" * 78)
+    
+    run_id = int(time.time())
+    endpoints = [
+        ("employee-stats (DB)", lambda n: ("GET", "/api/hr/employee-stats", None)),
+        ("my-attendance (DB + HMAC)", lambda n: (
+            "GET", f"/api/employee/my-attendance?employee_id={n % args.employees + 1}", None
+        )),
+        ("signup (Argon2 + AES)", lambda n: ("POST", "/api/employee/signup", json.dumps({
+            "full_name": f"Load {n}", "email": f"load{run_id}-{n}@example.com",
+            "cnic": f"{run_id % 100000:05d}-{n:07d}-1", "security_question": "q",
+            "security_answer": "a", "password": "Str0ng!Passw0rd#"
+        }))),
+    ]
+    
+    env = dict(os.environ, PORT=str(args.port), AES_KEY=os.getenv("AES_KEY") or Fernet.generate_key().decode())
+    for workers in args.workers:
+        server = subprocess.Popen(
+            [sys.executable, "run.py", "--production", "--workers", str(workers)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            if not wait_for_port(args.port):
+                print(f"{workers:>7} | server did not start")
+                continue
+            # Let every worker finish importing before measuring
+            http_load(args.port, args.clients, 2.0, endpoints[0][1])
+            for name, make_request in endpoints:
+                completed, errors, latencies, elapsed = http_load(args.port, args.clients, args.duration, make_request)
+                run_id += 1
+                print(f"{workers:>7} | {name:<30} | {completed / elapsed:>7.1f} | "
+                      f"{percentile(latencies, 0.5):>7.1f} | {percentile(latencies, 0.99):>7.1f} | {errors:>6}")
+        finally:
+            server.send_signal(signal.SIGINT)
+            try:
+                server.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = (time.perf_counter() - started) * 1000
+from app.key_manager import key_manager
+from app.aes_encryption import aes_encryption
+from app.database import engine
+print(json.dumps({
+    "ms": elapsed,
+    "rsa_loaded": key_manager.is_loaded,
+    "aes_ready": aes_encryption._cipher is not None,
+    "db_connections": engine.pool.checkedin() + engine.pool.checkedout(),
+}))
+"""
+
+def bench_startup(args):
+    """Cold `import app.main` time against a budget; nothing heavy may happen at import"""
+    import statistics
+    
+    print_header("IMPORT-TIME BUDGET")
+    print(f"{args.runs} fresh interpreters, budget {args.budget_ms:.0f} ms, empty KEY_DIR\n")
+    
+    empty_key_dir = tempfile.mkdtemp(prefix="eas_keys_")
+    env = dict(os.environ, KEY_DIR=empty_key_dir)
+    env.pop("AES_KEY", None)
+    
+    samples = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], env=env, capture_output=True, text=True, cwd=os.getcwd()
+        )
+        if result.returncode != 0:
+            print(result.stderr)
+            sys.exit(1)
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    
+    timings = sorted(sample["ms"] for sample in samples)
+    median = statistics.median(timings)
+    print(f"import app.main: median {median:.0f} ms, min {timings[0]:.0f} ms, max {timings[-1]:.0f} ms")
+    
+    checks = [
+        ("RSA key parsed at import", any(sample["rsa_loaded"] for sample in samples)),
+        ("AES cipher built at import", any(sample["aes_ready"] for sample in samples)),
+        ("database opened at import", any(sample["db_connections"] for sample in samples)),
+        ("RSA key generated at import", bool(os.listdir(empty_key_dir))),
+    ]
+    for label, happened in checks:
+        print(f"  {label:<30} {'YES' if happened else 'no'}")
+    
+    within_budget = median <= args.budget_ms and not any(happened for _, happened in checks)
+    print(f"\n{'PASS' if within_budget else 'FAIL'}")
+    if not within_budget:
+        sys.exit(1)
+
+def bench_envelope(args):
+    """MB/s of per-field RSA-OAEP vs RSA-wrapped AES-GCM envelope streaming"""
+    from app.pq_crypto import pq_crypto, ENVELOPE_CHUNK_SIZE
+    
+    print_header("ENVELOPE ENCRYPTION THROUGHPUT")
+    field_size = 446  # RSA-4096 OAEP/SHA-256 plaintext limit
+    print(f"per-field RSA: {args.fields} x {field_size} B fields; "
+          f"envelope: {args.mb} MB in {ENVELOPE_CHUNK_SIZE // 1024} KiB chunks\n")
+    print(f"{'path':<28} | {'encrypt MB/s':>12} | {'decrypt MB/s':>12} | {'RSA private ops':>15}")
+    print("-" * 78)
+    
+    fields = ["x" * field_size] * args.fields
+    started = time.perf_counter()
+    tokens = [pq_crypto.encrypt_data(field) for field in fields]
+    encrypt_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for token in tokens:
+        pq_crypto.decrypt_data(token)
+    decrypt_seconds = time.perf_counter() - started
+    field_mb = args.fields * field_size / 1e6
+    print(f"{'RSA-OAEP per field':<28} | {field_mb / encrypt_seconds:>12.3f} | "
+          f"{field_mb / decrypt_seconds:>12.3f} | {args.fields:>15}")
+    
+    block = os.urandom(1024 * 1024)
+    source = [block] * args.mb
+    started = time.perf_counter()
+    envelope = list(pq_crypto.encrypt_stream(source))
+    encrypt_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    decrypted = sum(len(chunk) for chunk in pq_crypto.decrypt_stream(envelope))
+    decrypt_seconds = time.perf_counter() - started
+    assert decrypted == len(block) * args.mb
+    print(f"{'envelope stream (AES-GCM)':<28} | {args.mb * 1.048576 / encrypt_seconds:>12.1f} | "
+          f"{args.mb * 1.048576 / decrypt_seconds:>12.1f} | {1:>15}")
+    
+    session = pq_crypto.open_session(pq_crypto.new_session().wrapped_key)
+    started = time.perf_counter()
+    tokens = [session.encrypt(field) for field in fields * 50]
+    encrypt_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for token in tokens:
+        session.decrypt(token)
+    decrypt_seconds = time.perf_counter() - started
+    print(f"{'envelope session per field':<28} | {field_mb * 50 / encrypt_seconds:>12.2f} | "
+          f"{field_mb * 50 / decrypt_seconds:>12.2f} | {1:>15}")
+
+def bench_ingest(args):
+    """Kiosk upload throughput: one mark_attendance per record vs /api/attendance/batch"""
+    from app.main import mark_attendance, MarkAttendanceRequest, AttendanceBatchRecord
+    from app.attendance_ingest import ingest_attendance
+    
+    print_header("BATCH ATTENDANCE INGESTION")
+    print(f"{args.records} check-ins per run\n")
+    print(f"{'path':<28} | {'statements':>10} | {'seconds':>8} | {'records/s':>10}")
+    print("-" * 66)
+    
+    async def single_calls():
+        for employee_id in range(1, args.records + 1):
+            async with AsyncSessionLocal() as db:
+                await mark_attendance(
+                    MarkAttendanceRequest(employee_id=employee_id, latitude=33.65, longitude=73.0), db=db
+                )
+    
+    async def batches(batch_size):
+        records = [
+            AttendanceBatchRecord(employee_id=employee_id, latitude=33.65, longitude=73.0)
+            for employee_id in range(1, args.records + 1)
+        ]
+        for start in range(0, len(records), batch_size):
+            async with AsyncSessionLocal() as db:
+                await ingest_attendance(db, records[start:start + batch_size])
+    
+    runs = [("mark_attendance x N", single_calls)]
+    runs += [(f"batch of {size}", lambda size=size: batches(size)) for size in args.batch_sizes]
+    for name, run in runs:
+        seed_database(args.records, days=0)
+        with QueryCounter(async_engine.sync_engine) as counter, redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            asyncio.run(run())
+            elapsed = time.perf_counter() - started
+        asyncio.run(async_engine.dispose())
+        print(f"{name:<28} | {counter.count:>10} | {elapsed:>8.2f} | {args.records / elapsed:>10.0f}")
+
+def bench_writebehind(args):
+    """Check-in spike: mark_attendance committing per request vs the write-behind buffer"""
+    import app.main
+    from app.main import mark_attendance, MarkAttendanceRequest
+    from app.checkin_buffer import CheckInBuffer
+    
+    print_header("WRITE-BEHIND CHECK-INS")
+    print(f"{args.employees} check-ins, {args.concurrency} concurrent clients\n")
+    print(f"{'path':<28} | {'ok':>6} | {'errors':>6} | {'acks/s':>8} | {'rows/s':>8} | {'p50 ms':>7} | {'p99 ms':>7}")
+    print("-" * 89)
+    
+    async def run_check_ins(buffer, write_behind):
+        app.main.checkin_buffer = buffer
+        if write_behind:
+            await buffer.start()
+        limiter = asyncio.Semaphore(args.concurrency)
+        
+        async def check_in(employee_id):
+            async with limiter, AsyncSessionLocal() as db:
+                started = time.perf_counter()
+                try:
+                    await mark_attendance(
+                        MarkAttendanceRequest(employee_id=employee_id, latitude=33.65, longitude=73.0), db=db
+                    )
+                    return time.perf_counter() - started, None
+                except Exception as e:
+                    return time.perf_counter() - started, type(e).__name__
+        
+        started = time.perf_counter()
+        results = await asyncio.gather(*(check_in(i) for i in range(1, args.employees + 1)))
+        acknowledged = time.perf_counter() - started
+        await buffer.stop(drain_timeout=60)
+        stored = time.perf_counter() - started
+        await async_engine.dispose()
+        return results, acknowledged, stored
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        runs = [
+            ("commit per check-in", log_dir, False),
+            ("write-behind, fsync'd log", log_dir, True),
+            ("write-behind, no log", "", True),
+        ]
+        original_buffer = app.main.checkin_buffer
+        try:
+            for name, buffer_log_dir, write_behind in runs:
+                seed_database(args.employees, days=0)
+                buffer = CheckInBuffer(50, 500, args.employees, buffer_log_dir, 4 * 1024 * 1024)
+                with redirect_stdout(io.StringIO()):
+                    results, acknowledged, stored = asyncio.run(run_check_ins(buffer, write_behind))
+                succeeded = sum(1 for _, error in results if error is None)
+                with engine.connect() as conn:
+                    assert conn.execute(select(func.count()).select_from(Attendance)).scalar() == succeeded
+                latencies = sorted(latency * 1000 for latency, _ in results)
+                print(f"{name:<28} | {succeeded:>6} | {len(results) - succeeded:>6} | {succeeded / acknowledged:>8.0f} | "
+                      f"{succeeded / stored:>8.0f} | {percentile(latencies, 0.5):>7.1f} | {percentile(latencies, 0.99):>7.1f}")
+        finally:
+            app.main.checkin_buffer = original_buffer
+
+def bench_rollup(args):
+    """All-employee attendance totals: aggregating raw rows vs the monthly rollup"""
+    from app.main import app
+    
+    print_header("ATTENDANCE ROLLUP")
+    seed_database(args.employees, days=args.days)
+    print(f"{args.employees} employees x {args.days} days, median of {args.runs} runs\n")
+    print(f"{'query':<40} | {'rows read':>10} | {'median ms':>10}")
+    print("-" * 66)
+    
+    summary = AttendanceMonthlySummary
+    queries = [
+        ("GROUP BY over attendance", select(
+            Attendance.employee_id, func.count(Attendance.id),
+            func.sum(case((Attendance.status == 'present', 1), else_=0)), func.max(Attendance.date)
+        ).group_by(Attendance.employee_id), Attendance),
+        ("GROUP BY over attendance_monthly_summary", select(
+            summary.employee_id, func.sum(summary.total_days), func.sum(summary.present_days),
+            func.max(summary.last_attendance)
+        ).group_by(summary.employee_id), summary),
+    ]
+    
+    def median_ms(run):
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)[len(timings) // 2]
+    
+    with engine.connect() as conn:
+        for name, query, model in queries:
+            rows_read = conn.execute(select(func.count()).select_from(model)).scalar()
+            print(f"{name:<40} | {rows_read:>10} | {median_ms(lambda: conn.execute(query).all()):>10.1f}")
+    
+    with redirect_stdout(io.StringIO()):
+        elapsed = median_ms(lambda: asyncio.run(asgi_get(app, "/api/admin/all-employees-stats")))
+    print(f"{'/api/admin/all-employees-stats':<40} | {'':>10} | {elapsed:>10.1f}")
+    
+    def backfill():
+        with engine.begin() as conn:
+            rebuild_attendance_summary(conn)
+    print(f"{'full backfill (rebuild_summary.py)':<40} | {args.employees * args.days:>10} | {median_ms(backfill):>10.1f}")
+
+def bench_absences(args):
+    """End-of-day absence job for one day: set difference, signing and bulk insert"""
+    from app.absence_job import materialize_absences, missing_employees_query, build_absence_rows
+    
+    print_header("ABSENCE MATERIALIZATION")
+    yesterday = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    present = int(args.employees * args.present)
+    seed_database(args.employees, days=0)
+    date_str = yesterday.strftime("%Y-%m-%d")
+    rows = [
+        {"employee_id": i, "date": yesterday, "attendance_day": yesterday.date(), "marked_at": yesterday,
+         "status": "present", "latitude": "33.65", "longitude": "73.0",
+         "hmac": hmac_integrity.compute_attendance_hmac(i, date_str, "present", "33.65", "73.0")}
+        for i in range(1, present + 1)
+    ]
+    with engine.begin() as conn:
+        if rows:
+            conn.execute(insert(Attendance), rows)
+        rebuild_attendance_summary(conn)
+    print(f"{args.employees} approved employees, {present} checked in yesterday\n")
+    print(f"{'step':<32} | {'rows':>8} | {'ms':>9}")
+    print("-" * 56)
+    
+    with engine.connect() as conn:
+        started = time.perf_counter()
+        missing = conn.execute(missing_employees_query(yesterday.date())).scalars().all()
+        print(f"{'set-difference query':<32} | {len(missing):>8} | {(time.perf_counter() - started) * 1000:>9.1f}")
+    started = time.perf_counter()
+    build_absence_rows(missing, yesterday.date())
+    print(f"{'sign absent rows':<32} | {len(missing):>8} | {(time.perf_counter() - started) * 1000:>9.1f}")
+    
+    async def run():
+        count = await materialize_absences(yesterday.date())
+        await async_engine.dispose()
+        return count
+    
+    started = time.perf_counter()
+    written = asyncio.run(run())
+    print(f"{'materialize_absences (total)':<32} | {written:>8} | {(time.perf_counter() - started) * 1000:>9.1f}")
+    assert written == args.employees - present
+
+def bench_geofence(args):
+    """Locating check-ins: every fence per point vs the grid index, single and batched"""
+    import math
+    import random
+    from app.geofence import Fence, GeofenceIndex
+    
+    print_header("GEOFENCE LOOKUP")
+    rng = random.Random(42)
+    fences = []
+    for fence_id in range(1, args.fences + 1):
+        # Irregular star-shaped outlines scattered over a ~20 km area
+        center_lat, center_lon = 33.55 + rng.uniform(0, 0.2), 72.9 + rng.uniform(0, 0.3)
+        radius = rng.uniform(0.002, 0.02)
+        fences.append(Fence(fence_id, f"zone-{fence_id}", [
+            (center_lat + radius * rng.uniform(0.4, 1.0) * math.sin(angle),
+             center_lon + radius * rng.uniform(0.4, 1.0) * math.cos(angle))
+            for angle in (2 * math.pi * k / args.vertices for k in range(args.vertices))
+        ]))
+    latitudes = [rng.uniform(33.55, 33.75) for _ in range(args.points)]
+    longitudes = [rng.uniform(72.9, 73.2) for _ in range(args.points)]
+    
+    started = time.perf_counter()
+    index = GeofenceIndex(fences)
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"{args.fences} fences x {args.vertices} vertices, {args.points} points")
+    print(f"index: {len(index.cells)} cells of {index.cell_size}°, built in {build_ms:.0f} ms\n")
+    print(f"{'method':<28} | {'seconds':>8} | {'points/s':>10}")
+    print("-" * 52)
+    
+    def scan_all_fences():
+        return [
+            next((fence for fence in fences if fence.contains(lat, lon)), None)
+            for lat, lon in zip(latitudes, longitudes)
+        ]
+    
+    runs = [
+        ("every fence per point", scan_all_fences),
+        ("index.locate per point", lambda: [index.locate(lat, lon) for lat, lon in zip(latitudes, longitudes)]),
+        ("index.locate_many", lambda: index.locate_many(latitudes, longitudes))
+    ]
+    expected = None
+    for name, run in runs:
+        started = time.perf_counter()
+        located = run()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<28} | {elapsed:>8.3f} | {args.points / elapsed:>10.0f}")
+        if expected is None:
+            expected = located
+        assert located == expected, f"{name} disagrees with the full scan"
+
+BENCHMARKS = {
+    "queries": bench_queries,
+    "hmac": bench_hmac,
+    "writes": bench_writes,
+    "concurrency": bench_concurrency,
+    "workers": bench_workers,
+    "startup": bench_startup,
+    "envelope": bench_envelope,
+    "ingest": bench_ingest,
+    "writebehind": bench_writebehind,
+    "rollup": bench_rollup,
+    "absences": bench_absences,
+    "geofence": bench_geofence,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Employee Attendance System benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    
+    queries = subparsers.add_parser("queries", help="query count of /api/admin/all-attendance")
+    queries.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    
+    hmac_parser = subparsers.add_parser("hmac", help="HMAC verification throughput")
+    hmac_parser.add_argument("--rows", type=int, default=200000)
+    hmac_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    
+    writes = subparsers.add_parser("writes", help="concurrent mark_attendance write throughput")
+    writes.add_argument("--employees", type=int, default=2000)
+    writes.add_argument("--concurrency", type=int, default=32)
+    
+    concurrency = subparsers.add_parser("concurrency", help="latency under many concurrent clients")
+    concurrency.add_argument("--clients", type=int, default=200)
+    concurrency.add_argument("--requests", type=int, default=10)
+    concurrency.add_argument("--employees", type=int, default=500)
+    concurrency.add_argument("--days", type=int, default=30)
+    
+    workers = subparsers.add_parser("workers", help="throughput of run.py --production by worker count")
+    workers.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    workers.add_argument("--clients", type=int, default=32)
+    workers.add_argument("--duration", type=float, default=5.0)
+    workers.add_argument("--employees", type=int, default=500)
+    workers.add_argument("--days", type=int, default=30)
+    workers.add_argument("--port", type=int, default=8765)
+    
+    startup = subparsers.add_parser("startup", help="import-time budget for app.main")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--budget-ms", type=float, default=1500)
+    
+    envelope = subparsers.add_parser("envelope", help="per-field RSA vs envelope encryption MB/s")
+    envelope.add_argument("--mb", type=int, default=64)
+    envelope.add_argument("--fields", type=int, default=200)
+    
+    ingest = subparsers.add_parser("ingest", help="single check-ins vs batch ingestion")
+    ingest.add_argument("--records", type=int, default=5000)
+    ingest.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    
+    writebehind = subparsers.add_parser("writebehind", help="check-in spike with and without the write-behind buffer")
+    writebehind.add_argument("--employees", type=int, default=5000)
+    writebehind.add_argument("--concurrency", type=int, default=200)
+    
+    rollup = subparsers.add_parser("rollup", help="all-employee totals from raw rows vs the monthly rollup")
+    rollup.add_argument("--employees", type=int, default=500)
+    rollup.add_argument("--days", type=int, default=730)
+    rollup.add_argument("--runs", type=int, default=5)
+    
+    absences = subparsers.add_parser("absences", help="end-of-day absence job for one day")
+    absences.add_argument("--employees", type=int, default=50000)
+    absences.add_argument("--present", type=float, default=0.9, help="share of employees who checked in")
+    
+    geofence = subparsers.add_parser("geofence", help="point-in-polygon lookup with and without the grid index")
+    geofence.add_argument("--fences", type=int, default=50)
+    geofence.add_argument("--vertices", type=int, default=200)
+    geofence.add_argument("--points", type=int, default=20000)
+    
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import argparse
+import sys
+from app.config import settings
+from app.key_manager import key_manager, KeyManager, RSA_KEY_SIZE
+
+def generate_keys(key_dir: str = None, force: bool = False) -> bool:
+    """Generate the RSA-4096 key pair used for CNIC encryption and key exchange"""
+    manager = KeyManager(key_dir) if key_dir else key_manager
+    
+    if manager.keys_exist() and not force:
+        print(f"[✓] RSA key pair already present in {manager.key_dir} (use --force to replace it)")
+        return True
+    
+    print(f"[*] Generating RSA-{RSA_KEY_SIZE} key pair in {manager.key_dir}...")
+    manager.generate_keys(overwrite=force)
+    print(f"[✓] Wrote {manager.private_key_path}")
+    print(f"[✓] Wrote {manager.public_key_path}")
+    if force:
+        print(f"[*] Running workers pick up the new key pair on their next rotation check "
+              f"(every {settings.KEY_ROTATION_CHECK_SECONDS:g}s); no restart needed")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the backend's RSA key pair")
+    parser.add_argument("--key-dir", help="directory for rsa_private.pem / rsa_public.pem (default: KEY_DIR)")
+    parser.add_argument("--force", action="store_true", help="replace an existing key pair")
+    args = parser.parse_args()
+    
+    sys.exit(0 if generate_keys(args.key_dir, args.force) else 1)
@@ -1,10 +1,10 @@
-from app.database import engine, Base
-from app.models import User, Employee, Attendance, OTP
+from app.database import engine
+from app.schema import create_schema
 
 def init_db():
     """Create all tables in the database"""
     print("[*] Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    create_schema(engine)
     print("[✓] Database tables created successfully!")
 
 if __name__ == "__main__":
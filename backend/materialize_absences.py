@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+from sqlalchemy import select
+from app.database import engine, SessionLocal
+from app.schema import create_schema
+from app.models import Holiday
+from app.absence_job import materialize_range, catch_up_absences
+
+def add_holiday(day: date, name: str) -> bool:
+    session = SessionLocal()
+    try:
+        session.merge(Holiday(day=day, name=name))
+        session.commit()
+        print(f"[✓] {day.isoformat()} is a holiday: {name}")
+    finally:
+        session.close()
+    return True
+
+def list_holidays() -> bool:
+    session = SessionLocal()
+    try:
+        for holiday in session.execute(select(Holiday).order_by(Holiday.day)).scalars():
+            print(f"{holiday.day.isoformat()}  {holiday.name or ''}")
+    finally:
+        session.close()
+    return True
+
+def materialize(start: date = None, end: date = None) -> bool:
+    """
+    Write absent rows for finished working days
+    
+    Args:
+        start: First day; without it, catch up from the last completed run
+        end: Last day (default: yesterday)
+    """
+    started = time.perf_counter()
+    try:
+        if start is None:
+            written = asyncio.run(catch_up_absences())
+        else:
+            written = asyncio.run(materialize_range(start, end or date.today() - timedelta(days=1)))
+    except ValueError as e:
+        print(f"[ERROR] {str(e)}")
+        return False
+    print(f"[✓] Wrote {sum(written.values())} absent rows for {len(written)} day(s) "
+          f"in {time.perf_counter() - started:.2f}s")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write absent rows for approved employees who did not check in")
+    parser.add_argument("--start", type=date.fromisoformat, help="first day to materialize (YYYY-MM-DD); default: catch up")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day to materialize (default: yesterday)")
+    parser.add_argument("--add-holiday", nargs=2, metavar=("DAY", "NAME"), help="mark a day as a holiday")
+    parser.add_argument("--list-holidays", action="store_true", help="show the holiday calendar")
+    args = parser.parse_args()
+    
+    create_schema(engine)
+    if args.add_holiday:
+        success = add_holiday(date.fromisoformat(args.add_holiday[0]), args.add_holiday[1])
+    elif args.list_holidays:
+        success = list_holidays()
+    else:
+        success = materialize(args.start, args.end)
+    sys.exit(0 if success else 1)
@@ -1,9 +1,27 @@
 import os
 import sys
-from sqlalchemy import text
+from datetime import date
+from sqlalchemy import inspect, text
+from app.config import settings
 from app.database import engine, SessionLocal
-from app.models import Attendance
+from app.models import Attendance, ChangeCounter, AttendanceMonthlySummary, Geofence
 from app.hmac_integrity import hmac_integrity
+from app.schema import (
+    is_postgresql, partitioned_attendance_table, attendance_is_partitioned,
+    ensure_attendance_partitions, add_months
+)
+from app.change_tracking import CHANGE_COUNTER, ensure_change_counter
+from app.attendance_summary import rebuild_attendance_summary
+from app.geofence import ensure_default_geofence
+
+# Calendar day of the `date` timestamp, per dialect
+ATTENDANCE_DAY_EXPRESSIONS = {
+    "sqlite": "date(date)",
+    "postgresql": "CAST(date AS DATE)"
+}
+
+def table_columns(conn, table_name: str) -> list:
+    return [column["name"] for column in inspect(conn).get_columns(table_name)]
 
 def migrate_attendance_table():
     """
@@ -16,10 +34,7 @@ def migrate_attendance_table():
     try:
         print("[1] Checking if 'hmac' column exists...")
         with engine.connect() as conn:
-            result = conn.execute(text("PRAGMA table_info(attendance)"))
-            columns = [row[1] for row in result]
-            
-            if 'hmac' in columns:
+            if 'hmac' in table_columns(conn, "attendance"):
                 print("[✓] HMAC column already exists")
             else:
                 print("[2] Adding 'hmac' column to attendance table...")
@@ -52,7 +67,7 @@ def migrate_attendance_table():
         print("\n[SUCCESS] Database migration completed successfully!")
         print(f"         - Total attendance records: {len(attendance_records)}")
         print(f"         - Updated with HMAC: {updated_count}")
-        
+    
     except Exception as e:
         print(f"\n[ERROR] Migration failed: {str(e)}")
         session.rollback()
@@ -62,6 +77,232 @@ def migrate_attendance_table():
     
     return True
 
+def migrate_attendance_day():
+    """
+    Add the stored attendance_day column, backfill it from `date`, and
+    enforce one record per employee per day with a unique composite index
+    """
+    print("\n[*] Migrating attendance_day column...")
+    
+    try:
+        with engine.connect() as conn:
+            if 'attendance_day' in table_columns(conn, "attendance"):
+                print("[✓] attendance_day column already exists")
+            else:
+                print("[1] Adding 'attendance_day' column to attendance table...")
+                conn.execute(text("ALTER TABLE attendance ADD COLUMN attendance_day DATE"))
+                print("[✓] attendance_day column added")
+            
+            print("[2] Backfilling attendance_day from date...")
+            day_expression = ATTENDANCE_DAY_EXPRESSIONS[engine.dialect.name]
+            result = conn.execute(text(
+                f"UPDATE attendance SET attendance_day = {day_expression} WHERE attendance_day IS NULL"
+            ))
+            print(f"[✓] Backfilled {result.rowcount} records")
+            
+            duplicates = conn.execute(text(
+                "SELECT employee_id, attendance_day, COUNT(*) FROM attendance "
+                "GROUP BY employee_id, attendance_day HAVING COUNT(*) > 1"
+            )).fetchall()
+            if duplicates:
+                conn.rollback()
+                print(f"\n[ERROR] Found {len(duplicates)} employee/day pairs with more than one record:")
+                for employee_id, attendance_day, count in duplicates[:20]:
+                    print(f"         - employee {employee_id} on {attendance_day}: {count} records")
+                print("         Resolve these duplicates, then run the migration again.")
+                return False
+            
+            print("[3] Creating indexes...")
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_employee_day "
+                "ON attendance (employee_id, attendance_day)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_attendance_attendance_day ON attendance (attendance_day)"
+            ))
+            conn.commit()
+            print("[✓] Indexes ready")
+    except Exception as e:
+        print(f"\n[ERROR] attendance_day migration failed: {str(e)}")
+        return False
+    
+    return True
+
+def migrate_attendance_partitions():
+    """
+    PostgreSQL only: convert a plain attendance table into one partitioned
+    by month on attendance_day
+    
+    Rows are copied into the partitioned table in a single transaction, the
+    id sequence is carried over, and the old table is dropped. Range reports
+    and retention scans then only read the partitions for their months.
+    """
+    if not is_postgresql(engine):
+        return True
+    
+    print("\n[*] Migrating attendance to a month-partitioned table...")
+    
+    try:
+        with engine.begin() as conn:
+            if attendance_is_partitioned(conn):
+                print("[✓] attendance is already partitioned")
+                return True
+            
+            print("[1] Moving the existing table aside...")
+            conn.execute(text("ALTER TABLE attendance RENAME TO attendance_legacy"))
+            sequence = conn.execute(text("SELECT pg_get_serial_sequence('attendance_legacy', 'id')")).scalar()
+            if sequence:
+                conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO attendance_legacy_id_seq"))
+            legacy_indexes = conn.execute(text(
+                "SELECT indexname FROM pg_indexes "
+                "WHERE tablename = 'attendance_legacy' AND schemaname = current_schema()"
+            )).scalars().all()
+            for index_name in legacy_indexes:
+                conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:48]}_legacy"'))
+            
+            print("[2] Creating partitioned attendance table...")
+            table = partitioned_attendance_table()
+            table.create(bind=conn)
+            
+            first_day, last_day = conn.execute(text(
+                "SELECT MIN(attendance_day), MAX(attendance_day) FROM attendance_legacy"
+            )).one()
+            today = date.today()
+            first_day = min(first_day or today, today)
+            last_day = add_months(max(last_day or today, today), settings.ATTENDANCE_PARTITION_MONTHS_AHEAD)
+            created = ensure_attendance_partitions(conn, first_day, last_day)
+            print(f"[✓] Created {len(created)} monthly partitions")
+            
+            print("[3] Copying attendance rows...")
+            legacy_columns = set(table_columns(conn, "attendance_legacy"))
+            column_list = ", ".join(column.name for column in table.columns if column.name in legacy_columns)
+            result = conn.execute(text(
+                f"INSERT INTO attendance ({column_list}) SELECT {column_list} FROM attendance_legacy"
+            ))
+            conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('attendance', 'id'), "
+                "COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM attendance"
+            ))
+            conn.execute(text("DROP TABLE attendance_legacy"))
+            print(f"[✓] Copied {result.rowcount} records")
+    except Exception as e:
+        print(f"\n[ERROR] attendance partition migration failed: {str(e)}")
+        return False
+    
+    return True
+
+def migrate_change_tracking():
+    """
+    Add the change_seq columns behind delta sync and conditional GETs,
+    number existing rows by id, and start the change counter after them
+    """
+    print("\n[*] Migrating change tracking...")
+    
+    try:
+        ChangeCounter.__table__.create(bind=engine, checkfirst=True)
+        ensure_change_counter(engine)
+        
+        with engine.begin() as conn:
+            highest = 0
+            for table_name in ("employees", "attendance"):
+                if 'change_seq' in table_columns(conn, table_name):
+                    print(f"[✓] {table_name}.change_seq already exists")
+                else:
+                    print(f"[1] Adding 'change_seq' column to {table_name}...")
+                    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN change_seq INTEGER"))
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table_name}_change_seq ON {table_name} (change_seq)"
+                ))
+                
+                result = conn.execute(text(f"UPDATE {table_name} SET change_seq = id WHERE change_seq IS NULL"))
+                print(f"[✓] Numbered {result.rowcount} {table_name} rows")
+                highest = max(highest, conn.execute(
+                    text(f"SELECT COALESCE(MAX(change_seq), 0) FROM {table_name}")
+                ).scalar())
+            
+            conn.execute(
+                text("UPDATE change_counters SET version = :highest WHERE name = :name AND version < :highest"),
+                {"highest": highest, "name": CHANGE_COUNTER}
+            )
+            print(f"[✓] Change counter starts after {highest}")
+    except Exception as e:
+        print(f"\n[ERROR] change tracking migration failed: {str(e)}")
+        return False
+    
+    return True
+
+def migrate_attendance_summary():
+    """
+    Create the monthly attendance rollup and fill it from existing rows
+    
+    Always rebuilt: a server started before the migration creates the
+    table empty, and rebuilding an up-to-date summary is harmless.
+    """
+    print("\n[*] Migrating attendance summary...")
+    
+    try:
+        with engine.begin() as conn:
+            AttendanceMonthlySummary.__table__.create(bind=conn, checkfirst=True)
+            written = rebuild_attendance_summary(conn)
+            print(f"[✓] Summarized attendance into {written} employee-month rows")
+    except Exception as e:
+        print(f"\n[ERROR] attendance summary migration failed: {str(e)}")
+        return False
+    
+    return True
+
+def migrate_geofences():
+    """
+    Create the geofence table, seeded with the campus bounding box that
+    check-ins were validated against before fences were configurable
+    """
+    print("\n[*] Migrating geofences...")
+    
+    try:
+        Geofence.__table__.create(bind=engine, checkfirst=True)
+        ensure_default_geofence(engine)
+        print("[✓] Geofences in place")
+    except Exception as e:
+        print(f"\n[ERROR] geofence migration failed: {str(e)}")
+        return False
+    
+    return True
+
+def migrate_otps_table():
+    """
+    Switch OTP storage to one HMAC-digested code per email
+    
+    Existing rows hold Argon2 hashes that the new OTP store cannot verify,
+    and they expire within minutes anyway, so they are purged.
+    """
+    print("\n[*] Migrating OTP table...")
+    
+    try:
+        with engine.connect() as conn:
+            print("[1] Purging existing OTP rows...")
+            result = conn.execute(text("DELETE FROM otps"))
+            print(f"[✓] Removed {result.rowcount} OTP rows")
+            
+            print("[2] Creating unique index on otps.email...")
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_otps_email ON otps (email)"))
+            conn.commit()
+            print("[✓] Index ready")
+    except Exception as e:
+        print(f"\n[ERROR] OTP migration failed: {str(e)}")
+        return False
+    
+    return True
+
 if __name__ == "__main__":
-    success = migrate_attendance_table()
+    # attendance_day and change_seq must exist before the ORM-based HMAC backfill loads
+    # Attendance rows, and all columns must be filled in before rows are copied into partitions
+    success = (
+        migrate_attendance_day()
+        and migrate_change_tracking()
+        and migrate_attendance_table()
+        and migrate_attendance_partitions()
+        and migrate_attendance_summary()
+        and migrate_geofences()
+        and migrate_otps_table()
+    )
     sys.exit(0 if success else 1)
@@ -0,0 +1,31 @@
+import argparse
+import sys
+import time
+from app.database import engine
+from app.schema import create_schema
+from app.attendance_summary import rebuild_attendance_summary
+
+def rebuild_summary(employee_ids=None) -> bool:
+    """
+    Recompute attendance_monthly_summary from the attendance table, e.g.
+    after attendance was edited by hand or restored from a backup
+    
+    Args:
+        employee_ids: Only rebuild these employees (database ids)
+    """
+    create_schema(engine)
+    scope = f"{len(employee_ids)} employees" if employee_ids else "all employees"
+    print(f"[*] Rebuilding attendance summary for {scope}...")
+    
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        written = rebuild_attendance_summary(conn, employee_ids=employee_ids)
+    print(f"[✓] Wrote {written} employee-month rows in {time.perf_counter() - started:.2f}s")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the monthly attendance rollup from raw attendance rows")
+    parser.add_argument("--employee-id", type=int, nargs="+", help="only these employees (database ids)")
+    args = parser.parse_args()
+    
+    sys.exit(0 if rebuild_summary(args.employee_id) else 1)
@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app.database import engine, Base, SessionLocal
 from app.models import User
 from app.encryption import get_password_hash
+from app.schema import create_schema
 
 SECURITY_QUESTIONS = [
     "What was the name of your first pet?",
@@ -33,7 +34,7 @@ def reset_database():
     print("✅ All tables dropped successfully\n")
     
     print("🔨 Creating new tables...")
-    Base.metadata.create_all(bind=engine)
+    create_schema(engine)
     print("✅ All tables created successfully\n")
 
 def display_security_questions():
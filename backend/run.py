@@ -1,22 +1,100 @@
-import uvicorn
+import argparse
+import asyncio
 import os
-from app.database import engine, Base
-from app.models import User, Employee, Attendance, OTP
+import sys
+import threading
+import uvicorn
+from app.config import settings
+from app.database import engine
+from app.schema import create_schema
+from app.key_manager import key_manager
+from generate_keys import generate_keys
+
+def resolve_workers(value: str) -> int:
+    """Worker count from --workers / WORKERS; "auto" means one per CPU core"""
+    if str(value).lower() == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+def preload_shared_state(workers: int, production: bool):
+    """
+    Prepare everything workers would otherwise race on, once, in the
+    launcher process before any worker starts
+    
+    - database tables (and PostgreSQL attendance partitions)
+    - the RSA key pair: production mode requires it to exist already
+      (`python generate_keys.py`); development mode generates it here
+      once, so workers only ever load the same files
+    - per-worker thread pool sizes, so N workers do not each start one
+      hashing thread per core
+    """
+    print("[*] Creating database tables...")
+    create_schema(engine)
+    print("[✓] Database tables ready")
+    
+    if not key_manager.keys_exist():
+        if production:
+            print(f"[ERROR] No RSA key pair in {key_manager.key_dir}; run `python generate_keys.py` first")
+            sys.exit(1)
+        generate_keys()
+    print(f"[✓] RSA keys ready in {key_manager.key_dir}")
+    
+    if workers > 1:
+        if not os.getenv("AES_KEY"):
+            # Each worker would invent its own key and could not read the others' CNICs
+            print("[ERROR] AES_KEY must be set when running more than one worker")
+            sys.exit(1)
+        if not os.getenv("HMAC_SECRET_KEY"):
+            print("⚠️  HMAC_SECRET_KEY not set; all workers are using the built-in development key")
+        
+        threads_per_worker = str(max(1, (os.cpu_count() or 1) // workers))
+        os.environ.setdefault("HASH_WORKERS", threads_per_worker)
+        os.environ.setdefault("AES_WORKERS", threads_per_worker)
+
+def start_absence_job(workers: int):
+    """
+    With several workers, run the end-of-day absence job once, in the
+    launcher, instead of in every worker
+    
+    Workers racing on the same day are harmless on PostgreSQL (advisory
+    lock) but make SQLite fail with "database is locked". A single worker
+    runs the job itself.
+    """
+    if not settings.ABSENCE_JOB_ENABLED or workers == 1:
+        return
+    from app.absence_job import run_absence_job
+    threading.Thread(target=lambda: asyncio.run(run_absence_job()), name="absence-job", daemon=True).start()
+    print("[✓] Absence job running in the launcher process")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Employee Attendance System backend")
+    parser.add_argument("--production", action="store_true",
+                        help="multi-worker mode (one worker per CPU core unless --workers is given)")
+    parser.add_argument("--workers", default=os.getenv("WORKERS"),
+                        help='number of worker processes or "auto" (default: 1, or auto with --production)')
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", 30)),
+                        help="seconds to let in-flight requests finish on shutdown")
+    args = parser.parse_args()
+    
     port = int(os.getenv("PORT", 8000))
     host = "0.0.0.0"
+    workers = resolve_workers(args.workers or ("auto" if args.production else 1))
     
     print("[*] Starting Employee Attendance System...")
-    print("[*] Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("[✓] Database tables ready")
-    print(f"[*] Backend: {host}:{port}")
+    preload_shared_state(workers, args.production)
+    # Workers inherit it; per-process features check it instead of guessing
+    os.environ["WORKER_PROCESSES"] = str(workers)
+    start_absence_job(workers)
+    print(f"[*] Backend: {host}:{port} ({workers} worker{'s' if workers > 1 else ''})")
     print("[*] Press Ctrl+C to stop\n")
     
     uvicorn.run(
         "app.main:app",
         host=host,
         port=port,
-        reload=False
-    )
\ No newline at end of file
+        reload=False,
+        workers=workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=args.production,
+        access_log=not args.production
+    )
@@ -0,0 +1,77 @@
+"""
+A late offline check-in for a day the absence job already marked absent
+
+Runs against a throwaway SQLite database: python -m pytest tests
+"""
+import os
+import sys
+import asyncio
+import tempfile
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "absence_ingest.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+os.environ.setdefault("AES_KEY", "5ttEDuBGQZQ4qwO4mNqhqCBTPQyJKMIdvIUdriZ3o80=")
+os.environ["ABSENCE_JOB_ENABLED"] = "false"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, insert
+from app.database import engine, AsyncSessionLocal
+from app.schema import create_schema, month_start
+from app.models import User, Employee, Attendance, AttendanceMonthlySummary
+from app.hmac_integrity import hmac_integrity
+from app.absence_job import materialize_absences
+from app.attendance_ingest import ingest_attendance, ACCEPTED, DUPLICATE
+
+def setup_module(module):
+    create_schema(engine)
+    with engine.begin() as conn:
+        user_id = conn.execute(insert(User).values(
+            email="late@example.com", hashed_password="x", role="employee", is_active=True
+        )).inserted_primary_key[0]
+        conn.execute(insert(Employee).values(
+            id=1, user_id=user_id, full_name="Late Kiosk", cnic="late-kiosk", cnic_encrypted="x",
+            is_approved=True, approved_at=datetime(2020, 1, 1)
+        ))
+
+def upload(day: date):
+    record = SimpleNamespace(employee_id=1, latitude=33.65, longitude=73.0, marked_at=datetime.combine(day, time(9, 0)))
+    
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await ingest_attendance(db, [record], check_location=False)
+    return asyncio.run(run())
+
+def test_late_checkin_replaces_materialized_absence():
+    day = date.today() - timedelta(days=1)
+    assert asyncio.run(materialize_absences(day)) == 1
+    with engine.connect() as conn:
+        absent_seq = conn.execute(select(Attendance.change_seq).where(Attendance.employee_id == 1)).scalar_one()
+    
+    results, accepted = upload(day)
+    assert results[0]["result"] == ACCEPTED
+    assert results[0]["replaced_absence"] is True
+    assert [record.status for record in accepted] == ["present"]
+    
+    with engine.connect() as conn:
+        rows = conn.execute(select(Attendance).where(Attendance.employee_id == 1)).all()
+        summary = conn.execute(select(AttendanceMonthlySummary).where(
+            AttendanceMonthlySummary.employee_id == 1,
+            AttendanceMonthlySummary.month == month_start(day)
+        )).one()
+    
+    assert len(rows) == 1
+    row = rows[0]
+    assert row.status == "present"
+    assert row.change_seq > absent_seq
+    assert hmac_integrity.verify_attendance_hmac(
+        row.employee_id, row.attendance_day.isoformat(), row.status, row.hmac, row.latitude, row.longitude
+    )
+    assert (summary.present_days, summary.absent_days, summary.total_days) == (1, 0, 1)
+    assert summary.last_attendance == datetime.combine(day, time(9, 0))
+    
+    # The day is now a real check-in; uploading it again is a plain duplicate
+    results, accepted = upload(day)
+    assert results[0]["result"] == DUPLICATE
+    assert accepted == []
@@ -29,27 +29,37 @@ document.getElementById('refresh-btn').addEventListener('click', function() {
 // Load all attendance data
 async function loadAttendance() {
     try {
-        const response = await fetch(`${API_BASE}/api/admin/all-attendance?t=${Date.now()}`, {
-            method: 'GET',
-            headers: {
-                'Authorization': `Bearer ${token}`,
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
+        const attendance = [];
+        let cursor = null;
+
+        // Results are paginated; follow X-Next-Cursor until the last page
+        do {
+            const params = new URLSearchParams();
+            if (cursor) params.set('cursor', cursor);
+
+            // Revalidate with the cached ETag; an unchanged list comes back as a cheap 304
+            const response = await fetch(`${API_BASE}/api/admin/all-attendance?${params}`, {
+                method: 'GET',
+                cache: 'no-cache',
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                }
+            });
+
+            if (response.ok) {
+                attendance.push(...await response.json());
+                cursor = response.headers.get('X-Next-Cursor');
+            } else if (response.status === 401) {
+                throw new Error('Not authenticated. Please login again.');
+            } else if (response.status === 403) {
+                throw new Error('Not authorized. Admin access required.');
+            } else {
+                const errorData = await response.json().catch(() => ({}));
+                throw new Error(errorData.detail || 'Failed to load attendance data');
             }
-        });
+        } while (cursor);
 
-        if (response.ok) {
-            const attendance = await response.json();
-            displayAttendance(attendance);
-        } else if (response.status === 401) {
-            throw new Error('Not authenticated. Please login again.');
-        } else if (response.status === 403) {
-            throw new Error('Not authorized. Admin access required.');
-        } else {
-            const errorData = await response.json().catch(() => ({}));
-            throw new Error(errorData.detail || 'Failed to load attendance data');
-        }
+        displayAttendance(attendance);
     } catch (error) {
         console.error('Error loading attendance:', error);
         if (error.message.includes('Failed to fetch')) {
@@ -151,6 +161,12 @@ document.addEventListener('DOMContentLoaded', function() {
     
     loadAttendance();
     
-    // Add auto-refresh every 30 seconds
-    setInterval(loadAttendance, 30000);
+    // Reload when attendance is marked instead of polling every 30 seconds
+    const reloadAttendance = debounce(loadAttendance, 1000);
+    subscribeLiveUpdates({
+        topics: ['attendance'],
+        onEvent: reloadAttendance,
+        onResync: reloadAttendance,
+        fallback: loadAttendance
+    });
 });
\ No newline at end of file
@@ -5,6 +5,8 @@ let userLocation = null;
 let hasLocationPermission = false;
 let map = null;
 let locationMarker = null;
+let geofences = [];
+let geofenceLayers = [];
 
 console.log('[INIT] token:', token ? 'EXISTS' : 'MISSING');
 console.log('[INIT] employeeId:', employeeId ? employeeId : 'MISSING');
@@ -94,18 +96,86 @@ function updateLocationStatus() {
     }
 }
 
+async function loadGeofences() {
+    try {
+        const response = await fetch(`${API_BASE}/api/geofences`);
+        if (response.ok) {
+            geofences = await response.json();
+            console.log('[DEBUG] Attendance zones:', geofences.map(fence => fence.name));
+            updateZoneLabel();
+            if (map) {
+                drawGeofences();
+                if (locationMarker) {
+                    locationMarker.setPopupContent(zoneStatusText(userLocation.latitude, userLocation.longitude));
+                }
+            }
+        }
+    } catch (error) {
+        console.error('Failed to load attendance zones:', error);
+    }
+}
+
+// Even-odd ray cast over [lat, lon] vertices, the same rule the server applies
+function pointInPolygon(lat, lon, polygon) {
+    let inside = false;
+    for (let i = 0, j = polygon.length - 1; i < polygon.length; j = i++) {
+        const [lat1, lon1] = polygon[i];
+        const [lat2, lon2] = polygon[j];
+        if ((lat1 > lat) !== (lat2 > lat) &&
+            lon < lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)) {
+            inside = !inside;
+        }
+    }
+    return inside;
+}
+
+function findGeofence(lat, lon) {
+    return geofences.find(fence => pointInPolygon(lat, lon, fence.polygon)) || null;
+}
+
 function isLocationValid(lat, lon) {
-    const ALLOWED_LAT_MIN = 33.60;
-    const ALLOWED_LAT_MAX = 33.70;
-    const ALLOWED_LON_MIN = 72.95;
-    const ALLOWED_LON_MAX = 73.25;
-    
-    console.log('[DEBUG] Location validation check:');
-    console.log('  Your coords: Lat=' + lat + ', Lon=' + lon);
-    console.log('  Allowed range: Lat=' + ALLOWED_LAT_MIN + '-' + ALLOWED_LAT_MAX + ', Lon=' + ALLOWED_LON_MIN + '-' + ALLOWED_LON_MAX);
-    
-    return lat >= ALLOWED_LAT_MIN && lat <= ALLOWED_LAT_MAX && 
-           lon >= ALLOWED_LON_MIN && lon <= ALLOWED_LON_MAX;
+    // The server has the final say; until the zones have loaded, leave the check to it
+    if (!geofences.length) {
+        return true;
+    }
+    return findGeofence(lat, lon) !== null;
+}
+
+function updateZoneLabel() {
+    const labelEl = document.getElementById('location-name');
+    if (!labelEl || !geofences.length) {
+        return;
+    }
+    const fence = userLocation ? findGeofence(userLocation.latitude, userLocation.longitude) : null;
+    labelEl.textContent = fence ? fence.name : geofences.map(zone => zone.name).join(', ');
+}
+
+function zoneStatusText(lat, lon) {
+    if (!geofences.length) {
+        return '<b>📍 Your Current Location</b>';
+    }
+    const fence = findGeofence(lat, lon);
+    const zone = document.createElement('span');
+    zone.textContent = fence ? fence.name : '';
+    return fence ?
+        `<b>✅ You are INSIDE ${zone.innerHTML}</b><br>Ready to mark attendance` :
+        '<b>❌ You are OUTSIDE every attendance zone</b><br>Move into an attendance zone to mark attendance';
+}
+
+function drawGeofences() {
+    geofenceLayers.forEach(layer => layer.remove());
+    geofenceLayers = geofences.map(fence => {
+        const popup = document.createElement('div');
+        popup.innerHTML = '<b></b><br>Attendance zone';
+        popup.querySelector('b').textContent = `✅ ${fence.name}`;
+        return L.polygon(fence.polygon, {
+            color: '#00ff9d',
+            fillColor: '#00ff9d',
+            fillOpacity: 0.1,
+            weight: 2,
+            dashArray: '5, 5'
+        }).addTo(map).bindPopup(popup);
+    });
 }
 
 function initializeMap() {
@@ -123,29 +193,7 @@ function initializeMap() {
                 minZoom: 13
             }).addTo(map);
             
-            const NUST_LAT = 33.643;
-            const NUST_LON = 73.184;
-            
-            L.circle([NUST_LAT, NUST_LON], {
-                color: '#00ff9d',
-                fillColor: '#00ff9d',
-                fillOpacity: 0.1,
-                radius: 1000,
-                weight: 2,
-                dashArray: '5, 5'
-            }).addTo(map).bindPopup('<b>✅ Attendance Zone (NUST H-12)</b><br>You must be here to mark attendance');
-            
-            L.marker([NUST_LAT, NUST_LON], {
-                icon: L.icon({
-                    iconUrl: 'https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-2x-green.png',
-                    shadowUrl: 'https://cdnjs.cloudflare.com/ajax/libs/leaflet/0.7.7/images/marker-shadow.png',
-                    iconSize: [25, 41],
-                    iconAnchor: [12, 41],
-                    popupAnchor: [1, -34],
-                    shadowSize: [41, 41]
-                }),
-                title: 'NUST H-12 Islamabad - Attendance Zone'
-            }).addTo(map).bindPopup('<b>✅ NUST H-12 Islamabad</b><br>Attendance Zone Center');
+            drawGeofences();
             
             const isValid = isLocationValid(userLocation.latitude, userLocation.longitude);
             const iconUrl = isValid ? 
@@ -164,10 +212,8 @@ function initializeMap() {
                 title: 'Your Current Location'
             }).addTo(map);
             
-            const statusText = isValid ? 
-                '<b>✅ You are INSIDE attendance zone</b><br>Ready to mark attendance' :
-                '<b>❌ You are OUTSIDE attendance zone</b><br>Move to NUST H-12 to mark attendance';
-            locationMarker.bindPopup(statusText).openPopup();
+            locationMarker.bindPopup(zoneStatusText(userLocation.latitude, userLocation.longitude)).openPopup();
+            updateZoneLabel();
             
             map.invalidateSize();
         }, 100);
@@ -175,11 +221,8 @@ function initializeMap() {
         map.setView([userLocation.latitude, userLocation.longitude], 17);
         if (locationMarker) {
             locationMarker.setLatLng([userLocation.latitude, userLocation.longitude]);
-            const isValid = isLocationValid(userLocation.latitude, userLocation.longitude);
-            const statusText = isValid ? 
-                '<b>✅ You are INSIDE attendance zone</b><br>Ready to mark attendance' :
-                '<b>❌ You are OUTSIDE attendance zone</b><br>Move to NUST H-12 to mark attendance';
-            locationMarker.setPopupContent(statusText);
+            locationMarker.setPopupContent(zoneStatusText(userLocation.latitude, userLocation.longitude));
+            updateZoneLabel();
         }
     }
 }
@@ -312,7 +355,7 @@ function attachEventListeners() {
             }
 
             if (!isLocationValid(userLocation.latitude, userLocation.longitude)) {
-                showAlert('❌ You must be at NUST H-12 Islamabad to mark attendance', 'error');
+                showAlert('❌ You must be inside an attendance zone to mark attendance', 'error');
                 return;
             }
 
@@ -330,8 +373,7 @@ function attachEventListeners() {
                 const payloadData = {
                     employee_id: parseInt(employeeId),
                     latitude: userLocation.latitude,
-                    longitude: userLocation.longitude,
-                    location_name: "NUST H-12 Islamabad"
+                    longitude: userLocation.longitude
                 };
                 
                 console.log('📤 Sending attendance payload:', payloadData);
@@ -377,9 +419,18 @@ document.addEventListener('DOMContentLoaded', () => {
     console.log('[DEBUG] employeeId:', employeeId ? employeeId : 'MISSING');
     
     loadEmployeeInfo();
+    loadGeofences();
     updateLocationStatus();
     loadAttendance();
-    setInterval(loadAttendance, 30000);
+    
+    // The stream only carries this employee's own records
+    const reloadAttendance = debounce(loadAttendance, 1000);
+    subscribeLiveUpdates({
+        topics: ['attendance'],
+        onEvent: reloadAttendance,
+        onResync: reloadAttendance,
+        fallback: loadAttendance
+    });
     
     setTimeout(() => {
         console.log('[DEBUG] Calling attachEventListeners after 500ms');
@@ -8,11 +8,11 @@ class EncryptionClient {
   async init() {
     try {
       console.log('🔐 Initializing RSA-4096 encryption client...');
+      // Plain GET (no custom headers) so the browser can answer from its HTTP cache or
+      // revalidate with If-None-Match instead of sending a CORS preflight every page load
       const response = await fetch('http://localhost:8000/api/security/public-key', {
         method: 'GET',
-        headers: {
-          'Content-Type': 'application/json'
-        }
+        cache: 'default'
       });
 
       if (!response.ok) {
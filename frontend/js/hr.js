@@ -22,7 +22,8 @@ document.getElementById('logout-btn').addEventListener('click', function() {
 // Load pending approvals
 async function loadPendingApprovals() {
     try {
-        const response = await fetch(`${API_BASE}/api/hr/pending-approvals`, {
+        // CNICs are decrypted on demand when HR reveals them
+        const response = await fetch(`${API_BASE}/api/hr/pending-approvals?include_cnic=false`, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
@@ -66,7 +67,11 @@ function displayPendingApprovals(employees) {
         <tr>
             <td><i class="fas fa-user-circle" style="margin-right: 8px; color: var(--primary);"></i> ${emp.full_name}</td>
             <td style="color: #999;">***@company.com</td>
-            <td style="font-family: monospace; color: #10b981; font-size: 1.1rem; letter-spacing: 1px; font-weight: 600;">${emp.cnic}</td>
+            <td id="cnic-${emp.id}" style="font-family: monospace; color: #10b981; font-size: 1.1rem; letter-spacing: 1px; font-weight: 600;">
+                <button class="reveal-cnic-btn" onclick="revealCnic(${emp.id})">
+                    <i class="fas fa-eye"></i> Show
+                </button>
+            </td>
             <td>${emp.department}</td>
             <td>${emp.position}</td>
             <td style="text-align: center;">
@@ -85,6 +90,24 @@ function displayPendingApprovals(employees) {
     attachApproveListeners();
 }
 
+// Fetch and show a single applicant's CNIC
+async function revealCnic(employeeId) {
+    const cell = document.getElementById(`cnic-${employeeId}`);
+    try {
+        const response = await fetch(`${API_BASE}/api/hr/applicant-cnic/${employeeId}`, {
+            headers: {
+                'Authorization': `Bearer ${token}`
+            }
+        });
+        if (!response.ok) throw new Error('Failed to load CNIC');
+        const data = await response.json();
+        cell.textContent = data.cnic;
+    } catch (error) {
+        console.error('Error:', error);
+        showAlert('Failed to load CNIC', 'error');
+    }
+}
+
 // Attach visual feedback to approve buttons
 function attachApproveListeners() {
     document.querySelectorAll('.approve-btn').forEach(button => {
@@ -345,9 +368,15 @@ document.addEventListener('DOMContentLoaded', () => {
         searchInput.addEventListener('keyup', searchApprovedEmployees);
     }
     
-    // Refresh data every 30 seconds
-    setInterval(() => {
+    // Refresh when signups arrive or approvals change instead of polling every 30 seconds
+    const reloadEmployees = debounce(() => {
         loadPendingApprovals();
         loadApprovedEmployees();
-    }, 30000);
+    }, 1000);
+    subscribeLiveUpdates({
+        topics: ['approval'],
+        onEvent: reloadEmployees,
+        onResync: reloadEmployees,
+        fallback: reloadEmployees
+    });
 });
@@ -0,0 +1,132 @@
+console.log('[INIT] Live updates handler loading...');
+
+// Push-based dashboard refresh over Server-Sent Events (/api/events/stream).
+// The stream is opened with a short-lived ticket from /api/events/ticket, so
+// the session JWT never appears in a URL. The browser reconnects on its own
+// and sends Last-Event-ID, so the server replays whatever was missed; a
+// "resync" event means the gap was too large (or the client landed on
+// another worker) and the page should reload its data. Once a ticket has
+// expired the stream closes and a new ticket is fetched.
+//
+// Each worker only pushes the writes it handled itself, so a slow
+// conditional-GET poll keeps running alongside the stream. Without a
+// stream (no EventSource, ticket refused) the page polls at the old rate.
+
+function debounce(fn, wait) {
+    let timer = null;
+    return (...args) => {
+        clearTimeout(timer);
+        timer = setTimeout(() => fn(...args), wait);
+    };
+}
+
+function subscribeLiveUpdates({
+    topics,
+    onEvent,
+    onResync,
+    fallback,
+    fallbackInterval = 30000,
+    safetyInterval = 60000,
+    reconnectDelay = 5000
+}) {
+    const token = localStorage.getItem('token');
+    let pollTimer = null;
+    let pollEvery = null;
+    let source = null;
+    let reconnectTimer = null;
+    let lastEventId = null;
+    
+    const pollEveryMs = (interval) => {
+        if (!fallback || pollEvery === interval) {
+            return;
+        }
+        console.log(`[LIVE] Polling every ${interval / 1000}s`);
+        clearInterval(pollTimer);
+        pollEvery = interval;
+        pollTimer = setInterval(fallback, interval);
+    };
+    
+    // Poll at the full rate until the stream is up
+    pollEveryMs(fallbackInterval);
+    if (!token || typeof EventSource === 'undefined') {
+        return;
+    }
+    
+    const scheduleReconnect = (delay) => {
+        clearTimeout(reconnectTimer);
+        reconnectTimer = setTimeout(connect, delay);
+    };
+    
+    const remember = (event) => {
+        if (event.lastEventId) {
+            lastEventId = event.lastEventId;
+        }
+    };
+    
+    async function connect() {
+        let ticket;
+        try {
+            const response = await fetch(`${API_BASE}/api/events/ticket`, {
+                method: 'POST',
+                headers: { 'Authorization': `Bearer ${token}` }
+            });
+            if (!response.ok) {
+                throw new Error(`ticket refused (${response.status})`);
+            }
+            ticket = (await response.json()).ticket;
+        } catch (error) {
+            console.warn('[LIVE] Event stream unavailable:', error);
+            pollEveryMs(fallbackInterval);
+            scheduleReconnect(fallbackInterval);
+            return;
+        }
+        
+        const params = new URLSearchParams({ ticket, topics: topics.join(',') });
+        if (lastEventId) {
+            params.set('lastEventId', lastEventId);
+        }
+        source = new EventSource(`${API_BASE}/api/events/stream?${params}`);
+        
+        source.onopen = () => {
+            console.log('[LIVE] Connected to event stream:', topics.join(', '));
+            pollEveryMs(safetyInterval);
+        };
+        
+        topics.forEach(topic => {
+            source.addEventListener(topic, event => {
+                remember(event);
+                try {
+                    onEvent(topic, JSON.parse(event.data));
+                } catch (error) {
+                    console.error('[LIVE] Bad event payload:', error);
+                }
+            });
+        });
+        
+        source.addEventListener('resync', event => {
+            remember(event);
+            console.log('[LIVE] Server asked for a resync');
+            if (onResync) {
+                onResync();
+            }
+        });
+        
+        source.onerror = () => {
+            pollEveryMs(fallbackInterval);
+            // CLOSED means the browser gave up, usually on an expired ticket; otherwise it is retrying
+            if (source.readyState === EventSource.CLOSED) {
+                console.warn('[LIVE] Event stream closed; fetching a new ticket');
+                scheduleReconnect(reconnectDelay);
+            }
+        };
+    }
+    
+    connect();
+    window.addEventListener('beforeunload', () => {
+        clearTimeout(reconnectTimer);
+        clearInterval(pollTimer);
+        if (source) {
+            source.close();
+        }
+    });
+}